@@ -0,0 +1,181 @@
+"""Confere o cache de visões do Painel (pages/cache_visoes.py) com streamlit.testing contra o Drive falso.
+
+Duas sessões fazem os mesmos filtros, troca de contrato e de tipo de gráfico: veem as mesmas métricas e os
+mesmos gráficos, e a segunda é servida pelo cache. Depois de uma atualização do snapshot o que foi guardado
+é descartado e as visões são montadas de novo.
+
+Roda de qualquer diretório: python benchmarks/conferir_cache_visoes.py
+"""
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+
+# A raiz do repositório no caminho, para importar pages.* e o servidor falso fora dela
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+PORTA = 8798
+os.environ["URL_API_GOOGLE"] = f"http://127.0.0.1:{PORTA}"  # Lida na importação de drive_google e token_google
+
+from openpyxl import Workbook
+
+from servidor_drive_fake import ArmazemDrive, iniciar_servidor, aguardar_atualizador
+
+# Os mesmos de ARQUIVOS_PAINEL e ARQUIVO_EVOLUCAO em pages/relatorio.py
+PLANILHAS_PAINEL = [
+    ("1E2xiSA0VwiiqS04iHhvmiIP-5RyGJvDf", "Vigilância.xlsx"),
+    ("1bpsBDegUletMd07SjE0EpbX1zgjl_6zj", "Locação de Imóvel.xlsx"),
+    ("1iGlxRvoF5gjn6r0CUsyRVakmph6cXpD3", "Limpeza e Conservação.xlsx"),
+    ("1RPQADGPfy4b6hGtNMg-p6o93y3H6bJVO", "Diversos.xlsx"),
+    ("1-yM9S_yPYWmt3ozLkow6QIaJD31O8Huo", "Ar condicionado.xlsx"),
+]
+ID_EVOLUCAO = "1ff7-LmysSbjwGTUC0OiK4jQJP8NkHaY1"
+NOME_EVOLUCAO = "relatorio evolucao mes a mes.xlsx"
+REGIOES = ["Norte", "Sul", "Sudeste", "Nordeste", "Centro-Oeste"]
+MESES = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+
+def _salvar(livro):
+    saida = io.BytesIO()
+    livro.save(saida)
+    return saida.getvalue()
+
+
+def _planilha_objeto(indice, nome, linhas, aleatorio, notas):
+    """Planilha de objeto no layout do Painel: 4 linhas de título, cabeçalho e as 31 colunas lidas."""
+    livro = Workbook()
+    aba = livro.active
+    for _ in range(4):
+        aba.append([f"Planilha {nome}"])
+    aba.append(["Região", "Processo", "Contrato", "Objeto", "Nota Empenho", "Valor Empenhado", "Valor Pago",
+                "Valor Global", "Valor Anual", "Valor Mensal", "Status", "Última Repactuação", "Ocorrência",
+                "Data de Ocorrência"] + MESES + ["Total Anual", "Índice", "Evolução", "Reajuste",
+                                                 "Reforço/Remanejamento"])
+    for i in range(linhas):
+        mensal = round(aleatorio.uniform(1000, 90000), 2)
+        pagos = [round(mensal * aleatorio.random(), 2) if mes < 5 else None for mes in range(12)]
+        ocorrencia = aleatorio.choice(["", "inicio", "rescisão", ""])
+        data = aleatorio.choice(["10/03/2025", "15/07/2025"]) if ocorrencia else ""
+        nota = f"2025NE{indice}{i:05d}"
+        notas.append(nota)
+        aba.append([aleatorio.choice(REGIOES), f"P{indice}{i}", f"CT-{indice}-{i:03d}", nome[:-5], nota,
+                    round(mensal * 12 * aleatorio.uniform(0.6, 1.1), 2), round(sum(p or 0 for p in pagos), 2),
+                    mensal * 30, mensal * 12, mensal, "OK", "", ocorrencia, data] + pagos
+                   + [sum(p or 0 for p in pagos), "1", "", "", 0])
+    return _salvar(livro)
+
+
+def _planilha_evolucao(notas, aleatorio):
+    livro = Workbook()
+    aba = livro.active
+    aba.append(["Relatório"])
+    aba.append(["Evolução"])
+    aba.append(["", "", ""] + [rotulo for mes in ["JAN", "FEV", "MAR", "ABR"] for rotulo in (f"{mes}/2025", "", "")])
+    for nota in notas:
+        aba.append([nota, "x", "Empresa"] + [round(aleatorio.uniform(0, 9000), 2) for _ in range(12)])
+    return _salvar(livro)
+
+
+def _armazem(linhas=40, semente=1):
+    aleatorio = random.Random(semente)
+    armazem = ArmazemDrive()
+    notas = []
+    for indice, (file_id, nome) in enumerate(PLANILHAS_PAINEL):
+        armazem.adicionar(file_id, nome, _planilha_objeto(indice, nome, linhas, aleatorio, notas))
+    armazem.adicionar(ID_EVOLUCAO, NOME_EVOLUCAO, _planilha_evolucao(notas, aleatorio))
+    return armazem
+
+
+def _observar(pagina):
+    """O que a tela mostra: métricas e a especificação de cada gráfico Plotly."""
+    if pagina.exception:
+        raise RuntimeError(f"O Painel falhou: {pagina.exception[0].value}")
+    return ([metrica.value for metrica in pagina.metric],
+            [grafico.proto.spec for grafico in pagina.get("plotly_chart")])
+
+
+def _percorrer(pagina):
+    """Filtra região e objeto, escolhe um contrato e troca o tipo de gráfico, guardando a tela de cada passo."""
+    # Cada run() monta a árvore de novo: os widgets são buscados outra vez a cada passo
+    passos = [
+        lambda: pagina.sidebar.multiselect[0].select(pagina.sidebar.multiselect[0].options[0]),
+        lambda: pagina.sidebar.multiselect[1].select(pagina.sidebar.multiselect[1].options[0]),
+        lambda: pagina.sidebar.selectbox[0].select(pagina.sidebar.selectbox[0].options[1]),
+        lambda: pagina.radio[0].set_value(pagina.radio[0].options[1]),
+    ]
+    telas = [_observar(pagina)]
+    for passo in passos:
+        passo().run()
+        telas.append(_observar(pagina))
+    return telas
+
+
+def _abrir_painel():
+    from streamlit.testing.v1 import AppTest
+
+    pagina = AppTest.from_file(os.path.join(RAIZ, "pages", "relatorio.py"), default_timeout=600)
+    pagina.run()
+    aguardar_atualizador()  # Sem snapshot, a primeira sessão dispara a atualização
+    pagina.run()
+    return pagina
+
+
+def _conferir_sessoes(armazem):
+    with open("config.json", "w", encoding="utf-8") as f:
+        json.dump({"CLIENT_ID": "cliente", "CLIENT_SECRET": "segredo", "REFRESH_TOKEN": "renovacao",
+                   "PASTA_ID_ORCAMENTO": "pasta", "PAINEL_ATUALIZACAO_MINUTOS": 0}, f)
+    from pages.cache_visoes import estatisticas_caches_visoes
+
+    primeira = _abrir_painel()
+    telas_primeira = _percorrer(primeira)
+    depois_primeira = estatisticas_caches_visoes()["painel"]
+
+    segunda = _abrir_painel()
+    telas_segunda = _percorrer(segunda)
+    depois_segunda = estatisticas_caches_visoes()["painel"]
+    assert telas_segunda == telas_primeira, "a sessão servida pelo cache viu outra tela"
+    assert depois_segunda["falhas"] == depois_primeira["falhas"], (depois_primeira, depois_segunda)
+    assert depois_segunda["acertos"] > depois_primeira["acertos"], (depois_primeira, depois_segunda)
+    assert any(graficos for _, graficos in telas_segunda), "nenhum gráfico foi conferido"
+
+    # Uma planilha muda no Drive e o Painel é atualizado: a versão nova descarta as visões guardadas
+    file_id, nome = PLANILHAS_PAINEL[0]
+    armazem.substituir(file_id, _planilha_objeto(0, nome, 45, random.Random(2), []))
+    anterior = aguardar_atualizador()["ultimo_fim"]
+    segunda.sidebar.button[0].click().run()
+    estado = aguardar_atualizador(anterior, nova=True)
+    assert estado["ultimo_erro"] is None, estado["ultimo_erro"]
+    _percorrer(_abrir_painel())
+    depois_atualizacao = estatisticas_caches_visoes()["painel"]
+    assert depois_atualizacao["invalidacoes"] > depois_segunda["invalidacoes"], depois_atualizacao
+    assert depois_atualizacao["falhas"] > depois_segunda["falhas"], depois_atualizacao
+    return telas_primeira, depois_primeira, depois_segunda, depois_atualizacao
+
+
+def conferir_cache_visoes():
+    armazem = _armazem()
+    servidor = iniciar_servidor(armazem, PORTA)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    origem = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as diretorio:
+            # config.json, snapshot e caches em disco são relativos ao diretório de trabalho
+            os.chdir(diretorio)
+            try:
+                telas_primeira, depois_primeira, depois_segunda, depois_atualizacao = _conferir_sessoes(armazem)
+            finally:
+                os.chdir(origem)
+    finally:
+        servidor.shutdown()
+
+    print(f"cache de visões ({len(telas_primeira)} telas): segunda sessão igual à primeira, "
+          f"{depois_segunda['acertos'] - depois_primeira['acertos']} acertos e nenhuma falha nova; "
+          f"a atualização invalidou o cache ({depois_atualizacao['invalidacoes']} invalidações)")
+
+
+if __name__ == "__main__":
+    conferir_cache_visoes()
@@ -0,0 +1,93 @@
+"""Confere o caminho do CSV do Painel contra o Drive falso: cópia convertida, export, cache em disco e leitura.
+
+Roda de qualquer diretório: python benchmarks/conferir_exportacao_csv.py
+"""
+import io
+import os
+import sys
+import tempfile
+import threading
+
+# A raiz do repositório no caminho, para importar pages.* e o servidor falso fora dela
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORTA = 8799
+os.environ["URL_API_GOOGLE"] = f"http://127.0.0.1:{PORTA}"  # Lida na importação de drive_google e token_google
+
+import pandas as pd
+from openpyxl import Workbook
+
+from benchmarks.medir_calculos import CORPUS_ACENTOS
+from pages.cache_drive import CacheArquivos
+from pages.calculos_painel import converter_monetario_coluna, detectar_codificacao, ler_csv_exportado
+from pages.drive_google import ClienteDrive
+from pages.token_google import GerenciadorToken
+from servidor_drive_fake import ArmazemDrive, iniciar_servidor, xlsx_para_csv
+
+
+def _planilha_acentuada(repeticoes):
+    livro = Workbook()
+    aba = livro.active
+    aba.append(["Regiao", "Objeto", "Descricao", "Ocorrencia", "Valor"])
+    for i in range(repeticoes):
+        for regiao, objeto, descricao, ocorrencia in CORPUS_ACENTOS:
+            aba.append([regiao, objeto, descricao, ocorrencia, f"R$ {i},00"])
+    saida = io.BytesIO()
+    livro.save(saida)
+    return saida.getvalue()
+
+
+def conferir_exportacao_csv(repeticoes=200):
+    """O CSV exportado chega em bytes, vai assim para o cache e, lido de um ou de outro, tem os mesmos textos
+    acentuados da planilha original."""
+    conteudo = _planilha_acentuada(repeticoes)
+    armazem = ArmazemDrive()
+    armazem.adicionar("planilha-acentos", "Acentos.xlsx", conteudo)
+    servidor = iniciar_servidor(armazem, PORTA)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as diretorio:
+            drive = ClienteDrive(GerenciadorToken("cliente", "segredo", "renovacao"), cache=CacheArquivos(diretorio))
+            copia = drive.copiar_convertendo("planilha-acentos", "Acentos.xlsx")
+            exportado = drive.exportar_csv(copia)
+            drive.excluir_arquivo(copia)
+            assert isinstance(exportado, bytes), type(exportado)
+            drive.cache.gravar("csv", exportado)
+
+            esperado = pd.read_excel(io.BytesIO(conteudo), dtype=str)
+            for origem in (io.BytesIO(exportado), io.BytesIO(drive.cache.ler("csv"))):
+                pd.testing.assert_frame_equal(ler_csv_exportado(origem, sep=","), esperado)
+    finally:
+        servidor.shutdown()
+
+    # CSV salvo fora do Sheets, em Latin-1: detectado pelos bytes e lido sem estragar os acentos
+    latin1 = esperado.head(len(CORPUS_ACENTOS)).to_csv(index=False).encode("ISO-8859-1", errors="replace")
+    assert detectar_codificacao(latin1) == "ISO-8859-1"
+    assert ler_csv_exportado(io.BytesIO(latin1), sep=",")["Regiao"][0] == "Região Norte"
+    print(f"exportação CSV ({len(esperado)} linhas acentuadas): export e cache lidos iguais à planilha")
+
+
+def conferir_valores_formatados():
+    """Valores em moeda e sem formato saem do export como o Sheets os mostra ("R$ 1.234,56", "1234,5") e a
+    conversão monetária do Painel devolve os números originais."""
+    valores = [1234.56, -987654.32, 0.0, 45678.9, 1370403.6]
+    livro = Workbook()
+    aba = livro.active
+    aba.append(["Moeda", "Geral"])
+    for valor in valores:
+        aba.append([valor, valor])
+        aba.cell(aba.max_row, 1).number_format = "[$R$ ]#,##0.00"
+    saida = io.BytesIO()
+    livro.save(saida)
+
+    df = ler_csv_exportado(xlsx_para_csv(saida.getvalue()), sep=",")
+    assert df["Moeda"][0] == "R$ 1.234,56" and df["Geral"][0] == "1234,56", df.head(1)
+    for coluna in ("Moeda", "Geral"):
+        convertidos = converter_monetario_coluna(df[coluna]).tolist()
+        assert convertidos == valores, (coluna, convertidos)
+    print(f"exportação CSV ({len(valores)} valores): moeda e formato geral voltam aos números da planilha")
+
+
+if __name__ == "__main__":
+    conferir_exportacao_csv()
+    conferir_valores_formatados()
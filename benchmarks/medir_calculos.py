@@ -0,0 +1,333 @@
+"""Medições dos cálculos do Painel (pages/calculos_painel.py), conferindo cada versão otimizada com a anterior.
+
+Roda de qualquer diretório: python benchmarks/medir_calculos.py
+"""
+import calendar
+import os
+import sys
+import time
+from datetime import date
+
+# A raiz do repositório no caminho, para importar pages.* fora dela
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from pages.calculos_painel import (converter_monetario, converter_monetario_coluna, converter_colunas_monetarias,
+                                   evolucao_para_formato_longo, identificar_meses, compactar_painel, indexar_notas,
+                                   linhas_da_nota, montar_cubo, preencher_valor_anual_proporcional, relatar_memoria,
+                                   COLUNAS_DIMENSAO_EVOLUCAO, MESES_ABREVIADOS, MESES_PAINEL, OCORRENCIAS_ANO_CHEIO,
+                                   TIPOS_METRICA_EVOLUCAO)
+
+
+def _valores_brl_aleatorios(linhas, semente=0):
+    """Coluna parecida com a exportada do Sheets: R$ com milhar, negativos, vazios e traços."""
+    gerador = np.random.default_rng(semente)
+    centavos = gerador.integers(-10 ** 9, 10 ** 9, linhas)
+    textos = [
+        f"R$ {valor / 100:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        for valor in centavos
+    ]
+    coluna = pd.Series(textos, dtype=object)
+    coluna[::7] = np.nan
+    coluna[::11] = " "
+    coluna[::13] = "R$ -"
+    coluna[::17] = "1.234"
+    return coluna
+
+
+def _medir(funcao, repeticoes=3):
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempo = time.perf_counter() - inicio
+        melhor = tempo if melhor is None else min(melhor, tempo)
+    return melhor, resultado
+
+
+def medir_conversao(linhas=100_000, colunas=19):
+    """Compara a conversão célula a célula com a vetorizada (linhas por segundo) e confere os resultados.
+
+    Mede o parser sozinho e a etapa do Painel como era: cada planilha convertida duas vezes
+    (principal e complementar) e o "Valor Mensal" limpo de novo no cálculo do proporcional.
+    """
+    df = pd.DataFrame({f"Valor {i}": _valores_brl_aleatorios(linhas, semente=i) for i in range(colunas)})
+    com_contrato = np.arange(linhas) % 5 != 0  # ~20% de linhas complementares (sem contrato)
+
+    def celula_a_celula():
+        principal = df[com_contrato].apply(lambda coluna: coluna.apply(converter_monetario))
+        complementar = df.apply(lambda coluna: coluna.apply(converter_monetario))
+        principal.iloc[:, 0] = principal.iloc[:, 0].apply(converter_monetario)
+        return complementar
+
+    etapas = [
+        ("parser", lambda: df.apply(lambda coluna: coluna.apply(converter_monetario)),
+         lambda: converter_colunas_monetarias(df.copy(), df.columns)),
+        ("etapa do Painel", celula_a_celula, lambda: converter_colunas_monetarias(df.copy(), df.columns)),
+    ]
+    print(f"{linhas} linhas x {colunas} colunas monetárias")
+    for nome, antes, depois in etapas:
+        tempo_antes, resultado_antes = _medir(antes)
+        tempo_depois, resultado_depois = _medir(depois)
+        pd.testing.assert_frame_equal(resultado_antes, resultado_depois)
+        print(f"{nome}: célula a célula {linhas / tempo_antes:,.0f} linhas/s, "
+              f"vetorizado {linhas / tempo_depois:,.0f} linhas/s ({tempo_antes / tempo_depois:.1f}x)")
+
+
+def _preencher_valor_anual_proporcional_linha_a_linha(df, ano_referencia):
+    """Cálculo original, linha a linha; fica como referência para conferir a versão vetorizada."""
+    def calcular_proporcional(data_inicio, data_fim, valor_mensal):
+        dias_total = 0
+        current = pd.Timestamp(data_inicio.year, data_inicio.month, 1)
+
+        while current.date() <= data_fim:
+            _, dias_mes = calendar.monthrange(current.year, current.month)
+            inicio_mes = current
+            fim_mes = current.replace(day=dias_mes)
+
+            # Ajusta os limites
+            if pd.Timestamp(data_inicio) > inicio_mes:
+                inicio_mes = pd.Timestamp(data_inicio)
+            if pd.Timestamp(data_fim) < fim_mes:
+                fim_mes = pd.Timestamp(data_fim)
+
+            dias_no_mes = (fim_mes - inicio_mes).days + 1
+
+            # Verifica se o mês deve ser contado como cheio
+            if inicio_mes.day == 1 and fim_mes.day == dias_mes:
+                valor_mes = valor_mensal
+            else:
+                valor_mes = (valor_mensal / dias_mes) * dias_no_mes
+
+            dias_total += valor_mes
+            current += pd.DateOffset(months=1)
+            current = current.replace(day=1)
+
+        return dias_total
+
+    df['Valor Mensal'] = converter_monetario_coluna(df['Valor Mensal'])
+    df['Ocorrência'] = df['Ocorrência'].astype(str).str.strip().str.lower()
+    df['Data de Ocorrência'] = pd.to_datetime(df['Data de Ocorrência'], dayfirst=True, errors='coerce')
+    df['Valor Anual Proporcional'] = None  # zera antes de preencher
+
+    for i, row in df.iterrows():
+        ocorrencia = row['Ocorrência']
+        data_ocorrencia = row['Data de Ocorrência']
+        valor_mensal = row['Valor Mensal']
+
+        if pd.isnull(valor_mensal) or valor_mensal == 0:
+            continue
+
+        if ocorrencia == 'inicio' and not pd.isnull(data_ocorrencia):
+            inicio_data = data_ocorrencia.date()
+            fim_data = date(ano_referencia, 12, 31)
+
+            if inicio_data <= fim_data:
+                valor_total = calcular_proporcional(inicio_data, fim_data, valor_mensal)
+                df.at[i, 'Valor Anual Proporcional'] = round(valor_total, 2)
+            continue
+
+        elif ocorrencia == 'rescisão' and not pd.isnull(data_ocorrencia):
+            fim_data = data_ocorrencia.date()
+            inicio_data = date(ano_referencia, 1, 1)
+
+            if inicio_data <= fim_data:
+                valor_total = calcular_proporcional(inicio_data, fim_data, valor_mensal)
+                df.at[i, 'Valor Anual Proporcional'] = round(valor_total, 2)
+            continue
+
+        elif ocorrencia in OCORRENCIAS_ANO_CHEIO or pd.isnull(ocorrencia):
+            df.at[i, 'Valor Anual Proporcional'] = round(valor_mensal * 12, 2)
+            continue
+
+    return df
+
+
+def _contratos_aleatorios(linhas, semente=0):
+    """Linhas de contrato com início, rescisão e ano cheio, datas dentro e fora do ano de referência."""
+    gerador = np.random.default_rng(semente)
+    datas = pd.Timestamp("2024-06-01") + pd.to_timedelta(gerador.integers(0, 800, linhas), unit="D")
+    return pd.DataFrame({
+        "Valor Mensal": np.round(gerador.uniform(-1000, 250_000, linhas), 2) * (gerador.random(linhas) > 0.05),
+        "Ocorrência": gerador.choice(["Inicio", "rescisão ", "nan", "Reajuste", "outro", "prorrogação"], linhas),
+        "Data de Ocorrência": np.where(gerador.random(linhas) > 0.1, datas.strftime("%d/%m/%Y"), ""),
+    })
+
+
+def medir_proporcional(linhas=5_000, ano_referencia=2025):
+    """Compara o valor anual proporcional linha a linha com o vetorizado e confere os resultados."""
+    df = _contratos_aleatorios(linhas)
+    tempo_antes, antes = _medir(lambda: _preencher_valor_anual_proporcional_linha_a_linha(df.copy(), ano_referencia), 1)
+    tempo_depois, depois = _medir(lambda: preencher_valor_anual_proporcional(df.copy(), ano_referencia))
+
+    esperado = antes['Valor Anual Proporcional'].astype(np.float64).to_numpy()
+    obtido = depois['Valor Anual Proporcional'].to_numpy()
+    assert np.array_equal(esperado, obtido, equal_nan=True), "valores diferentes do cálculo linha a linha"
+    print(f"valor anual proporcional ({linhas} contratos): linha a linha {linhas / tempo_antes:,.0f} linhas/s, "
+          f"vetorizado {linhas / tempo_depois:,.0f} linhas/s ({tempo_antes / tempo_depois:.1f}x)")
+
+
+# Nomes acentuados como os das planilhas (regiões, objetos, ocorrências); também usados em conferir_exportacao_csv.py
+CORPUS_ACENTOS = [
+    ("Região Norte", "Vigilância Armada", "Conservação e Limpeza", "rescisão"),
+    ("São Paulo", "Locação de Imóvel", "Manutenção Predial", "início"),
+    ("Goiânia", "Ar-condicionado (manutenção)", "Serviço contínuo", "não informado"),
+    ("Brasília – DF", "Água e Esgoto", "Energia Elétrica", "ajuste"),
+    ("Maceió", "Copeiragem ç ã õ é ê í ó ú ü", "Prorrogação nº 2", "reajuste"),
+    ("Ribeirão Preto", "Serviços Gráficos", "Recepção/Portaria", "outro"),
+]
+
+
+def _evolucao_linha_a_linha(df_raw, meses, tipos=TIPOS_METRICA_EVOLUCAO):
+    """Reformatação original (linhas x meses x métricas); fica como referência para conferir a vetorizada."""
+    dados = []
+    for _, row in df_raw.iterrows():
+        nota = row.get("Unnamed: 0")
+        favorecido = row.get("Unnamed: 2")
+
+        for mes in meses:
+            for i, tipo in enumerate(tipos):
+                col_index = 3 + meses.index(mes) * 3 + i
+                if col_index < len(row):
+                    valor = row.iloc[col_index]
+
+                    if isinstance(valor, str):
+                        valor = valor.replace('.', '').replace(',', '.')
+                    try:
+                        valor = float(valor)
+                    except:
+                        valor = 0.0
+
+                    dados.append({
+                        "Nota de Empenho": nota,
+                        "Favorecido": favorecido,
+                        "Mês": mes,
+                        "Tipo de Métrica": tipo,
+                        "Valor (R$)": valor
+                    })
+    return pd.DataFrame(dados)
+
+
+def _relatorio_evolucao_aleatorio(notas, meses=12, ano=2025, semente=0):
+    """Relatório largo como o exportado (rótulo do mês só na primeira coluna de cada grupo, valores em texto)."""
+    gerador = np.random.default_rng(semente)
+    colunas = {"Unnamed: 0": [f"2025NE{i:06d}" for i in range(notas)], "Unnamed: 1": [""] * notas,
+               "Unnamed: 2": gerador.choice(["Empresa Alfa Ltda", "Serviços Beta S.A.", "Gama Conservação"], notas)}
+    for m in range(meses):
+        for i in range(3):
+            nome = f"{MESES_ABREVIADOS[m]}/{ano}" if i == 0 else f"Unnamed: {3 + m * 3 + i}"
+            valores = gerador.integers(0, 10 ** 8, notas) / 100
+            colunas[nome] = [f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") for v in valores]
+    return pd.DataFrame(colunas)
+
+
+def medir_evolucao(notas=(500, 2_000, 8_000), meses=12):
+    """Compara a reformatação linha a linha com a vetorizada num ano inteiro de notas e confere os resultados."""
+    for quantidade in notas:
+        df_raw = _relatorio_evolucao_aleatorio(quantidade, meses)
+        rotulos = [mes for mes, _ in identificar_meses(df_raw.columns)]
+        tempo_antes, antes = _medir(lambda: _evolucao_linha_a_linha(df_raw, rotulos), 1)
+        tempo_depois, depois = _medir(lambda: evolucao_para_formato_longo(df_raw, identificar_meses(df_raw.columns)))
+        pd.testing.assert_frame_equal(antes, depois)
+        print(f"evolução ({quantidade} notas x {meses} meses): linha a linha {tempo_antes:.2f}s, "
+              f"vetorizado {tempo_depois:.3f}s ({tempo_antes / tempo_depois:.0f}x)")
+
+
+def _painel_aleatorio(linhas, semente=0):
+    """Linhas do painel com as dimensões repetidas como nas planilhas e valores com centavos."""
+    gerador = np.random.default_rng(semente)
+    df = _contratos_aleatorios(linhas, semente)
+    df["Regiao"] = gerador.choice([regiao for regiao, _, _, _ in CORPUS_ACENTOS], linhas)
+    df["Fonte"] = gerador.choice(["Vigilância.xlsx", "Locação de Imóvel.xlsx", "Diversos.xlsx"], linhas)
+    df["Contrato"] = [f"{numero:03d}/2024" for numero in gerador.integers(0, linhas // 4 + 1, linhas)]
+    df["Objeto"] = gerador.choice([objeto for _, objeto, _, _ in CORPUS_ACENTOS], linhas)
+    df["Status"] = gerador.choice(["Repactuado", "Aguardando reajuste", "Em análise"], linhas)
+    for coluna in ["Valor Empenhado", "Valor Pago", "Valor Anual"]:
+        df[coluna] = gerador.integers(0, 10 ** 9, linhas) / 100
+    return df
+
+
+def medir_compactacao(linhas=50_000):
+    """Bytes por linha antes e depois da compactação e os mesmos totais (por região e objeto) no painel."""
+    colunas_valores = ["Valor Mensal", "Valor Empenhado", "Valor Pago", "Valor Anual"]
+    antes = _painel_aleatorio(linhas)
+    depois = compactar_painel(antes, colunas_valores)
+
+    assert (antes["Contrato"] == depois["Contrato"].astype(object)).all()
+    for dimensao in ["Regiao", "Fonte"]:
+        total_antes = antes.groupby(dimensao)[colunas_valores].sum()
+        total_depois = depois.groupby(dimensao, observed=True)[colunas_valores].sum()
+        total_depois.index = total_depois.index.astype(object)
+        pd.testing.assert_frame_equal(total_antes.round(2), total_depois.round(2))
+    relatar_memoria(f"compactação ({linhas} linhas)", antes, depois)
+
+
+def medir_cubo(linhas=(5_000, 50_000, 200_000)):
+    """Visão geral (totais, por região e por objeto) a partir das linhas e a partir do cubo, com os mesmos valores."""
+    colunas_valores = ["Valor Mensal", "Valor Empenhado", "Valor Pago", "Valor Anual"]
+    for quantidade in linhas:
+        df = _painel_aleatorio(quantidade)
+        gerador = np.random.default_rng(quantidade)
+        for mes in MESES_PAINEL:
+            df[mes] = gerador.integers(0, 10 ** 7, quantidade) / 100
+        df = preencher_valor_anual_proporcional(df, 2025)
+        df = compactar_painel(df, colunas_valores + MESES_PAINEL + ["Valor Anual Proporcional"])
+
+        def pelas_linhas():
+            regiao = df.assign(Regiao=df["Regiao"].str.strip().str.upper())
+            diferenca = df["Valor Empenhado"] - df["Valor Anual Proporcional"]
+            return (len(df), df[["Valor Anual", "Valor Empenhado", "Valor Pago"]].sum(),
+                    diferenca[diferenca > 0].sum(), diferenca[diferenca < 0].sum(),
+                    regiao.groupby("Regiao")[["Valor Anual", "Valor Empenhado", "Valor Pago"]].sum(),
+                    df.groupby("Fonte", observed=True)[["Valor Anual", "Valor Empenhado", "Valor Pago"]].sum())
+
+        cubo = montar_cubo(df)
+        resumo = cubo[cubo["Contrato"].isna()]
+
+        def pelo_cubo():
+            return (resumo["Linhas"].sum(), resumo[["Valor Anual", "Valor Empenhado", "Valor Pago"]].sum(),
+                    resumo["Valor a Anular"].sum(), resumo["Valor a Reforçar"].sum(),
+                    resumo.groupby("Regiao", observed=True)[["Valor Anual", "Valor Empenhado", "Valor Pago"]].sum(),
+                    resumo.groupby("Fonte", observed=True)[["Valor Anual", "Valor Empenhado", "Valor Pago"]].sum())
+
+        tempo_antes, antes = _medir(pelas_linhas)
+        tempo_depois, depois = _medir(pelo_cubo)
+        assert antes[0] == depois[0]
+        pd.testing.assert_series_equal(antes[1].round(2), depois[1].round(2))
+        assert round(antes[2], 2) == round(depois[2], 2) and round(antes[3], 2) == round(depois[3], 2)
+        for tabela_antes, tabela_depois in zip(antes[4:], depois[4:]):
+            tabela_depois.index = tabela_depois.index.astype(object)
+            tabela_antes.index = tabela_antes.index.astype(object)
+            pd.testing.assert_frame_equal(tabela_antes.round(2), tabela_depois.round(2))
+        print(f"visão geral ({quantidade} linhas, cubo com {len(resumo)} totais): pelas linhas {tempo_antes * 1000:.1f}ms, "
+              f"pelo cubo {tempo_depois * 1000:.1f}ms")
+
+
+def medir_indice_notas(notas=8_000, consultas=50):
+    """Busca das linhas de cada nota por regex na tabela inteira e pelo índice, com os mesmos resultados."""
+    df_raw = _relatorio_evolucao_aleatorio(notas)
+    df = compactar_painel(evolucao_para_formato_longo(df_raw, identificar_meses(df_raw.columns)), ["Valor (R$)"],
+                          COLUNAS_DIMENSAO_EVOLUCAO, colunas_data=[])
+    procuradas = list(df_raw["Unnamed: 0"].sample(consultas, random_state=0))
+
+    def por_regex():
+        return [df[df["Nota de Empenho"].astype(str).str.contains(str(nota), na=False)] for nota in procuradas]
+
+    tempo_indice, indice = _medir(lambda: indexar_notas(df))
+    tempo_antes, antes = _medir(por_regex, 1)
+    tempo_depois, depois = _medir(lambda: [linhas_da_nota(df, indice, nota) for nota in procuradas])
+    for esperado, obtido in zip(antes, depois):
+        pd.testing.assert_frame_equal(esperado, obtido)
+    print(f"notas ({len(df)} linhas de evolução, {consultas} consultas): regex {tempo_antes * 1000 / consultas:.1f}ms "
+          f"por nota, índice {tempo_depois * 1000 / consultas:.3f}ms por nota (montagem {tempo_indice * 1000:.0f}ms)")
+
+
+if __name__ == "__main__":
+    medir_conversao()
+    medir_proporcional()
+    medir_evolucao()
+    medir_compactacao()
+    medir_cubo()
+    medir_indice_notas()
@@ -0,0 +1,42 @@
+"""Medições do snapshot do Painel (pages/snapshot_painel.py).
+
+Roda de qualquer diretório: python benchmarks/medir_snapshot.py
+"""
+import os
+import sys
+import tempfile
+
+# A raiz do repositório no caminho, para importar pages.* fora dela
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from benchmarks.medir_calculos import _relatorio_evolucao_aleatorio, _medir
+from pages.calculos_painel import (evolucao_para_formato_longo, identificar_meses, compactar_painel,
+                                   COLUNAS_DIMENSAO_EVOLUCAO)
+from pages.snapshot_painel import SnapshotPainel, gravar_evolucao, _expandir, CAMINHO_EVOLUCAO
+
+
+def medir_carga_evolucao(notas=50_000):
+    """Carga fria da evolução: Parquet lido e expandido (cópia) contra Arrow IPC mapeado em memória."""
+    df_raw = _relatorio_evolucao_aleatorio(notas)
+    df = compactar_painel(evolucao_para_formato_longo(df_raw, identificar_meses(df_raw.columns)), ["Valor (R$)"],
+                          COLUNAS_DIMENSAO_EVOLUCAO, colunas_data=[])
+    with tempfile.TemporaryDirectory() as destino:
+        gravar_evolucao(destino, df, ["Valor (R$)"])
+        alocado = pa.total_allocated_bytes()
+        tempo_parquet, antes = _medir(lambda: _expandir(pq.read_table(os.path.join(destino, CAMINHO_EVOLUCAO))))
+        copia_parquet = pa.total_allocated_bytes() - alocado
+        alocado = pa.total_allocated_bytes()
+        tempo_mapa, depois = _medir(lambda: SnapshotPainel(destino).evolucao())
+        copia_mapa = pa.total_allocated_bytes() - alocado
+        pd.testing.assert_frame_equal(antes, depois)
+        del antes, depois
+    print(f"evolução ({len(df)} linhas): Parquet {tempo_parquet * 1000:.0f}ms ({copia_parquet / 2 ** 20:.1f} MB "
+          f"em buffers Arrow), mapeada {tempo_mapa * 1000:.1f}ms ({copia_mapa / 2 ** 20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    medir_carga_evolucao()
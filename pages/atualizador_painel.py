@@ -0,0 +1,148 @@
+import threading
+import time
+
+
+ATUALIZACAO_MINUTOS = 60  # Intervalo da atualização automática do painel (0 desliga; o botão continua valendo)
+SEGUNDOS_ACOMPANHAMENTO = 5  # De quanto em quanto tempo a tela confere o estado da atualização
+
+
+class AtualizadorPainel:
+    """Roda a atualização do painel numa thread do processo, na agenda ou quando alguém pede.
+
+    A tarefa recebe completo=True/False quando pedida pela tela e None quando é a execução agendada.
+    Nenhum rerun espera por ela: a tarefa grava e publica um snapshot novo, e as sessões passam a usá-lo
+    no rerun seguinte. Só uma atualização roda por vez; um pedido durante outra é recusado.
+
+    A thread não tem contexto do Streamlit (st.error ali não aparece em tela nenhuma): problemas que não
+    interrompem a tarefa, como uma planilha que não baixou, são registrados com avisar() e saem em estado().
+    """
+
+    def __init__(self, tarefa, intervalo_minutos=ATUALIZACAO_MINUTOS, imediata=False):
+        self._tarefa = tarefa
+        self.intervalo = intervalo_minutos * 60
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._pedido = None  # completo=True/False de um pedido pendente
+        self.atualizando = False
+        self.inicio = None
+        self.ultimo_fim = None
+        self.ultima_duracao = None
+        self.ultimo_erro = None
+        self.reprocessadas = None
+        self.avisos = []  # Avisos da execução mais recente (ou da em andamento)
+        self.execucoes = 0
+        self.falhas = 0
+        self.proxima = time.time() if imediata else (time.time() + self.intervalo if self.intervalo else None)
+        self._thread = threading.Thread(target=self._laco, name="atualizador-painel", daemon=True)
+        self._thread.start()
+
+    def _laco(self):
+        while True:
+            with self._lock:
+                espera = None if self.proxima is None else max(0.0, self.proxima - time.time())
+            self._acordar.wait(espera)
+            self._acordar.clear()
+            with self._lock:
+                completo = self._pedido
+                self._pedido = None
+                if completo is None and (self.proxima is None or time.time() < self.proxima):
+                    continue  # Acordou só porque a agenda mudou
+                self.atualizando = True
+                self.inicio = time.time()
+                self.avisos = []
+            self._executar(completo)
+
+    def _executar(self, completo):
+        erro = None
+        reprocessadas = None
+        with self._lock:
+            tarefa = self._tarefa
+        try:
+            reprocessadas = tarefa(completo)
+        except Exception as e:
+            erro = str(e)
+            print(f"Erro na atualização do painel em segundo plano: {e}")
+        with self._lock:
+            self.atualizando = False
+            self.ultimo_fim = time.time()
+            self.ultima_duracao = round(self.ultimo_fim - self.inicio, 1)
+            self.ultimo_erro = erro
+            self.reprocessadas = reprocessadas
+            self.execucoes += 1
+            self.falhas += erro is not None
+            self.proxima = self.ultimo_fim + self.intervalo if self.intervalo else None
+
+    def avisar(self, mensagem):
+        """Registra um problema da execução em andamento para a tela mostrar quando ela terminar."""
+        print(f"⚠️ {mensagem}")
+        with self._lock:
+            self.avisos.append(mensagem)
+
+    def solicitar(self, completo=False):
+        """Pede uma atualização agora. Retorna False se já há uma em andamento ou na fila."""
+        with self._lock:
+            if self.atualizando or self._pedido is not None:
+                return False
+            self._pedido = completo
+        self._acordar.set()
+        return True
+
+    def configurar(self, tarefa, intervalo_minutos):
+        """Usa a tarefa do rerun mais recente (com a configuração atual) e reagenda se o intervalo mudou."""
+        with self._lock:
+            self._tarefa = tarefa
+            if intervalo_minutos * 60 == self.intervalo:
+                return
+            self.intervalo = intervalo_minutos * 60
+            referencia = self.ultimo_fim or time.time()
+            self.proxima = referencia + self.intervalo if self.intervalo else None
+        self._acordar.set()
+
+    def estado(self):
+        with self._lock:
+            return {
+                "atualizando": self.atualizando,
+                "inicio": self.inicio,
+                "ultimo_fim": self.ultimo_fim,
+                "ultima_duracao": self.ultima_duracao,
+                "ultimo_erro": self.ultimo_erro,
+                "reprocessadas": self.reprocessadas,
+                "avisos": list(self.avisos),
+                "proxima": self.proxima,
+                "intervalo_minutos": self.intervalo / 60,
+                "execucoes": self.execucoes,
+                "falhas": self.falhas,
+            }
+
+
+# Um atualizador por processo do Streamlit, criado na primeira vez que a página do painel roda
+_atualizadores = {}
+_lock_atualizadores = threading.Lock()
+
+
+def obter_atualizador(tarefa, intervalo_minutos=ATUALIZACAO_MINUTOS, imediata=False):
+    with _lock_atualizadores:
+        if "painel" not in _atualizadores:
+            _atualizadores["painel"] = AtualizadorPainel(tarefa, intervalo_minutos, imediata)
+        atualizador = _atualizadores["painel"]
+    atualizador.configurar(tarefa, intervalo_minutos)
+    return atualizador
+
+
+def avisar_atualizador(mensagem):
+    """avisar() do atualizador do processo, para as funções que a tarefa chama.
+
+    Espera obter_atualizador terminar: com imediata=True a tarefa começa antes de a página receber o atualizador.
+    """
+    with _lock_atualizadores:
+        atualizador = _atualizadores.get("painel")
+    if atualizador is None:
+        print(f"⚠️ {mensagem}")
+        return
+    atualizador.avisar(mensagem)
+
+
+def estatisticas_atualizador():
+    with _lock_atualizadores:
+        atualizador = _atualizadores.get("painel")
+    return atualizador.estado() if atualizador is not None else None
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+DIRETORIO_CACHE = ".cache_drive"
+TAMANHO_CACHE_MB = 200
+
+
+def impressao_digital(metadados, variante=""):
+    """Chave do conteúdo: md5Checksum quando o Drive informa, senão o modifiedTime do arquivo."""
+    if metadados.get("md5Checksum"):
+        impressao = f"md5:{metadados['md5Checksum']}"
+    else:
+        impressao = f"mod:{metadados['id']}:{metadados.get('modifiedTime')}"
+    return f"{impressao}:{variante}" if variante else impressao
+
+
+class CacheArquivos:
+    """Cache em disco do conteúdo baixado do Drive, endereçado pela impressão digital do arquivo.
+
+    Quando o total passa do limite, os itens usados há mais tempo são removidos (LRU). O índice em disco
+    só é regravado quando um item entra ou sai; o último uso de cada acerto fica em memória até lá.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_CACHE, tamanho_maximo_mb=TAMANHO_CACHE_MB):
+        self.diretorio = diretorio
+        self.tamanho_maximo = int(tamanho_maximo_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self.bytes_economizados = 0
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._caminho_indice = os.path.join(self.diretorio, "indice.json")
+        self._indice = self._carregar_indice()
+
+    def _carregar_indice(self):
+        try:
+            with open(self._caminho_indice, "r") as f:
+                indice = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Descarta entradas cujo arquivo sumiu do disco
+        return {chave: item for chave, item in indice.items() if os.path.exists(self._caminho(chave))}
+
+    def _salvar_indice(self):
+        temporario = self._caminho_indice + ".tmp"
+        with open(temporario, "w") as f:
+            json.dump(self._indice, f)
+        os.replace(temporario, self._caminho_indice)
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, hashlib.sha1(chave.encode()).hexdigest() + ".bin")
+
+    def ler(self, chave):
+        """Retorna os bytes guardados para a chave, ou None se não estiver no cache."""
+        with self._lock:
+            item = self._indice.get(chave)
+            if item is None:
+                self.falhas += 1
+                return None
+            try:
+                with open(self._caminho(chave), "rb") as f:
+                    conteudo = f.read()
+            except OSError:
+                del self._indice[chave]
+                self.falhas += 1
+                return None
+            item["ultimo_uso"] = time.time()
+            self.acertos += 1
+            self.bytes_economizados += len(conteudo)
+            return conteudo
+
+    def contem(self, chave):
+        """Diz se a chave está no cache, sem ler o conteúdo nem contar acerto ou falha."""
+        with self._lock:
+            return chave in self._indice
+
+    def gravar(self, chave, conteudo):
+        if len(conteudo) > self.tamanho_maximo:
+            return
+        with self._lock:
+            caminho = self._caminho(chave)
+            temporario = caminho + ".tmp"
+            with open(temporario, "wb") as f:
+                f.write(conteudo)
+            os.replace(temporario, caminho)
+            self._indice[chave] = {"tamanho": len(conteudo), "ultimo_uso": time.time()}
+            self._remover_excedente()
+            self._salvar_indice()
+
+    def _remover_excedente(self):
+        total = sum(item["tamanho"] for item in self._indice.values())
+        for chave, item in sorted(self._indice.items(), key=lambda par: par[1]["ultimo_uso"]):
+            if total <= self.tamanho_maximo:
+                break
+            try:
+                os.remove(self._caminho(chave))
+            except OSError:
+                pass
+            del self._indice[chave]
+            total -= item["tamanho"]
+            self.remocoes += 1
+
+    def estatisticas(self):
+        with self._lock:
+            total_consultas = self.acertos + self.falhas
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": round(self.acertos / total_consultas, 3) if total_consultas else None,
+                "remocoes": self.remocoes,
+                "itens": len(self._indice),
+                "tamanho_mb": round(sum(item["tamanho"] for item in self._indice.values()) / 1024 / 1024, 2),
+                "mb_economizados": round(self.bytes_economizados / 1024 / 1024, 2),
+            }
+
+
+_caches = {}
+_lock_caches = threading.Lock()
+
+
+def obter_cache_arquivos(tamanho_maximo_mb=TAMANHO_CACHE_MB, diretorio=DIRETORIO_CACHE):
+    with _lock_caches:
+        if diretorio not in _caches:
+            _caches[diretorio] = CacheArquivos(diretorio, tamanho_maximo_mb)
+        return _caches[diretorio]
+
+
+def estatisticas_caches():
+    with _lock_caches:
+        caches = list(_caches.values())
+    return [cache.estatisticas() for cache in caches]
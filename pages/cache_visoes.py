@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+
+ITENS_CACHE_VISOES = 256  # Visões filtradas e figuras guardadas em memória no processo
+
+
+class CacheVisoes:
+    """Cache em memória de tabelas filtradas, agregados e figuras do painel, compartilhado entre sessões.
+
+    A chave começa pela versão do snapshot: quando aparece uma versão nova, tudo que foi montado com a
+    anterior é descartado. Passando do limite de itens, sai o usado há mais tempo (LRU).
+    Os objetos guardados são compartilhados; quem os recebe não deve alterá-los.
+    """
+
+    def __init__(self, max_itens=ITENS_CACHE_VISOES):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._versao = None
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self.invalidacoes = 0
+
+    def _trocar_versao(self, versao):
+        if versao != self._versao:
+            if self._itens:
+                self.invalidacoes += 1
+            self._itens.clear()
+            self._versao = versao
+
+    def obter(self, versao, chave, calcular):
+        """Retorna o valor guardado para (versão, chave) ou o calcula com calcular() e guarda."""
+        with self._lock:
+            self._trocar_versao(versao)
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave]
+            self.falhas += 1
+
+        # Calcula fora do lock: outras sessões não esperam por uma visão que não é a delas
+        valor = calcular()
+
+        with self._lock:
+            if versao == self._versao:
+                self._itens[chave] = valor
+                self._itens.move_to_end(chave)
+                while len(self._itens) > self.max_itens:
+                    self._itens.popitem(last=False)
+                    self.remocoes += 1
+        return valor
+
+    def invalidar(self):
+        with self._lock:
+            self._itens.clear()
+            self._versao = None
+            self.invalidacoes += 1
+
+    def estatisticas(self):
+        with self._lock:
+            total_consultas = self.acertos + self.falhas
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": round(self.acertos / total_consultas, 3) if total_consultas else None,
+                "remocoes": self.remocoes,
+                "invalidacoes": self.invalidacoes,
+                "itens": len(self._itens),
+            }
+
+
+# Um cache por nome (página), vivo enquanto o processo do Streamlit estiver de pé
+_caches = {}
+_lock_caches = threading.Lock()
+
+
+def obter_cache_visoes(nome, max_itens=ITENS_CACHE_VISOES):
+    with _lock_caches:
+        if nome not in _caches:
+            _caches[nome] = CacheVisoes(max_itens)
+        return _caches[nome]
+
+
+def estatisticas_caches_visoes():
+    with _lock_caches:
+        caches = dict(_caches)
+    return {nome: cache.estatisticas() for nome, cache in caches.items()}
@@ -0,0 +1,416 @@
+import io
+import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# Número já limpo (sem R$, espaços e milhar, vírgula trocada por ponto) que o float() aceita
+_NUMERO_LIMPO = r"^[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?$"
+# Restos comuns de células sem número ("R$ -", vazias): o float() falha e o valor fica 0.0
+_SEM_NUMERO = ["", "-", "+"]
+
+
+# Função para limpar e converter valores monetários
+def converter_monetario(valor):
+    if isinstance(valor, str):  # Verificar se é uma string
+        valor = valor.strip()  # Remover espaços extras no início e no fim
+        valor = valor.replace("R$", "")  # Remover o símbolo R$
+        valor = valor.replace(" ", "")  # Remover espaços extras no meio
+        valor = valor.replace(".", "")  # Remover pontos, caso haja como separador de milhar
+        valor = valor.replace(",", ".")  # Substituir a vírgula por ponto para conversão de float
+        try:
+            return float(valor)  # Converter para float
+        except ValueError:
+            return 0.0  # Caso não consiga converter, retorna 0.0
+    return valor  # Se não for string, retorna o valor original
+
+
+def _converter_textos(textos):
+    """Converte um array Arrow de strings em float64, com o mesmo resultado de converter_monetario."""
+    # Só espaços ASCII: o que o strip() do Python remove a mais deixa o texto fora do padrão e cai na conversão célula a célula
+    limpo = pc.ascii_trim_whitespace(textos)
+    limpo = pc.replace_substring(limpo, "R$", "")
+    limpo = pc.replace_substring(limpo, " ", "")
+    limpo = pc.replace_substring(limpo, ".", "")
+    limpo = pc.replace_substring(limpo, ",", ".")
+    zero = pc.fill_null(pc.is_in(limpo, value_set=pa.array(_SEM_NUMERO)), False)
+
+    try:
+        # Caminho comum: tirando os vazios, todo texto limpo é número e o cast converte a coluna de uma vez
+        convertidos = pc.cast(pc.if_else(zero, None, limpo), pa.float64())
+    except pa.ArrowInvalid:
+        convertidos = None  # Algum texto o Arrow não converte: o padrão separa os que seguem pela função original
+
+    if convertidos is not None:
+        valores = np.array(convertidos, dtype=np.float64)
+        valores[zero.to_numpy(zero_copy_only=False)] = 0.0
+        # nan e inf: o Arrow aceita grafias que o float() recusa ("nan(1)"), então esses seguem pela função original
+        for posicao in np.flatnonzero(~np.isfinite(valores) & ~pc.is_null(textos).to_numpy(zero_copy_only=False)):
+            valores[posicao] = converter_monetario(textos[int(posicao)].as_py())
+        return valores
+
+    valido = pc.fill_null(pc.match_substring_regex(limpo, _NUMERO_LIMPO), False)
+    valores = np.array(pc.cast(pc.if_else(valido, limpo, None), pa.float64()), dtype=np.float64)
+    valores[zero.to_numpy(zero_copy_only=False)] = 0.0
+
+    # Casos raros ("nan", "1_000", espaços Unicode...) seguem pela função original
+    resolvido = pc.or_(pc.or_(valido, zero), pc.is_null(textos)).to_numpy(zero_copy_only=False)
+    for posicao in np.flatnonzero(~resolvido):
+        valores[posicao] = converter_monetario(textos[int(posicao)].as_py())
+    return valores
+
+
+def converter_monetario_coluna(coluna):
+    """Aplica converter_monetario na coluna inteira de uma vez (R$, milhar com ponto, vírgula decimal,
+    vazios e negativos), devolvendo exatamente o que coluna.apply(converter_monetario) devolveria."""
+    if coluna.dtype != object:
+        return coluna  # Já numérica: nada a converter
+
+    try:
+        # Caminho comum (CSV exportado): só textos e vazios
+        textos = pa.array(coluna.to_numpy(), type=pa.string(), from_pandas=True)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        textos = None
+
+    if textos is not None:
+        return pd.Series(_converter_textos(textos), index=coluna.index, name=coluna.name)
+
+    # Textos misturados com números (xlsx lido direto): converte só os textos
+    tipos = coluna.map(type)
+    eh_texto = (tipos == str).to_numpy()
+    if not eh_texto.any() or not tipos[~eh_texto].isin([float, int]).all():
+        return coluna.apply(converter_monetario)  # Tipos incomuns: mantém o comportamento original
+
+    valores = coluna.to_numpy(dtype=object).copy()
+    valores[eh_texto] = _converter_textos(pa.array(valores[eh_texto], type=pa.string()))
+    return pd.Series(valores.astype(np.float64), index=coluna.index, name=coluna.name)
+
+
+def converter_colunas_monetarias(df, colunas):
+    for col in colunas:
+        df[col] = converter_monetario_coluna(df[col])
+    return df
+
+
+# Ocorrências em que o contrato vale o ano todo (12 meses cheios)
+OCORRENCIAS_ANO_CHEIO = ['nan', '', 'outro', 'não informado', 'ajuste', 'reajuste']
+
+
+def _somar_meses(valor_mensal, inicio, fim):
+    """Soma, mês a mês entre inicio e fim (datetime64[D]), o valor mensal cheio ou proporcional aos dias.
+
+    O laço é só nos meses do período (o contrato mais longo); as linhas são todas calculadas juntas,
+    somando na mesma ordem do cálculo linha a linha para dar o mesmo resultado em ponto flutuante.
+    """
+    mes_inicio = inicio.astype("datetime64[M]")
+    mes_fim = fim.astype("datetime64[M]")
+    total = np.zeros(len(valor_mensal))
+    if not len(valor_mensal):
+        return total
+
+    for deslocamento in range(int((mes_fim - mes_inicio).astype(np.int64).max()) + 1):
+        mes = mes_inicio + deslocamento
+        primeiro_dia = mes.astype("datetime64[D]")
+        ultimo_dia = (mes + 1).astype("datetime64[D]") - 1
+        dias_mes = (ultimo_dia - primeiro_dia).astype(np.int64) + 1
+
+        # Ajusta os limites ao período do contrato
+        inicio_mes = np.maximum(inicio, primeiro_dia)
+        fim_mes = np.minimum(fim, ultimo_dia)
+        dias_no_mes = (fim_mes - inicio_mes).astype(np.int64) + 1
+
+        # Mês cheio vale o valor mensal; mês parcial, os dias usados
+        cheio = (inicio_mes == primeiro_dia) & (fim_mes == ultimo_dia)
+        valor_mes = np.where(cheio, valor_mensal, (valor_mensal / dias_mes) * dias_no_mes)
+        total = np.where(mes <= mes_fim, total + valor_mes, total)
+    return total
+
+
+def arredondar_centavos(valores):
+    """round(valor, 2) do Python em um array inteiro, com o mesmo resultado valor a valor."""
+    centavos = valores * 100
+    arredondados = np.rint(centavos) / 100
+    # Perto de meio centavo o produto por 100 pode cair do outro lado: esses poucos usam o round() do Python
+    fracao = np.abs(centavos - np.trunc(centavos))
+    duvidosos = np.abs(fracao - 0.5) <= np.maximum(4 * np.spacing(np.abs(centavos)), 1e-9)
+    for posicao in np.flatnonzero(duvidosos):
+        arredondados[posicao] = round(float(valores[posicao]), 2)
+    return arredondados
+
+
+def calcular_valor_anual_proporcional(valor_mensal, ocorrencia, data_ocorrencia, ano_referencia):
+    """Valor do contrato no ano de referência, para todas as linhas de uma vez.
+
+    - "inicio": da data de ocorrência até 31/12; "rescisão": de 01/01 até a data de ocorrência,
+      com os meses parciais proporcionais aos dias;
+    - ocorrências de ano cheio: 12 vezes o valor mensal;
+    - sem valor mensal, sem data ou outras ocorrências: NaN.
+    """
+    valor = valor_mensal.to_numpy(dtype=np.float64, na_value=np.nan)
+    ocorrencia = ocorrencia.to_numpy(dtype=object)
+    data = data_ocorrencia.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    inicio_ano = np.datetime64(date(ano_referencia, 1, 1), "D")
+    fim_ano = np.datetime64(date(ano_referencia, 12, 31), "D")
+
+    tem_valor = ~np.isnan(valor) & (valor != 0)
+    tem_data = ~np.isnat(data)
+    inicio = tem_valor & tem_data & (ocorrencia == 'inicio') & (data <= fim_ano)
+    rescisao = tem_valor & tem_data & (ocorrencia == 'rescisão') & (data >= inicio_ano)
+    ano_cheio = tem_valor & np.isin(ocorrencia, OCORRENCIAS_ANO_CHEIO)
+
+    resultado = np.full(len(valor), np.nan)
+    resultado[ano_cheio] = valor[ano_cheio] * 12
+
+    proporcional = inicio | rescisao
+    resultado[proporcional] = _somar_meses(
+        valor[proporcional],
+        np.where(inicio, data, inicio_ano)[proporcional],
+        np.where(rescisao, data, fim_ano)[proporcional],
+    )
+    return arredondar_centavos(resultado)
+
+
+def preencher_valor_anual_proporcional(df, ano_referencia):
+    df['Valor Mensal'] = converter_monetario_coluna(df['Valor Mensal'])  # Normalmente já convertida na leitura
+    df['Ocorrência'] = df['Ocorrência'].astype(str).str.strip().str.lower()
+    df['Data de Ocorrência'] = pd.to_datetime(df['Data de Ocorrência'], dayfirst=True, errors='coerce')
+    df['Valor Anual Proporcional'] = calcular_valor_anual_proporcional(
+        df['Valor Mensal'], df['Ocorrência'], df['Data de Ocorrência'], ano_referencia
+    )
+    return df
+
+
+def detectar_codificacao(conteudo):
+    """Codificação do CSV pelos bytes: o Sheets exporta em UTF-8; o que não for UTF-8 válido é lido como Latin-1."""
+    try:
+        conteudo.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "ISO-8859-1"
+
+
+def ler_csv_exportado(conteudo, **opcoes):
+    """Lê o CSV exportado com a codificação decidida uma vez para o arquivo inteiro, antes do parse."""
+    dados = conteudo.getvalue() if isinstance(conteudo, io.BytesIO) else conteudo
+    return pd.read_csv(io.BytesIO(dados), encoding=detectar_codificacao(dados), **opcoes)
+
+
+MESES_ABREVIADOS = ["JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ"]
+
+# Métricas de cada mês no relatório de evolução, na ordem das colunas
+TIPOS_METRICA_EVOLUCAO = [
+    "DESPESAS EMPENHADAS (CONTROLE EMPENHO)",
+    "DESPESAS EMPENHADAS A LIQUIDAR (CONTROLE EMP)",
+    "DESPESAS LIQUIDADAS (CONTROLE EMPENHO)"
+]
+
+# Rótulo de mês do cabeçalho ("JAN/2025"; o pandas acrescenta ".1", ".2" em rótulos repetidos)
+_ROTULO_MES = re.compile(r"^\s*([A-Za-z]{3})/(\d{4})")
+MESES_SEM_ROTULO = 4  # Meses lidos (JAN a ABR) quando o cabeçalho não traz rótulos, como o relatório sempre foi lido
+
+
+def chave_mes(rotulo):
+    """Chave para ordenar rótulos "MMM/AAAA" em ordem cronológica."""
+    mes, _, ano = str(rotulo).partition("/")
+    mes = mes.strip().upper()
+    return (int(ano) if ano.strip().isdigit() else 0, MESES_ABREVIADOS.index(mes) if mes in MESES_ABREVIADOS else 12)
+
+
+def identificar_meses(rotulos, primeira_coluna=3, por_mes=3, ano_padrao=None):
+    """Meses do relatório e a posição da primeira coluna de cada um, descobertos pelo cabeçalho.
+
+    O rótulo fica na primeira coluna de cada grupo (células mescladas). Sem rótulos no cabeçalho,
+    valem os MESES_SEM_ROTULO primeiros grupos, de JAN/ano_padrao em diante, como o relatório vinha sendo
+    lido; colunas depois deles (totais, observações) ficam de fora.
+    """
+    meses = []
+    for posicao, rotulo in enumerate(rotulos):
+        achado = _ROTULO_MES.match(str(rotulo)) if posicao >= primeira_coluna else None
+        if achado and achado.group(1).upper() in MESES_ABREVIADOS:
+            mes = f"{achado.group(1).upper()}/{achado.group(2)}"
+            if not meses or meses[-1][0] != mes:
+                meses.append((mes, posicao))
+
+    if not meses and ano_padrao is not None:
+        grupos = min(MESES_SEM_ROTULO, max(0, (len(rotulos) - primeira_coluna + por_mes - 1) // por_mes))
+        meses = [
+            (f"{MESES_ABREVIADOS[i % 12]}/{ano_padrao + i // 12}", primeira_coluna + i * por_mes)
+            for i in range(grupos)
+        ]
+    return meses
+
+
+def _converter_valor_evolucao(valor):
+    if isinstance(valor, str):
+        valor = valor.replace('.', '').replace(',', '.')
+    try:
+        return float(valor)
+    except:
+        return 0.0
+
+
+def _converter_textos_evolucao(textos):
+    limpo = pc.replace_substring(pc.replace_substring(textos, ".", ""), ",", ".")
+    valido = pc.fill_null(pc.match_substring_regex(limpo, _NUMERO_LIMPO), False)
+    convertidos = np.array(pc.cast(pc.if_else(valido, limpo, None), pa.float64()), dtype=np.float64)
+    # Textos fora do padrão seguem pela conversão original (vazio ou letras viram 0.0)
+    for posicao in np.flatnonzero(~valido.to_numpy(zero_copy_only=False)):
+        convertidos[posicao] = _converter_valor_evolucao(textos[int(posicao)].as_py())
+    return convertidos
+
+
+def converter_valores_evolucao(valores):
+    """Valores do relatório de evolução (array) em float, com o mesmo resultado da conversão célula a célula:
+    números como estão, textos "1.234,56" convertidos e texto que não é número vira 0.0."""
+    valores = pd.Series(valores, dtype=object)
+    eh_texto = (valores.map(type) == str).to_numpy()
+    resultado = np.empty(len(valores), dtype=np.float64)
+
+    # Números (xlsx lido direto) e vazios
+    outros = valores[~eh_texto]
+    numeros = pd.to_numeric(outros, errors="coerce").to_numpy(dtype=np.float64)
+    falhas = np.isnan(numeros) & outros.notna().to_numpy()
+    for posicao in np.flatnonzero(falhas):
+        numeros[posicao] = _converter_valor_evolucao(outros.iloc[posicao])
+    resultado[~eh_texto] = numeros
+
+    # Textos (CSV exportado)
+    if eh_texto.any():
+        resultado[eh_texto] = _converter_textos_evolucao(pa.array(valores[eh_texto].to_numpy(), type=pa.string()))
+    return resultado
+
+
+def evolucao_para_formato_longo(df_raw, meses, tipos=TIPOS_METRICA_EVOLUCAO):
+    """Passa o relatório largo (uma linha por nota, 3 colunas por mês) para uma linha por nota, mês e métrica.
+
+    As colunas de valores são convertidas inteiras e empilhadas; a ordem das linhas é nota, mês, métrica.
+    """
+    linhas = len(df_raw)
+    posicoes = []
+    rotulos_mes = []
+    rotulos_tipo = []
+    for mes, posicao in meses:
+        for i, tipo in enumerate(tipos):
+            if posicao + i < df_raw.shape[1]:
+                posicoes.append(posicao + i)
+                rotulos_mes.append(mes)
+                rotulos_tipo.append(tipo)
+
+    # Todas as colunas de valores convertidas de uma vez, já na ordem nota, mês, métrica
+    por_linha = len(posicoes)
+    valores = converter_valores_evolucao(df_raw.iloc[:, posicoes].to_numpy(dtype=object).ravel())
+
+    def repetir(nome):
+        coluna = df_raw[nome].to_numpy() if nome in df_raw.columns else np.full(linhas, None, dtype=object)
+        return np.repeat(coluna, por_linha)
+
+    return pd.DataFrame({
+        "Nota de Empenho": repetir("Unnamed: 0"),
+        "Favorecido": repetir("Unnamed: 2"),  # Nome pode variar conforme a planilha
+        "Mês": np.tile(np.array(rotulos_mes, dtype=object), linhas),
+        "Tipo de Métrica": np.tile(np.array(rotulos_tipo, dtype=object), linhas),
+        "Valor (R$)": valores,
+    })
+
+
+# Nota de empenho no formato do SIAFI (ex.: 2025NE000123), em qualquer parte do texto da célula
+_NOTA_EMPENHO = re.compile(r"(\d{4})\s*NE\s*(\d+)", re.IGNORECASE)
+
+
+def chave_nota(nota):
+    """Chave normalizada da nota: "2025NE000123" sem espaços e em maiúsculas; outros textos só aparados."""
+    texto = str(nota).strip().upper()
+    encontrada = _NOTA_EMPENHO.search(texto)
+    return f"{encontrada.group(1)}NE{encontrada.group(2)}" if encontrada else texto
+
+
+def indexar_notas(df_evolucao):
+    """Índice chave da nota → posições das linhas da evolução (em ordem), montado uma vez na carga.
+
+    A chave é calculada por nota distinta, não por linha (cada nota tem uma linha por mês e métrica).
+    """
+    notas = df_evolucao["Nota de Empenho"].astype("category")
+    chaves = np.array([chave_nota(nota) for nota in notas.cat.categories], dtype=object)
+    codigos = notas.cat.codes.to_numpy()
+    posicoes = np.flatnonzero(codigos >= 0)
+    grupos = pd.Series(posicoes).groupby(chaves[codigos[posicoes]], sort=False).indices
+    return {chave: posicoes[grupo] for chave, grupo in grupos.items()}
+
+
+def linhas_da_nota(df_evolucao, indice_notas, nota):
+    """Linhas da evolução para a nota, pelo índice; sem a chave no índice, busca o texto na coluna inteira."""
+    posicoes = indice_notas.get(chave_nota(nota))
+    if posicoes is not None:
+        return df_evolucao.iloc[posicoes]
+    return df_evolucao[df_evolucao["Nota de Empenho"].astype(str).str.contains(str(nota), na=False)]
+
+
+# Textos que se repetem muito entre as linhas: guardados como categorias (um código por linha)
+COLUNAS_DIMENSAO = ["Regiao", "Fonte", "Contrato", "Status", "Ocorrência", "Objeto"]
+COLUNAS_DIMENSAO_EVOLUCAO = ["Nota de Empenho", "Favorecido", "Mês", "Tipo de Métrica"]
+COLUNAS_DATA = ["Data de Ocorrência"]
+
+
+def compactar_painel(df, colunas_valores, colunas_dimensao=COLUNAS_DIMENSAO, colunas_data=COLUNAS_DATA):
+    """Tipos enxutos para o painel: categorias nas dimensões, valores fechados no centavo e datas como datetime.
+
+    Os valores continuam em reais (float) na memória; no parquet vão como centavos inteiros.
+    """
+    df = df.copy()
+    for coluna in colunas_dimensao:
+        if coluna in df:
+            df[coluna] = df[coluna].astype("category")
+    for coluna in colunas_valores:
+        if coluna in df:
+            df[coluna] = arredondar_centavos(df[coluna].to_numpy(dtype=np.float64, copy=True))
+    for coluna in colunas_data:
+        if coluna in df and not pd.api.types.is_datetime64_any_dtype(df[coluna]):
+            df[coluna] = pd.to_datetime(df[coluna], dayfirst=True, errors='coerce')
+    return df
+
+
+def bytes_por_linha(df):
+    return df.memory_usage(deep=True).sum() / max(len(df), 1)
+
+
+def relatar_memoria(nome, antes, depois):
+    print(f"💾 {nome}: {bytes_por_linha(antes):,.0f} → {bytes_por_linha(depois):,.0f} bytes por linha "
+          f"({len(depois)} linhas)")
+
+
+# Cubo do painel: totais por Região × Fonte × Contrato, com o valor pago de cada mês em uma coluna
+MESES_PAINEL = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+DIMENSOES_CUBO = ["Regiao", "Fonte", "Contrato"]
+MEDIDAS_CUBO = ["Valor Anual", "Valor Empenhado", "Valor Pago", "Valor Anual Proporcional", "Valor Mensal",
+                "Valor a Anular", "Valor a Reforçar"] + MESES_PAINEL
+
+
+def montar_cubo(df):
+    """Soma as linhas principais por Região × Fonte × Contrato e acrescenta o total de cada Região × Fonte
+    (linhas com Contrato vazio), que é o que a visão geral lê.
+
+    "Valor a Anular" e "Valor a Reforçar" somam só as diferenças (empenhado - proporcional) positivas e
+    negativas de cada linha, para que continuem somáveis entre contratos.
+    """
+    diferenca = df["Valor Empenhado"] - df["Valor Anual Proporcional"]
+    base = pd.DataFrame({
+        "Regiao": df["Regiao"].astype(object).str.strip().str.upper(),
+        "Fonte": df["Fonte"].astype(object),
+        "Contrato": df["Contrato"].astype(object),
+        "Linhas": 1,
+    })
+    for medida in MEDIDAS_CUBO[:5] + MESES_PAINEL:
+        base[medida] = df[medida].to_numpy()
+    base["Valor a Anular"] = diferenca.where(diferenca > 0, 0.0).to_numpy()
+    base["Valor a Reforçar"] = diferenca.where(diferenca < 0, 0.0).to_numpy()
+
+    medidas = ["Linhas"] + MEDIDAS_CUBO
+    por_contrato = base.groupby(DIMENSOES_CUBO, sort=False, dropna=False)[medidas].sum().reset_index()
+    por_objeto = por_contrato.groupby(["Regiao", "Fonte"], sort=False, dropna=False)[medidas].sum().reset_index()
+    por_objeto["Contrato"] = None
+    cubo = pd.concat([por_objeto, por_contrato], ignore_index=True)[DIMENSOES_CUBO + medidas]
+    return compactar_painel(cubo, MEDIDAS_CUBO, DIMENSOES_CUBO, colunas_data=[])
@@ -1,6 +1,14 @@
 import streamlit as st
 import json
 import os
+from pages.token_google import estatisticas_tokens
+from pages.drive_google import estatisticas_clientes
+from pages.cache_drive import estatisticas_caches
+from pages.cache_visoes import estatisticas_caches_visoes
+from pages.snapshot_painel import estatisticas_snapshot, obter_snapshot
+from pages.consultas_painel import obter_consultas, LINHAS_CONSULTA_SQL
+from pages.controle_trafego import estatisticas_agendador
+from pages.atualizador_painel import estatisticas_atualizador
 
 # Inicializar session_state para o login
 if "autenticado" not in st.session_state:
@@ -80,6 +88,63 @@ if st.session_state["autenticado"]:
         salvar_configuracoes(config)
         st.success("✅ Configurações salvas com sucesso!")
 
+    st.markdown("---")
+
+    # Diagnóstico de uso da API do Google (contadores do processo atual)
+    st.subheader("🩺 Diagnóstico")
+    for estatistica in estatisticas_tokens():
+        st.write(f"🔑 Renovações de token na última hora: {estatistica['renovacoes_ultima_hora']} "
+                 f"(total: {estatistica['total_renovacoes']} de {estatistica['total_pedidos']} pedidos)")
+    for latencias in estatisticas_clientes():
+        if latencias:
+            st.write("⏱️ Latência das chamadas ao Google Drive (ms):")
+            st.json(latencias)
+    trafego = estatisticas_agendador()
+    if trafego:
+        st.write(f"🚦 Tráfego para o Drive: {trafego['taxa_atual']}/{trafego['taxa_maxima']} req/s, "
+                 f"disjuntor {trafego['disjuntor']}, {trafego['novas_tentativas']} novas tentativas "
+                 f"({trafego['respostas_limite']} por limite de cota, {trafego['segundos_esperando']} s em espera)")
+    for estatistica in estatisticas_caches():
+        st.write(f"💾 Cache de arquivos do Drive: {estatistica['acertos']} acertos, {estatistica['falhas']} falhas, "
+                 f"{estatistica['itens']} itens ({estatistica['tamanho_mb']} MB), "
+                 f"{estatistica['mb_economizados']} MB sem baixar de novo")
+    for nome, estatistica in estatisticas_caches_visoes().items():
+        st.write(f"🧮 Visões em memória ({nome}): {estatistica['acertos']} acertos, {estatistica['falhas']} falhas, "
+                 f"{estatistica['itens']} itens, {estatistica['remocoes']} removidos por limite, "
+                 f"{estatistica['invalidacoes']} invalidações por snapshot novo")
+    atualizacao = estatisticas_atualizador()
+    if atualizacao:
+        agenda = f"a cada {atualizacao['intervalo_minutos']:g} min" if atualizacao["proxima"] else "só pelo botão"
+        st.write(f"🔄 Atualização do painel em segundo plano ({agenda}): {atualizacao['execucoes']} execuções, "
+                 f"{atualizacao['falhas']} falhas, última em {atualizacao['ultima_duracao']} s"
+                 + (" — atualizando agora" if atualizacao["atualizando"] else ""))
+    snapshot = estatisticas_snapshot()
+    if snapshot["versao"]:
+        st.write(f"🗂️ Snapshot do painel {snapshot['versao']}: {snapshot['mb_mapeados']} MB mapeados em memória, "
+                 f"{snapshot['versoes_em_uso']} versões em uso")
+    memoria = snapshot["memoria"]
+    if memoria:
+        st.write(f"🧠 Memória residente: {memoria.get('total')} MB ({memoria.get('arquivos')} MB de arquivos "
+                 f"mapeados, compartilháveis entre processos; {memoria.get('anonima')} MB próprios do processo)")
+
+    st.markdown("---")
+
+    # Consultas livres ao snapshot publicado (somente leitura)
+    st.subheader("🦆 Consulta SQL ao painel")
+    snapshot_painel = obter_snapshot()
+    if snapshot_painel is None:
+        st.info("Nenhum snapshot do painel publicado ainda.")
+    else:
+        st.caption(f"Tabelas: principal, complementar, cubo e evolucao (versão {snapshot_painel.nome}). "
+                   f"Só leitura, até {LINHAS_CONSULTA_SQL} linhas.")
+        sql = st.text_area("SQL", 'SELECT "Regiao", sum("Valor Pago") AS "Valor Pago" FROM cubo '
+                                  'WHERE "Contrato" IS NULL GROUP BY "Regiao" ORDER BY 2 DESC')
+        if st.button("▶️ Executar consulta"):
+            try:
+                st.dataframe(obter_consultas(snapshot_painel).consultar(sql), use_container_width=True)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+
     # Botão de logout
     if st.button("🚪 Sair"):
         st.session_state["autenticado"] = False
@@ -0,0 +1,194 @@
+import glob
+import json
+import os
+import re
+import threading
+import weakref
+
+import duckdb
+import pyarrow.parquet as pq
+
+from pages.calculos_painel import MESES_PAINEL
+from pages.snapshot_painel import (DIRETORIO_PRINCIPAL, CAMINHO_COMPLEMENTAR, CAMINHO_CUBO, CAMINHO_EVOLUCAO,
+                                   METADADOS_CENTAVOS, METADADOS_DATAS)
+
+
+LINHAS_CONSULTA_SQL = 10_000  # Máximo de linhas devolvidas por uma consulta livre do painel de administração
+
+# Consulta livre: só leitura, um comando por vez
+_CONSULTA_LEITURA = re.compile(r"^\s*(select|with|from|describe|show|summarize|explain|pivot|unpivot)\b", re.I)
+
+
+def _identificador(nome):
+    return '"' + nome.replace('"', '""') + '"'
+
+
+def _texto(valor):
+    return "'" + valor.replace("'", "''") + "'"
+
+
+def _marcadas(esquema, chave):
+    metadados = esquema.metadata or {}
+    return json.loads(metadados[chave]) if chave in metadados else []
+
+
+def _selecao(esquema):
+    """Colunas da view como a tela as vê: centavos voltam a reais e datas a timestamp."""
+    centavos = set(_marcadas(esquema, METADADOS_CENTAVOS))
+    datas = set(_marcadas(esquema, METADADOS_DATAS))
+    colunas = []
+    for nome in esquema.names:
+        coluna = _identificador(nome)
+        if nome in centavos:
+            colunas.append(f"{coluna} / 100.0 AS {coluna}")
+        elif nome in datas:
+            colunas.append(f"CAST({coluna} AS TIMESTAMP) AS {coluna}")
+        else:
+            colunas.append(coluna)
+    return ", ".join(colunas)
+
+
+def _em(coluna, valores, parametros):
+    """Condição coluna IN (?, ?, ...) com os valores passados como parâmetros."""
+    parametros.extend(valores)
+    return f"{_identificador(coluna)} IN ({', '.join('?' * len(valores))})"
+
+
+class ConsultasPainel:
+    """Consultas SQL (DuckDB) sobre os arquivos de uma versão do snapshot, sem carregá-los no pandas.
+
+    As views principal, complementar, cubo e evolucao leem os Parquet direto do disco, em paralelo e com
+    filtros empurrados para a leitura. A conexão só enxerga o diretório da versão.
+    """
+
+    def __init__(self, diretorio):
+        diretorio = os.path.abspath(diretorio)
+        self._conexao = duckdb.connect()
+        self._conexao.execute(f"SET allowed_directories = [{_texto(diretorio)}]")
+        self._conexao.execute("SET enable_external_access = false")
+        self._conexao.execute("SET lock_configuration = true")
+
+        arquivos_principal = sorted(glob.glob(os.path.join(diretorio, DIRETORIO_PRINCIPAL, "**", "*.parquet"),
+                                              recursive=True))
+        views = {
+            "principal": (arquivos_principal, "hive_partitioning = true"),
+            "complementar": ([os.path.join(diretorio, CAMINHO_COMPLEMENTAR)], ""),
+            "cubo": ([os.path.join(diretorio, CAMINHO_CUBO)], ""),
+            "evolucao": ([os.path.join(diretorio, CAMINHO_EVOLUCAO)], ""),
+        }
+        for nome, (arquivos, opcoes) in views.items():
+            if not arquivos:
+                continue
+            lista = "[" + ", ".join(_texto(arquivo) for arquivo in arquivos) + "]"
+            leitura = f"read_parquet({lista}{', ' + opcoes if opcoes else ''})"
+            self._conexao.execute(f"CREATE VIEW {nome} AS SELECT {_selecao(pq.read_schema(arquivos[0]))}"
+                                  f"{', particao_fonte, particao_regiao' if opcoes else ''} FROM {leitura}")
+
+    def _consultar(self, sql, parametros=()):
+        # Um cursor por consulta: as sessões consultam a mesma versão em paralelo
+        cursor = self._conexao.cursor()
+        try:
+            return cursor.execute(sql, list(parametros)).df()
+        finally:
+            cursor.close()
+
+    def _filtro_cubo(self, regioes, fontes, contrato=None):
+        parametros = []
+        condicoes = ['"Contrato" = ?' if contrato is not None else '"Contrato" IS NULL']
+        if contrato is not None:
+            parametros.append(contrato)
+        if regioes:
+            condicoes.append(_em("Regiao", regioes, parametros))
+        if fontes:
+            condicoes.append(_em("Fonte", fontes, parametros))
+        return " AND ".join(condicoes), parametros
+
+    def contratos(self, regioes=None, fontes=None):
+        """Contratos das regiões e fontes selecionadas, na ordem em que aparecem nas planilhas."""
+        parametros = []
+        condicoes = ['"Contrato" IS NOT NULL']
+        if regioes:
+            condicoes.append(_em("Regiao", regioes, parametros))
+        if fontes:
+            condicoes.append(_em("Fonte", fontes, parametros))
+        df = self._consultar(f'SELECT "Contrato" FROM cubo WHERE {" AND ".join(condicoes)} '
+                             f'GROUP BY "Contrato" ORDER BY min(ordem_original)', parametros)
+        return df["Contrato"].tolist()
+
+    def totais(self, regioes=None, fontes=None):
+        """Métricas da visão geral: linhas, valores e o saldo a anular / reforçar."""
+        condicao, parametros = self._filtro_cubo(regioes, fontes)
+        medidas = ["Linhas", "Valor Anual", "Valor Empenhado", "Valor Pago", "Valor a Anular", "Valor a Reforçar"]
+        colunas = ", ".join(f"coalesce(sum({_identificador(medida)}), 0) AS {_identificador(medida)}"
+                            for medida in medidas)
+        return self._consultar(f"SELECT {colunas} FROM cubo WHERE {condicao}", parametros).iloc[0].to_dict()
+
+    def totais_por(self, dimensao, regioes=None, fontes=None):
+        """Valor anual, empenhado e pago por Regiao ou por Fonte, do maior empenhado para o menor."""
+        if dimensao not in ("Regiao", "Fonte"):
+            raise ValueError(f"Dimensão desconhecida: {dimensao}")
+        condicao, parametros = self._filtro_cubo(regioes, fontes)
+        coluna = _identificador(dimensao)
+        return self._consultar(
+            f'SELECT {coluna}, sum("Valor Anual") AS "Valor Anual", sum("Valor Empenhado") AS "Valor Empenhado", '
+            f'sum("Valor Pago") AS "Valor Pago" FROM cubo WHERE {condicao} '
+            f'GROUP BY {coluna} ORDER BY "Valor Empenhado" DESC, {coluna}',
+            parametros,
+        )
+
+    def pagamentos_mensais(self, regioes=None, fontes=None, contrato=None):
+        """Série mês a mês do valor pago, com o acumulado e o valor anual acumulado (valor mensal × meses)."""
+        condicao, parametros = self._filtro_cubo(regioes, fontes, contrato)
+        meses = ", ".join(_identificador(mes) for mes in MESES_PAINEL)
+        ordem = ", ".join(_texto(mes) for mes in MESES_PAINEL)
+        return self._consultar(
+            f'WITH selecao AS (SELECT * FROM cubo WHERE {condicao}), '
+            f'mensal AS (SELECT "Mês", sum("Valor Pago Mensal") AS "Valor Pago Mensal" '
+            f'FROM (UNPIVOT selecao ON {meses} INTO NAME "Mês" VALUE "Valor Pago Mensal") GROUP BY "Mês") '
+            f'SELECT "Mês", "Valor Pago Mensal", '
+            f'sum("Valor Pago Mensal") OVER (ORDER BY list_position([{ordem}], "Mês")) AS "Valor Pago Acumulado", '
+            f'list_position([{ordem}], "Mês") * (SELECT sum("Valor Mensal") FROM selecao) AS "Valor Anual Acumulado" '
+            f'FROM mensal ORDER BY list_position([{ordem}], "Mês")',
+            parametros,
+        )
+
+    def rescisoes(self, regioes=None, fontes=None):
+        """Linhas rescindidas com o valor a anular (empenhado - proporcional); só as partições selecionadas são lidas."""
+        parametros = ["rescisão"]
+        condicoes = ['"Ocorrência" = ?']
+        if regioes:
+            condicoes.append(_em("particao_regiao", regioes, parametros))
+        if fontes:
+            condicoes.append(_em("particao_fonte", fontes, parametros))
+        return self._consultar(
+            f'SELECT * EXCLUDE (ordem_original, particao_fonte, particao_regiao) '
+            f'REPLACE (upper(trim("Regiao")) AS "Regiao"), '
+            f'"Valor Empenhado" - "Valor Anual Proporcional" AS "Valor a Anular" '
+            f'FROM principal WHERE {" AND ".join(condicoes)} ORDER BY ordem_original',
+            parametros,
+        )
+
+    def consultar(self, sql, limite=LINHAS_CONSULTA_SQL):
+        """Consulta livre (painel de administração): um único comando de leitura, até `limite` linhas."""
+        sql = sql.strip().rstrip(";")
+        if not _CONSULTA_LEITURA.match(sql) or ";" in sql:
+            raise ValueError("Só é permitido um comando de leitura (SELECT, WITH, DESCRIBE, SUMMARIZE...).")
+        cursor = self._conexao.cursor()
+        try:
+            return cursor.sql(sql).limit(limite).df()
+        except duckdb.Error as e:
+            raise ValueError(str(e)) from e
+        finally:
+            cursor.close()
+
+
+# Uma conexão por versão do snapshot; sai junto com a versão quando nenhuma sessão a usa mais
+_consultas = weakref.WeakKeyDictionary()
+_lock_consultas = threading.Lock()
+
+
+def obter_consultas(snapshot):
+    with _lock_consultas:
+        if snapshot not in _consultas:
+            _consultas[snapshot] = ConsultasPainel(snapshot.diretorio)
+        return _consultas[snapshot]
@@ -0,0 +1,218 @@
+import random
+import threading
+import time
+
+import requests
+
+
+REQUISICOES_POR_SEGUNDO = 10  # Teto de vazão para o Drive em todo o processo
+TENTATIVAS = 5
+ESPERA_BASE = 1.0  # Segundos; dobra a cada nova tentativa
+ESPERA_MAXIMA = 32.0
+FALHAS_PARA_ABRIR = 5  # Falhas seguidas que abrem o disjuntor
+TEMPO_ABERTO = 30.0  # Segundos sem chamar a API depois de aberto
+
+STATUS_REPETIVEIS = (429, 500, 502, 503, 504)
+MOTIVOS_LIMITE = ("rateLimitExceeded", "userRateLimitExceeded")
+
+
+class CircuitoAberto(requests.exceptions.RequestException):
+    """A API vem falhando seguidamente; as chamadas ficam suspensas por um tempo.
+
+    É uma RequestException: quem já trata as falhas do requests (upload, metadados em lote) trata esta também.
+    """
+
+
+class BaldeTokens:
+    """Limita a vazão com um balde de tokens cuja taxa se adapta às respostas de limite (AIMD)."""
+
+    def __init__(self, taxa_maxima, capacidade=None):
+        self.taxa_maxima = float(taxa_maxima)
+        self.taxa = float(taxa_maxima)
+        self.capacidade = float(capacidade or taxa_maxima)
+        self._tokens = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Bloqueia até haver um token disponível."""
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.taxa
+            time.sleep(espera)
+
+    def reduzir(self):
+        # Recebeu 429: corta a taxa pela metade (sem descer de 1 requisição/s)
+        with self._lock:
+            self.taxa = max(1.0, self.taxa / 2)
+
+    def aumentar(self):
+        # Sucesso: recupera a taxa aos poucos até o teto configurado
+        with self._lock:
+            self.taxa = min(self.taxa_maxima, self.taxa + 0.1)
+
+
+class Disjuntor:
+    """Circuit breaker: fechado (normal), aberto (recusa chamadas) e meio-aberto (uma chamada de teste)."""
+
+    def __init__(self, falhas_para_abrir=FALHAS_PARA_ABRIR, tempo_aberto=TEMPO_ABERTO):
+        self.falhas_para_abrir = falhas_para_abrir
+        self.tempo_aberto = tempo_aberto
+        self.estado = "fechado"
+        self._falhas = 0
+        self._aberto_ate = 0.0
+        self._testando = False  # Meio-aberto: a chamada de teste já saiu e ainda não voltou
+        self._lock = threading.Lock()
+
+    def verificar(self):
+        """Deixa a chamada seguir ou levanta CircuitoAberto. No meio-aberto só passa uma chamada de teste por vez."""
+        with self._lock:
+            if self.estado == "aberto":
+                restante = self._aberto_ate - time.monotonic()
+                if restante > 0:
+                    raise CircuitoAberto(
+                        f"Google Drive indisponível no momento; tente novamente em {int(restante) + 1} segundos."
+                    )
+                self.estado = "meio-aberto"
+            if self.estado == "meio-aberto":
+                if self._testando:
+                    raise CircuitoAberto("Google Drive indisponível no momento; aguardando a chamada de teste.")
+                self._testando = True
+
+    def liberar_teste(self):
+        """A chamada terminou sem dizer se a API voltou (ex.: 429): a próxima chamada faz o teste."""
+        with self._lock:
+            self._testando = False
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self._falhas = 0
+            self._testando = False
+            self.estado = "fechado"
+
+    def registrar_falha(self):
+        with self._lock:
+            self._falhas += 1
+            self._testando = False
+            if self.estado == "meio-aberto" or self._falhas >= self.falhas_para_abrir:
+                self.estado = "aberto"
+                self._aberto_ate = time.monotonic() + self.tempo_aberto
+
+
+def _limite_excedido(response):
+    """403 com motivo de cota também é limite de taxa no Drive."""
+    if response.status_code != 403:
+        return False
+    try:
+        erros = response.json().get("error", {}).get("errors", [])
+    except ValueError:
+        return False
+    return any(erro.get("reason") in MOTIVOS_LIMITE for erro in erros)
+
+
+def _tempo_retry_after(response):
+    valor = response.headers.get("Retry-After")
+    try:
+        return float(valor) if valor is not None else None
+    except ValueError:
+        return None
+
+
+class AgendadorRequisicoes:
+    """Controla todo o tráfego do processo para o Drive: limite de taxa, novas tentativas e disjuntor."""
+
+    def __init__(self, requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO, tentativas=TENTATIVAS):
+        self.balde = BaldeTokens(requisicoes_por_segundo)
+        self.disjuntor = Disjuntor()
+        self.tentativas = tentativas
+        self.novas_tentativas = 0
+        self.respostas_limite = 0
+        self.segundos_esperando = 0.0
+
+    def _esperar(self, tentativa, retry_after=None):
+        # Backoff exponencial com jitter completo; o Retry-After do servidor tem prioridade
+        if retry_after is not None:
+            espera = min(retry_after, ESPERA_MAXIMA)
+        else:
+            espera = random.uniform(0, min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** tentativa))
+        self.novas_tentativas += 1
+        self.segundos_esperando += espera
+        time.sleep(espera)
+
+    def executar(self, funcao, repetir=True):
+        """Executa funcao() (que faz a requisição HTTP) respeitando as regras de tráfego.
+
+        Com repetir=False (requisições que não podem ser repetidas às cegas, como POST files.copy e uploads),
+        só as respostas de limite (429/403 de cota) são repetidas: nelas o Drive recusou a requisição sem
+        executá-la. Erros 5xx e de conexão voltam na primeira vez, porque a operação pode ter sido feita.
+        """
+        for tentativa in range(self.tentativas + 1):
+            self.disjuntor.verificar()
+            self.balde.adquirir()
+            ultima = tentativa == self.tentativas
+
+            try:
+                response = funcao()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.disjuntor.registrar_falha()
+                if ultima or not repetir:
+                    raise
+                self._esperar(tentativa)
+                continue
+            except Exception:
+                self.disjuntor.liberar_teste()
+                raise
+
+            if response.status_code == 429 or _limite_excedido(response):
+                self.respostas_limite += 1
+                self.balde.reduzir()
+                self.disjuntor.liberar_teste()
+                if ultima:
+                    return response
+                self._esperar(tentativa, _tempo_retry_after(response))
+                continue
+
+            if response.status_code in STATUS_REPETIVEIS:
+                self.disjuntor.registrar_falha()
+                if ultima or not repetir:
+                    return response
+                self._esperar(tentativa, _tempo_retry_after(response))
+                continue
+
+            self.disjuntor.registrar_sucesso()
+            self.balde.aumentar()
+            return response
+
+    def estatisticas(self):
+        return {
+            "taxa_atual": round(self.balde.taxa, 1),
+            "taxa_maxima": self.balde.taxa_maxima,
+            "disjuntor": self.disjuntor.estado,
+            "novas_tentativas": self.novas_tentativas,
+            "respostas_limite": self.respostas_limite,
+            "segundos_esperando": round(self.segundos_esperando, 1),
+        }
+
+
+_agendador = None
+_lock_agendador = threading.Lock()
+
+
+def obter_agendador(requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO):
+    """Agendador único do processo, compartilhado por todas as sessões e páginas."""
+    global _agendador
+    with _lock_agendador:
+        if _agendador is None:
+            _agendador = AgendadorRequisicoes(requisicoes_por_segundo)
+        return _agendador
+
+
+def estatisticas_agendador():
+    with _lock_agendador:
+        return _agendador.estatisticas() if _agendador is not None else None
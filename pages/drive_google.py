@@ -0,0 +1,518 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pages.cache_drive import impressao_digital
+
+
+# URL_API_GOOGLE permite apontar para outro servidor (ex.: servidor_drive_fake.py nos testes de carga)
+URL_API = os.environ.get("URL_API_GOOGLE", "https://www.googleapis.com").rstrip("/")
+URL_DRIVE = f"{URL_API}/drive/v3"
+URL_UPLOAD = f"{URL_API}/upload/drive/v3"
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MIME_GOOGLE_SHEETS = "application/vnd.google-apps.spreadsheet"
+
+TAMANHO_POOL = 10  # Conexões mantidas abertas por host
+TEMPO_LIMITE_CONEXAO = 10  # Segundos para abrir a conexão com o Drive
+TEMPO_LIMITE_LEITURA = 60  # Segundos sem receber nenhum byte da resposta antes de desistir
+MAX_AMOSTRAS_LATENCIA = 500  # Amostras guardadas por endpoint
+CAMPOS_METADADOS = "id, name, mimeType, md5Checksum, modifiedTime, size"
+
+LIMITE_UPLOAD_SIMPLES = 5 * 1024 * 1024  # Acima disso o envio é feito em sessão retomável
+TAMANHO_PEDACO_UPLOAD = 8 * 256 * 1024  # Pedaços precisam ser múltiplos de 256 KB
+TENTATIVAS_UPLOAD = 5
+TTL_LISTAGEM = 60  # Segundos que a listagem de uma pasta fica em memória
+MAX_ITENS_LOTE = 100  # Limite do endpoint de batch do Drive
+# Métodos que o agendador pode repetir depois de um 5xx ou de uma conexão perdida (POST files.copy e
+# os uploads não: a repetição criaria outra cópia "(Convertido)" ou reenviaria o arquivo)
+METODOS_REPETIVEIS = ("GET", "HEAD", "DELETE")
+
+
+class RespostaLoteInvalida(requests.exceptions.RequestException):
+    """Resposta multipart do batch que não pôde ser interpretada (fronteira, Content-ID, status ou JSON)."""
+
+
+class ClienteDrive:
+    """Cliente HTTP do Google Drive com conexões reaproveitadas (keep-alive) entre chamadas."""
+
+    def __init__(self, gerenciador_token, tamanho_pool=TAMANHO_POOL, url_drive=URL_DRIVE, url_upload=URL_UPLOAD,
+                 cache=None, agendador=None, tempo_limite=(TEMPO_LIMITE_CONEXAO, TEMPO_LIMITE_LEITURA)):
+        self.gerenciador_token = gerenciador_token
+        self.tempo_limite = tempo_limite  # (conexão, leitura), repassado como timeout a toda requisição
+        self.cache = cache
+        self.agendador = agendador  # Limite de taxa, novas tentativas e disjuntor (pages/controle_trafego.py)
+        self.url_drive = url_drive
+        self.url_upload = url_upload
+        # Ex.: https://www.googleapis.com/drive/v3 -> https://www.googleapis.com/batch/drive/v3
+        raiz, _, versao = url_drive.partition("/drive/")
+        self.caminho_drive = f"/drive/{versao}"
+        self.url_lote = f"{raiz}/batch/drive/{versao}"
+
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool)
+        self.sessao.mount("https://", adaptador)
+        self.sessao.mount("http://", adaptador)
+        # O Drive só comprime a resposta quando o User-Agent também contém "gzip"
+        self.sessao.headers.update({"Accept-Encoding": "gzip", "User-Agent": "fiscais-streamlit (gzip)"})
+
+        self._latencias = {}
+        self._lock_latencias = threading.Lock()
+
+        self.ttl_listagem = TTL_LISTAGEM
+        self._listagens = {}  # (pasta_id, campos) -> (expira_em, arquivos)
+        self._lock_listagens = threading.Lock()
+
+    def _registrar_latencia(self, endpoint, segundos):
+        with self._lock_latencias:
+            amostras = self._latencias.setdefault(endpoint, [])
+            amostras.append(segundos)
+            if len(amostras) > MAX_AMOSTRAS_LATENCIA:
+                del amostras[0]
+
+    def requisitar(self, endpoint, metodo, url, repetir=None, **kwargs):
+        """Faz a requisição autenticada, medindo a latência por endpoint.
+
+        repetir diz se o agendador pode repetir a requisição após falha; por padrão, só os METODOS_REPETIVEIS.
+        """
+        headers = dict(kwargs.pop("headers", None) or {})
+        kwargs.setdefault("timeout", self.tempo_limite)
+        if repetir is None:
+            repetir = metodo in METODOS_REPETIVEIS
+        for tentativa in range(2):
+            headers["Authorization"] = f"Bearer {self.gerenciador_token.obter_token()}"
+            inicio = time.perf_counter()
+            try:
+                if self.agendador is not None:
+                    response = self.agendador.executar(
+                        lambda: self.sessao.request(metodo, url, headers=headers, **kwargs), repetir=repetir)
+                else:
+                    response = self.sessao.request(metodo, url, headers=headers, **kwargs)
+            finally:
+                self._registrar_latencia(endpoint, time.perf_counter() - inicio)
+
+            # Token revogado/expirado antes da hora: renova uma vez e repete
+            if response.status_code == 401 and tentativa == 0:
+                self.gerenciador_token.invalidar()
+                continue
+            return response
+
+    def listar_arquivos(self, pasta_id, campos="id, name, mimeType"):
+        """Lista todos os arquivos da pasta (todas as páginas), com cache curto em memória.
+
+        Resposta de erro em qualquer página levanta exceção; nada é guardado no cache.
+        """
+        chave = (pasta_id, campos)
+        with self._lock_listagens:
+            em_cache = self._listagens.get(chave)
+        if em_cache is not None and time.time() < em_cache[0]:
+            return list(em_cache[1])
+
+        inicio = time.perf_counter()
+        arquivos = []
+        params = {
+            "q": f"'{pasta_id}' in parents and trashed=false",  # Busca apenas arquivos na pasta especificada
+            "fields": f"nextPageToken, files({campos})",
+            "pageSize": 1000
+        }
+        while True:
+            response = self.requisitar("files.list", "GET", f"{self.url_drive}/files", params=params)
+            if response.status_code != 200:
+                raise Exception(f"Erro ao listar a pasta {pasta_id}: {response.status_code}")
+            dados = response.json()
+            arquivos.extend(dados.get("files", []))
+            if not dados.get("nextPageToken"):
+                break
+            params["pageToken"] = dados["nextPageToken"]
+        self._registrar_latencia("listagem completa", time.perf_counter() - inicio)
+
+        # Só o total: a listagem se repete a cada expiração do cache e o nome de cada arquivo só enche o log
+        if arquivos:
+            print(f"📂 {len(arquivos)} arquivos na pasta {pasta_id}")
+        else:
+            print("❌ Nenhum arquivo encontrado na pasta.")
+
+        with self._lock_listagens:
+            self._listagens[chave] = (time.time() + self.ttl_listagem, arquivos)
+        return list(arquivos)
+
+    def invalidar_listagens(self, pasta_id=None):
+        """Descarta as listagens em cache (de uma pasta ou de todas)."""
+        with self._lock_listagens:
+            if pasta_id is None:
+                self._listagens.clear()
+            else:
+                for chave in [chave for chave in self._listagens if chave[0] == pasta_id]:
+                    del self._listagens[chave]
+
+    def obter_metadados(self, file_id, campos=CAMPOS_METADADOS):
+        response = self.requisitar("files.get", "GET", f"{self.url_drive}/files/{file_id}", params={"fields": campos})
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(f"Erro ao consultar o arquivo: {response.status_code}")
+
+    def _baixar_conteudo(self, file_id):
+        response = self.requisitar("files.get_media", "GET", f"{self.url_drive}/files/{file_id}", params={"alt": "media"})
+
+        if response.status_code == 200:
+            return response.content
+        else:
+            raise Exception(f"Erro ao baixar o arquivo: {response.status_code}")
+
+    def baixar_arquivo(self, file_id, metadados=None):
+        """Baixa o conteúdo original do arquivo como BytesIO, reaproveitando o cache se nada mudou.
+
+        Os metadados podem vir prontos (ex.: de obter_metadados_lote) para poupar uma chamada.
+        """
+        if self.cache is None:
+            return io.BytesIO(self._baixar_conteudo(file_id))
+
+        # Consulta só a impressão digital; os bytes vêm do disco se ela não mudou
+        if metadados is None:
+            metadados = self.obter_metadados(file_id)
+        chave = impressao_digital(metadados)
+        conteudo = self.cache.ler(chave)
+        if conteudo is not None:
+            return io.BytesIO(conteudo)
+
+        conteudo = self._baixar_conteudo(file_id)
+        md5_remoto = metadados.get("md5Checksum")
+        if md5_remoto and hashlib.md5(conteudo).hexdigest() != md5_remoto:
+            # O arquivo mudou entre a consulta e o download: não guarda com a chave antiga
+            print(f"⚠️ Conteúdo de {file_id} não confere com o md5 informado; não será guardado no cache.")
+        else:
+            self.cache.gravar(chave, conteudo)
+        return io.BytesIO(conteudo)
+
+    def atualizar_arquivo(self, file_id, conteudo, mime_type=MIME_XLSX):
+        """Substitui o conteúdo do arquivo no Drive, conferindo o md5 do que foi gravado.
+
+        Se o conteúdo for idêntico ao que já está no Drive, nada é enviado.
+        """
+        if hasattr(conteudo, "getvalue"):
+            conteudo = conteudo.getvalue()
+        elif hasattr(conteudo, "read"):
+            conteudo = conteudo.read()
+        md5_local = hashlib.md5(conteudo).hexdigest()
+
+        try:
+            md5_remoto = self.obter_metadados(file_id, campos="md5Checksum").get("md5Checksum")
+        except Exception:
+            md5_remoto = None
+        if md5_remoto == md5_local:
+            print(f"⏭️ Arquivo {file_id} já está com este conteúdo; envio ignorado.")
+            return True
+
+        try:
+            if len(conteudo) > LIMITE_UPLOAD_SIMPLES:
+                response = self._enviar_retomavel(file_id, conteudo, mime_type)
+            else:
+                response = self.requisitar(
+                    "files.update", "PATCH", f"{self.url_upload}/files/{file_id}",
+                    params={"uploadType": "media", "fields": "id, md5Checksum, parents"},
+                    headers={"Content-Type": mime_type},
+                    data=conteudo
+                )
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Erro ao atualizar o arquivo: {e}")
+            return False
+
+        if response.status_code not in (200, 201):
+            print(f"❌ Erro ao atualizar o arquivo: {response.status_code}")
+            print(response.text)  # Adiciona mais detalhes sobre o erro
+            return False
+
+        gravado = response.json()
+        md5_gravado = gravado.get("md5Checksum")
+        if md5_gravado != md5_local:
+            print(f"❌ Arquivo {file_id} enviado, mas o md5 no Drive ({md5_gravado}) não confere com o local ({md5_local})")
+            return False
+
+        # Tamanho/data de modificação mudaram: as listagens das pastas do arquivo ficam desatualizadas
+        if "parents" in gravado:
+            for pasta_id in gravado["parents"]:
+                self.invalidar_listagens(pasta_id)
+        else:
+            self.invalidar_listagens()  # Sem saber as pastas, descarta todas
+
+        # O próximo download deste arquivo já sai do cache
+        if self.cache is not None:
+            self.cache.gravar(impressao_digital({"id": file_id, "md5Checksum": md5_local}), conteudo)
+        print(f"✅ Arquivo {file_id} atualizado com sucesso!")
+        return True
+
+    def _enviar_retomavel(self, file_id, conteudo, mime_type):
+        """Envia em pedaços por uma sessão retomável, continuando de onde parou se a conexão cair."""
+        total = len(conteudo)
+        response = self.requisitar(
+            "files.update.iniciar", "PATCH", f"{self.url_upload}/files/{file_id}",
+            params={"uploadType": "resumable", "fields": "id, md5Checksum, parents"},
+            headers={"X-Upload-Content-Type": mime_type, "X-Upload-Content-Length": str(total)}
+        )
+        if response.status_code != 200:
+            return response
+        url_sessao = response.headers["Location"]
+
+        enviado = 0
+        falhas = 0
+        while True:
+            fim = min(enviado + TAMANHO_PEDACO_UPLOAD, total)
+            try:
+                response = self.requisitar(
+                    "files.update.pedaco", "PUT", url_sessao,
+                    headers={"Content-Range": f"bytes {enviado}-{fim - 1}/{total}"},
+                    data=conteudo[enviado:fim]
+                )
+            except requests.exceptions.RequestException:
+                response = None
+
+            if response is not None and response.status_code in (200, 201):
+                return response
+            if response is not None and response.status_code == 308:
+                enviado = self._bytes_confirmados(response)
+                falhas = 0
+                continue
+            if response is not None and response.status_code < 500:
+                return response  # Erro definitivo (ex.: sessão expirada)
+
+            # Conexão caiu ou erro 5xx: pergunta ao Drive quanto já chegou e retoma dali
+            falhas += 1
+            if falhas > TENTATIVAS_UPLOAD:
+                if response is None:
+                    raise requests.exceptions.ConnectionError(f"Envio de {file_id} interrompido")
+                return response
+            time.sleep(min(2 ** falhas, 30))
+            try:
+                status = self.requisitar(
+                    "files.update.status", "PUT", url_sessao,
+                    headers={"Content-Range": f"bytes */{total}"}
+                )
+            except requests.exceptions.RequestException:
+                continue
+            if status.status_code in (200, 201):
+                return status
+            if status.status_code == 308:
+                enviado = self._bytes_confirmados(status)
+
+    @staticmethod
+    def _bytes_confirmados(response):
+        # Cabeçalho "Range: bytes=0-N" indica o último byte recebido; sem ele, nada chegou
+        faixa = response.headers.get("Range")
+        return int(faixa.split("-")[1]) + 1 if faixa else 0
+
+    def copiar_convertendo(self, file_id, file_name, mime_type=MIME_GOOGLE_SHEETS):
+        """Cria uma cópia convertida (ex.: .xlsx -> Google Sheets) e retorna o ID da cópia."""
+        corpo = {
+            "name": f"{file_name} (Convertido)",
+            "mimeType": mime_type
+        }
+        response = self.requisitar(
+            "files.copy", "POST", f"{self.url_drive}/files/{file_id}/copy",
+            params={"fields": "id"}, json=corpo
+        )
+
+        if response.status_code == 200:
+            return response.json().get("id")
+        else:
+            print(f"❌ Erro ao converter {file_name}: {response.text}")
+            return None
+
+    def exportar_csv(self, file_id):
+        """Exporta uma planilha Google Sheets como CSV (primeira aba), em bytes.
+
+        A resposta vem sem charset; response.text decodificaria como ISO-8859-1 e estragaria os acentos.
+        A codificação é decidida na leitura (calculos_painel.ler_csv_exportado).
+        """
+        response = self.requisitar(
+            "files.export", "GET", f"{self.url_drive}/files/{file_id}/export",
+            params={"mimeType": "text/csv"}
+        )
+        response.raise_for_status()  # Levanta uma exceção para status de erro
+        return response.content
+
+    def excluir_arquivo(self, file_id):
+        response = self.requisitar("files.delete", "DELETE", f"{self.url_drive}/files/{file_id}")
+
+        if response.status_code == 204:
+            print(f"Arquivo {file_id} excluído com sucesso.")
+            return True
+        else:
+            print(f"❌ Erro ao excluir o arquivo {file_id}: {response.text}")
+            return False
+
+    def executar_lote(self, operacoes):
+        """Envia várias operações pequenas em requisições multipart de batch.
+
+        Cada operação é um dict com "metodo", "caminho" (relativo a /drive/v3), e opcionalmente
+        "params" e "json". Retorna, na mesma ordem, dicts com "status" e "corpo" de cada item.
+        """
+        resultados = []
+        for inicio in range(0, len(operacoes), MAX_ITENS_LOTE):
+            resultados.extend(self._executar_lote_parcial(operacoes[inicio:inicio + MAX_ITENS_LOTE]))
+        return resultados
+
+    def _executar_lote_parcial(self, operacoes):
+        fronteira = f"lote_{uuid.uuid4().hex}"
+        partes = []
+        for numero, operacao in enumerate(operacoes):
+            caminho = f"{self.caminho_drive}{operacao['caminho']}"
+            if operacao.get("params"):
+                caminho += "?" + urlencode(operacao["params"])
+            parte = (f"--{fronteira}\r\nContent-Type: application/http\r\nContent-ID: <item{numero}>\r\n\r\n"
+                     f"{operacao['metodo']} {caminho} HTTP/1.1\r\n")
+            if operacao.get("json") is not None:
+                parte += f"Content-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(operacao['json'])}\r\n"
+            else:
+                parte += "\r\n"
+            partes.append(parte)
+        corpo = "".join(partes) + f"--{fronteira}--\r\n"
+
+        response = self.requisitar(
+            "batch", "POST", self.url_lote,
+            # O lote só pode ser repetido se todas as operações dele puderem (ex.: não repete cópias)
+            repetir=all(operacao["metodo"] in METODOS_REPETIVEIS for operacao in operacoes),
+            headers={"Content-Type": f"multipart/mixed; boundary={fronteira}"},
+            data=corpo.encode("utf-8")
+        )
+        if response.status_code != 200:
+            return [{"status": response.status_code, "corpo": None} for _ in operacoes]
+        return self._ler_resposta_lote(response, len(operacoes))
+
+    @staticmethod
+    def _ler_resposta_lote(response, quantidade):
+        try:
+            return ClienteDrive._interpretar_resposta_lote(response, quantidade)
+        except (IndexError, KeyError, ValueError) as e:
+            # Como erro de requisição: quem chama já trata RequestException (ex.: cai para as chamadas uma a uma)
+            raise RespostaLoteInvalida(f"Resposta do lote mal formada: {e!r}", response=response) from e
+
+    @staticmethod
+    def _interpretar_resposta_lote(response, quantidade):
+        fronteira = response.headers["Content-Type"].split("boundary=")[1].strip().strip('"')
+        resultados = [{"status": None, "corpo": None} for _ in range(quantidade)]
+
+        for bloco in response.text.split(f"--{fronteira}"):
+            bloco = bloco.replace("\r\n", "\n").strip()
+            if not bloco or bloco == "--":
+                continue
+            cabecalho_parte, _, resposta_http = bloco.partition("\n\n")
+            numero = None
+            for linha in cabecalho_parte.split("\n"):
+                if linha.lower().startswith("content-id:"):
+                    numero = int(linha.split("item")[-1].strip(" >"))
+            cabecalho_http, _, corpo = resposta_http.partition("\n\n")
+            status = int(cabecalho_http.split("\n")[0].split(" ")[1])
+            corpo = corpo.strip()
+            if numero is not None and numero < quantidade:
+                resultados[numero] = {"status": status, "corpo": json.loads(corpo) if corpo.startswith("{") else None}
+        return resultados
+
+    def excluir_arquivos(self, ids):
+        """Exclui vários arquivos em lote. Retorna {id: excluído?}."""
+        operacoes = [{"metodo": "DELETE", "caminho": f"/files/{file_id}"} for file_id in ids]
+        resultados = self.executar_lote(operacoes)
+        excluidos = {file_id: resultado["status"] == 204 for file_id, resultado in zip(ids, resultados)}
+        for file_id, ok in excluidos.items():
+            print(f"Arquivo {file_id} excluído com sucesso." if ok else f"❌ Erro ao excluir o arquivo {file_id}")
+        return excluidos
+
+    def obter_metadados_lote(self, ids, campos=CAMPOS_METADADOS):
+        """Metadados de vários arquivos em lote. Retorna {id: metadados ou None}."""
+        operacoes = [{"metodo": "GET", "caminho": f"/files/{file_id}", "params": {"fields": campos}} for file_id in ids]
+        resultados = self.executar_lote(operacoes)
+        return {
+            file_id: resultado["corpo"] if resultado["status"] == 200 else None
+            for file_id, resultado in zip(ids, resultados)
+        }
+
+    def copiar_convertendo_lote(self, arquivos, mime_type=MIME_GOOGLE_SHEETS):
+        """Cria cópias convertidas de vários arquivos em lote. Retorna {id original: id da cópia ou None}."""
+        operacoes = [
+            {
+                "metodo": "POST",
+                "caminho": f"/files/{arquivo['id']}/copy",
+                "params": {"fields": "id"},
+                "json": {"name": f"{arquivo['name']} (Convertido)", "mimeType": mime_type}
+            }
+            for arquivo in arquivos
+        ]
+        resultados = self.executar_lote(operacoes)
+        return {
+            arquivo["id"]: resultado["corpo"].get("id") if resultado["status"] == 200 and resultado["corpo"] else None
+            for arquivo, resultado in zip(arquivos, resultados)
+        }
+
+    def obter_token_inicial_mudancas(self):
+        """Token que marca o momento atual no feed de mudanças do Drive."""
+        response = self.requisitar("changes.getStartPageToken", "GET", f"{self.url_drive}/changes/startPageToken")
+
+        if response.status_code == 200:
+            return response.json()["startPageToken"]
+        else:
+            raise Exception(f"Erro ao obter o token de mudanças: {response.status_code}")
+
+    def listar_mudancas(self, page_token, campos="fileId, removed, file(name, parents, trashed)"):
+        """Retorna as mudanças desde o page_token e o token para a próxima consulta."""
+        mudancas = []
+        while True:
+            params = {
+                "pageToken": page_token,
+                "pageSize": 1000,
+                "fields": f"nextPageToken, newStartPageToken, changes({campos})"
+            }
+            response = self.requisitar("changes.list", "GET", f"{self.url_drive}/changes", params=params)
+            if response.status_code != 200:
+                raise Exception(f"Erro ao listar mudanças: {response.status_code}")
+
+            dados = response.json()
+            mudancas.extend(dados.get("changes", []))
+            if "newStartPageToken" in dados:
+                return mudancas, dados["newStartPageToken"]
+            page_token = dados["nextPageToken"]
+
+    def estatisticas_latencia(self):
+        """Resumo (em ms) das latências por endpoint."""
+        with self._lock_latencias:
+            latencias = {endpoint: sorted(amostras) for endpoint, amostras in self._latencias.items()}
+
+        resumo = {}
+        for endpoint, amostras in latencias.items():
+            resumo[endpoint] = {
+                "chamadas": len(amostras),
+                "media_ms": round(sum(amostras) / len(amostras) * 1000, 1),
+                "p95_ms": round(amostras[int(0.95 * (len(amostras) - 1))] * 1000, 1),
+                "max_ms": round(amostras[-1] * 1000, 1),
+            }
+        return resumo
+
+
+# Um cliente por configuração (token, pool, cache, agendador e tempo limite), compartilhado pelas páginas
+# do processo que a usam; uma página configurada de outro jeito recebe o seu próprio cliente
+_clientes = {}
+_lock_clientes = threading.Lock()
+
+
+def obter_cliente_drive(gerenciador_token, tamanho_pool=TAMANHO_POOL, cache=None, agendador=None,
+                        tempo_limite=(TEMPO_LIMITE_CONEXAO, TEMPO_LIMITE_LEITURA)):
+    with _lock_clientes:
+        chave = (gerenciador_token, tamanho_pool, cache, agendador, tempo_limite)
+        if chave not in _clientes:
+            _clientes[chave] = ClienteDrive(gerenciador_token, tamanho_pool=tamanho_pool, cache=cache, agendador=agendador,
+                                            tempo_limite=tempo_limite)
+        return _clientes[chave]
+
+
+def estatisticas_clientes():
+    with _lock_clientes:
+        clientes = list(_clientes.values())
+    return [cliente.estatisticas_latencia() for cliente in clientes]
@@ -2,10 +2,7 @@ import streamlit as st
 import os
 from io import BytesIO
 import pandas as pd
-import requests
 from unidecode import unidecode
-import time
-import io
 from bs4 import BeautifulSoup
 import re
 from openpyxl import load_workbook
@@ -14,6 +11,10 @@ from openpyxl.utils import get_column_letter
 import json
 import unicodedata
 from pages.config import carregar_configuracoes
+from pages.token_google import obter_gerenciador_token
+from pages.cache_drive import obter_cache_arquivos, TAMANHO_CACHE_MB
+from pages.controle_trafego import obter_agendador, REQUISICOES_POR_SEGUNDO
+from pages.drive_google import obter_cliente_drive, TAMANHO_POOL, TEMPO_LIMITE_CONEXAO, TEMPO_LIMITE_LEITURA
 
 
 config = carregar_configuracoes()
@@ -25,31 +26,22 @@ REFRESH_TOKEN = config["REFRESH_TOKEN"]  # Use o refresh_token que você obteve
 # ID da pasta específica
 PASTA_ID = config["PASTA_ID_FISCAIS"]  # Coloque o ID da sua pasta aqui
 
-# Função para renovar o token usando o refresh_token
-def renovar_token(refresh_token):
-    url = "https://oauth2.googleapis.com/token"
-    data = {
-        'client_id': CLIENT_ID,
-        'client_secret': CLIENT_SECRET,
-        'refresh_token': refresh_token,
-        'grant_type': 'refresh_token'
-    }
-    
-    response = requests.post(url, data=data)
-    if response.status_code == 200:
-        token_info = response.json()
-        access_token = token_info.get('access_token')
-        return access_token
-    else:
-        return None
+# Token de acesso compartilhado entre sessões e reruns (renovado só quando expira)
+gerenciador_token = obter_gerenciador_token(CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN)
+
 # Função para obter o token de acesso
 def get_access_token():
-    global ACCESS_TOKEN
-    if not hasattr(get_access_token, "expires_at") or time.time() > get_access_token.expires_at:
-        # Se o token tiver expirado ou não estiver definido, renove-o
-        ACCESS_TOKEN = renovar_token(REFRESH_TOKEN)
-        get_access_token.expires_at = time.time() + 3600  # Defina o tempo de expiração como 1 hora (3600 segundos)
-    return ACCESS_TOKEN
+    return gerenciador_token.obter_token()
+
+# Cliente do Drive compartilhado (conexões reaproveitadas entre chamadas e sessões)
+drive = obter_cliente_drive(
+    gerenciador_token,
+    config.get("DRIVE_TAMANHO_POOL", TAMANHO_POOL),
+    cache=obter_cache_arquivos(config.get("CACHE_DRIVE_MB", TAMANHO_CACHE_MB)),
+    agendador=obter_agendador(config.get("DRIVE_REQUISICOES_POR_SEGUNDO", REQUISICOES_POR_SEGUNDO)),
+    tempo_limite=(config.get("DRIVE_TEMPO_LIMITE_CONEXAO", TEMPO_LIMITE_CONEXAO),
+                  config.get("DRIVE_TEMPO_LIMITE_LEITURA", TEMPO_LIMITE_LEITURA))
+)
 
 def verificar_token():
     """Simula a verificação do token"""
@@ -119,36 +111,6 @@ def normalizar_planilha(file):
     df_normalizado = df.apply(lambda x: normalizar_string(x) if isinstance(x, str) else x)
     return df_normalizado
 
-# Função para baixar o arquivo do Google Drive
-def baixar_arquivo_drive(file_id):
-    url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
-    headers = {"Authorization": f"Bearer {get_access_token()}"}
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code == 200:
-        return io.BytesIO(response.content)  # Retorna o arquivo como BytesIO
-    else:
-        raise Exception(f"Erro ao baixar o arquivo: {response.status_code}")
-# Função para carregar a planilha base de uma região do Google Drive
-# Função para atualizar a planilha no Google Drive
-def atualizar_planilha_drive(file_id, arquivo_processado):
-    url = f"https://www.googleapis.com/upload/drive/v3/files/{file_id}?uploadType=media"
-    headers = {
-        "Authorization": f"Bearer {get_access_token()}",
-        "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"  # Definindo o tipo do arquivo
-    }
-    
-    # O conteúdo do arquivo processado será enviado
-    response = requests.patch(url, headers=headers, data=arquivo_processado)
-
-    if response.status_code == 200:
-        print(f"✅ Arquivo {file_id} atualizado com sucesso!")
-        return True
-    else:
-        print(f"❌ Erro ao atualizar o arquivo: {response.status_code}")
-        print(response.text)  # Adiciona mais detalhes sobre o erro
-        return False
-
 def formatar_contrato(numero_contrato):
     if pd.isna(numero_contrato):  # Se for NaN, retorna como está (não altera)
         return numero_contrato
@@ -562,7 +524,7 @@ else:
                     }[regiao]
 
                     # Aqui o processamento e a atualização da planilha
-                    df = baixar_arquivo_drive(file_id)
+                    df = drive.baixar_arquivo(file_id)
                     df = pd.read_excel(df)
 
                     if df is not None:
@@ -585,9 +547,10 @@ else:
                             arquivo_formatado = formatar_planilha(arquivo_processado)
 
                             # Enviar para o Google Drive
-                            atualizar_planilha_drive(file_id, arquivo_formatado.getvalue())
-
-                            st.success(f"✔️ Planilha da região {regiao} atualizada com sucesso!")
+                            if drive.atualizar_arquivo(file_id, arquivo_formatado.getvalue()):
+                                st.success(f"✔️ Planilha da região {regiao} atualizada com sucesso!")
+                            else:
+                                st.error(f"❌ Não foi possível enviar a planilha da região {regiao} ao Google Drive. Baixe-a abaixo ou tente novamente.")
 
                             # Exibir diferenças
                             detalhes, novas_linhas_detalhes, df_alteradas_atual, df_alteradas_original, novas_linhas_df = mostrar_diferencas(df_original, df)
@@ -1,11 +1,13 @@
-import requests
 import pandas as pd
 import openpyxl
 from datetime import datetime
 import io
 import streamlit as st
-import time
 from pages.config import carregar_configuracoes
+from pages.token_google import obter_gerenciador_token
+from pages.cache_drive import obter_cache_arquivos, TAMANHO_CACHE_MB
+from pages.controle_trafego import obter_agendador, REQUISICOES_POR_SEGUNDO
+from pages.drive_google import obter_cliente_drive, TAMANHO_POOL, TEMPO_LIMITE_CONEXAO, TEMPO_LIMITE_LEITURA
 
 
 config = carregar_configuracoes()
@@ -17,31 +19,22 @@ REFRESH_TOKEN = config["REFRESH_TOKEN"]  # Use o refresh_token que você obteve
 # ID da pasta específica
 PASTA_ID = config["PASTA_ID_ORCAMENTO"]  # Coloque o ID da sua pasta aqui
 
-# Função para renovar o token usando o refresh_token
-def renovar_token(refresh_token):
-    url = "https://oauth2.googleapis.com/token"
-    data = {
-        'client_id': CLIENT_ID,
-        'client_secret': CLIENT_SECRET,
-        'refresh_token': refresh_token,
-        'grant_type': 'refresh_token'
-    }
-    
-    response = requests.post(url, data=data)
-    if response.status_code == 200:
-        token_info = response.json()
-        access_token = token_info.get('access_token')
-        return access_token
-    else:
-        return None
+# Token de acesso compartilhado entre sessões e reruns (renovado só quando expira)
+gerenciador_token = obter_gerenciador_token(CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN)
+
 # Função para obter o token de acesso
 def get_access_token():
-    global ACCESS_TOKEN
-    if not hasattr(get_access_token, "expires_at") or time.time() > get_access_token.expires_at:
-        # Se o token tiver expirado ou não estiver definido, renove-o
-        ACCESS_TOKEN = renovar_token(REFRESH_TOKEN)
-        get_access_token.expires_at = time.time() + 3600  # Defina o tempo de expiração como 1 hora (3600 segundos)
-    return ACCESS_TOKEN
+    return gerenciador_token.obter_token()
+
+# Cliente do Drive compartilhado (conexões reaproveitadas entre chamadas e sessões)
+drive = obter_cliente_drive(
+    gerenciador_token,
+    config.get("DRIVE_TAMANHO_POOL", TAMANHO_POOL),
+    cache=obter_cache_arquivos(config.get("CACHE_DRIVE_MB", TAMANHO_CACHE_MB)),
+    agendador=obter_agendador(config.get("DRIVE_REQUISICOES_POR_SEGUNDO", REQUISICOES_POR_SEGUNDO)),
+    tempo_limite=(config.get("DRIVE_TEMPO_LIMITE_CONEXAO", TEMPO_LIMITE_CONEXAO),
+                  config.get("DRIVE_TEMPO_LIMITE_LEITURA", TEMPO_LIMITE_LEITURA))
+)
 
 def verificar_token():
     """Simula a verificação do token"""
@@ -91,58 +84,6 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-# Função para listar arquivos dentro da pasta
-def listar_arquivos(pasta_id):
-    url = "https://www.googleapis.com/drive/v3/files"
-    params = {
-        "q": f"'{pasta_id}' in parents and trashed=false",  # Busca apenas arquivos na pasta especificada
-        "fields": "files(id, name)"
-    }
-    headers = {"Authorization": f"Bearer {get_access_token()}"}
-
-    response = requests.get(url, params=params, headers=headers)
-    arquivos = response.json().get("files", [])
-    
-    if arquivos:
-        print(f"📂 Arquivos na pasta {pasta_id}:")
-        for arquivo in arquivos:
-            print(f"📄 {arquivo['name']} (ID: {arquivo['id']})")
-        return arquivos
-    else:
-        print("❌ Nenhum arquivo encontrado na pasta.")
-        return []
-
-# Função para baixar o arquivo do Google Drive
-def baixar_arquivo_drive(file_id):
-    url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
-    headers = {"Authorization": f"Bearer {get_access_token()}"}
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code == 200:
-        return io.BytesIO(response.content)  # Retorna o arquivo como BytesIO
-    else:
-        raise Exception(f"Erro ao baixar o arquivo: {response.status_code}")
-    
-
-# Função para atualizar a planilha no Google Drive
-def atualizar_planilha_drive(file_id, arquivo_processado):
-    url = f"https://www.googleapis.com/upload/drive/v3/files/{file_id}?uploadType=media"
-    headers = {
-        "Authorization": f"Bearer {get_access_token()}",
-        "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"  # Definindo o tipo do arquivo
-    }
-    
-    # O conteúdo do arquivo processado será enviado
-    response = requests.patch(url, headers=headers, data=arquivo_processado)
-
-    if response.status_code == 200:
-        print(f"✅ Arquivo {file_id} atualizado com sucesso!")
-        return True
-    else:
-        print(f"❌ Erro ao atualizar o arquivo: {response.status_code}")
-        print(response.text)  # Adiciona mais detalhes sobre o erro
-        return False
-
 # Função para processar a planilha e registrar alterações no log
 def processar_planilhas(arquivo_base, arquivo_atualizacao, nome_arquivo_base):
     # Reabre a planilha para garantir que todas as abas sejam recarregadas
@@ -266,7 +207,11 @@ st.html("</br></br></br>")
 
 
 col1, col2 = st.columns(2)
-arquivos = listar_arquivos(PASTA_ID)
+try:
+    arquivos = drive.listar_arquivos(PASTA_ID, campos="id, name")
+except Exception as e:
+    st.error(f"❌ Não foi possível listar as planilhas do Google Drive: {e}")
+    st.stop()
 with col1:
     if arquivos:
         nomes_arquivos = [arquivo['name'] for arquivo in arquivos]  # Certifique-se de que arquivos é uma lista
@@ -282,11 +227,11 @@ if planilhas_selecionadas and uploaded_file_atualizacao:
             progress_bar = st.progress(0)
             for i, nome_arquivo_base in enumerate(planilhas_selecionadas):
                 arquivo_base_id = next(arquivo['id'] for arquivo in arquivos if arquivo['name'] == nome_arquivo_base)
-                arquivo_base = baixar_arquivo_drive(arquivo_base_id)
+                arquivo_base = drive.baixar_arquivo(arquivo_base_id)
                 
                 buffer_final, nome_arquivo = processar_planilhas(arquivo_base, uploaded_file_atualizacao, nome_arquivo_base)
                 
-                if atualizar_planilha_drive(arquivo_base_id, buffer_final):
+                if drive.atualizar_arquivo(arquivo_base_id, buffer_final):
                     st.success(f"✅ {nome_arquivo} atualizado com sucesso no Google Drive!")
 
                 progress_bar.progress((i + 1) / len(planilhas_selecionadas))    
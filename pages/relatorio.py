@@ -4,15 +4,30 @@ import streamlit as st
 import time
 from io import StringIO  
 import io
+import re
+import zipfile
 import os
 import json
 import plotly.express as px
 from datetime import datetime, date
-import calendar
 import plotly.graph_objects as go
 from pages.config import carregar_configuracoes
+from pages.token_google import obter_gerenciador_token
+from pages.cache_drive import obter_cache_arquivos, impressao_digital, TAMANHO_CACHE_MB
+from pages.cache_visoes import obter_cache_visoes, ITENS_CACHE_VISOES
+from pages.controle_trafego import obter_agendador, REQUISICOES_POR_SEGUNDO
+from pages.drive_google import obter_cliente_drive, TAMANHO_POOL, TEMPO_LIMITE_CONEXAO, TEMPO_LIMITE_LEITURA, MIME_XLSX, MIME_GOOGLE_SHEETS
+from pages.calculos_painel import (converter_colunas_monetarias, preencher_valor_anual_proporcional, ler_csv_exportado,
+                                   identificar_meses, evolucao_para_formato_longo, chave_mes, compactar_painel,
+                                   relatar_memoria, montar_cubo, linhas_da_nota, COLUNAS_DIMENSAO_EVOLUCAO,
+                                   MEDIDAS_CUBO)
+from pages.snapshot_painel import (gravar_principal, gravar_complementar, gravar_evolucao, gravar_cubo, iniciar_versao,
+                                   publicar_versao, descartar_versao, obter_snapshot, migrar_snapshot_antigo)
+from pages.consultas_painel import obter_consultas
+from pages.atualizador_painel import obter_atualizador, avisar_atualizador, ATUALIZACAO_MINUTOS, SEGUNDOS_ACOMPANHAMENTO
 import math
 import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
 
 
 #st.set_page_config(layout="wide")
@@ -26,31 +41,36 @@ REFRESH_TOKEN = config["REFRESH_TOKEN"]  # Use o refresh_token que você obteve
 # ID da pasta específica
 PASTA_ID = config["PASTA_ID_ORCAMENTO"]  # Coloque o ID da sua pasta aqui
 
-# Função para renovar o token usando o refresh_token
-def renovar_token(refresh_token):
-    url = "https://oauth2.googleapis.com/token"
-    data = {
-        'client_id': CLIENT_ID,
-        'client_secret': CLIENT_SECRET,
-        'refresh_token': refresh_token,
-        'grant_type': 'refresh_token'
-    }
-    
-    response = requests.post(url, data=data)
-    if response.status_code == 200:
-        token_info = response.json()
-        access_token = token_info.get('access_token')
-        return access_token
-    else:
-        return None
+# Quantas planilhas são baixadas ao mesmo tempo na atualização do painel
+MAX_DOWNLOADS_SIMULTANEOS = config.get("MAX_DOWNLOADS_SIMULTANEOS", 5)
+
+# Lê o .xlsx original direto do Drive em vez de converter para Google Sheets e exportar CSV
+LEITURA_DIRETA_XLSX = config.get("PAINEL_LEITURA_DIRETA", True)
+
+# "Atualizar Dados" reprocessa só as planilhas que mudaram no Drive desde a última vez
+SINCRONIZACAO_INCREMENTAL = config.get("PAINEL_SINCRONIZACAO_INCREMENTAL", True)
+# Atualização automática em segundo plano, de quantos em quantos minutos (0 = só pelo botão)
+ATUALIZACAO_AUTOMATICA_MINUTOS = config.get("PAINEL_ATUALIZACAO_MINUTOS", ATUALIZACAO_MINUTOS)
+
+# Token de acesso compartilhado entre sessões e reruns (renovado só quando expira)
+gerenciador_token = obter_gerenciador_token(CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN)
+
 # Função para obter o token de acesso
 def get_access_token():
-    global ACCESS_TOKEN
-    if not hasattr(get_access_token, "expires_at") or time.time() > get_access_token.expires_at:
-        # Se o token tiver expirado ou não estiver definido, renove-o
-        ACCESS_TOKEN = renovar_token(REFRESH_TOKEN)
-        get_access_token.expires_at = time.time() + 3600  # Defina o tempo de expiração como 1 hora (3600 segundos)
-    return ACCESS_TOKEN
+    return gerenciador_token.obter_token()
+
+# Cliente do Drive compartilhado (conexões reaproveitadas entre chamadas e sessões)
+drive = obter_cliente_drive(
+    gerenciador_token,
+    config.get("DRIVE_TAMANHO_POOL", TAMANHO_POOL),
+    cache=obter_cache_arquivos(config.get("CACHE_DRIVE_MB", TAMANHO_CACHE_MB)),
+    agendador=obter_agendador(config.get("DRIVE_REQUISICOES_POR_SEGUNDO", REQUISICOES_POR_SEGUNDO)),
+    tempo_limite=(config.get("DRIVE_TEMPO_LIMITE_CONEXAO", TEMPO_LIMITE_CONEXAO),
+                  config.get("DRIVE_TEMPO_LIMITE_LEITURA", TEMPO_LIMITE_LEITURA))
+)
+
+# Visões filtradas e figuras do painel, compartilhadas entre sessões até a próxima atualização do snapshot
+cache_visoes = obter_cache_visoes("painel", config.get("PAINEL_CACHE_VISOES", ITENS_CACHE_VISOES))
 
 def verificar_token():
     """Simula a verificação do token"""
@@ -68,328 +88,386 @@ def verificar_token():
 # Antes de qualquer outra execução, verificar o token
 verificar_token()
 
-def listar_arquivos(pasta_id):
-    url = "https://www.googleapis.com/drive/v3/files"
-    params = {
-        "q": f"'{pasta_id}' in parents and trashed=false",  # Busca apenas arquivos na pasta especificada
-        "fields": "files(id, name, mimeType)"  # Adiciona 'mimeType' para identificar o tipo de arquivo
-    }
-    headers = {"Authorization": f"Bearer {get_access_token()}"}
+# Layout das 31 primeiras colunas das planilhas de objetos
+COLUNAS_PRINCIPAIS = ["Regiao", "Processo", "Contrato", "Objeto", "Nota Empenho", "Valor Empenhado", "Valor Pago", "Valor Global", 
+                      "Valor Anual", "Valor Mensal", "Status", "Ultima Repactuacao", "Ocorrência", "Data de Ocorrência", 
+                      "Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez", "Total Anual", 
+                      "Indice", "Evolucao", "Reajuste", "Reforço/Remanejamento"]
 
-    response = requests.get(url, params=params, headers=headers)
-    arquivos = response.json().get("files", [])
-    
-    if arquivos:
-        print(f"📂 Arquivos na pasta {pasta_id}:")
-        for arquivo in arquivos:
-            print(f"📄 {arquivo['name']} (ID: {arquivo['id']}) - Tipo: {arquivo['mimeType']}")
-        return arquivos
-    else:
-        print("❌ Nenhum arquivo encontrado na pasta.")
-        return []
-
-def excluir_arquivo(file_id):
-    """Excluir o arquivo após o uso."""
-    access_token = get_access_token()
-    url = f"https://www.googleapis.com/drive/v3/files/{file_id}"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.delete(url, headers=headers)
-    if response.status_code == 204:
-        print(f"Arquivo {file_id} excluído com sucesso.")
-    else:
-        st.error(f"Erro ao excluir o arquivo {file_id}: {response.text}")
+COLUNAS_VALORES = ["Valor Empenhado", "Valor Pago", "Valor Global", "Valor Anual", "Valor Mensal", "Jan", "Fev", "Mar", 
+                   "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez", "Total Anual", "Reforço/Remanejamento"]
 
-def converter_para_google_sheets(file_id, file_name):
-    """Converte um arquivo .xlsx para Google Sheets e exclui o arquivo convertido após o uso."""
-    access_token = get_access_token()
-    url = f"https://www.googleapis.com/drive/v3/files/{file_id}/copy"
-    
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    
-    params = {
-        "name": f"{file_name} (Convertido)",
-        "mimeType": "application/vnd.google-apps.spreadsheet"
-    }
-    
-    response = requests.post(url, headers=headers, json=params)
-    
-    if response.status_code == 200:
-        new_file_id = response.json().get("id")
-        return new_file_id  # Retorna o novo ID do arquivo convertido
-    else:
-        st.error(f"Erro ao converter {file_name}: {response.text}")
-        return None
+# Valores guardados como centavos inteiros no snapshot
+COLUNAS_CENTAVOS = COLUNAS_VALORES + ["Valor Anual Proporcional"]
 
-# Função para limpar e converter valores monetários
-def converter_monetario(valor):
-    if isinstance(valor, str):  # Verificar se é uma string
-        valor = valor.strip()  # Remover espaços extras no início e no fim
-        valor = valor.replace("R$", "")  # Remover o símbolo R$
-        valor = valor.replace(" ", "")  # Remover espaços extras no meio
-        valor = valor.replace(".", "")  # Remover pontos, caso haja como separador de milhar
-        valor = valor.replace(",", ".")  # Substituir a vírgula por ponto para conversão de float
-        try:
-            return float(valor)  # Converter para float
-        except ValueError:
-            return 0.0  # Caso não consiga converter, retorna 0.0
-    return valor  # Se não for string, retorna o valor original
-
-
-def preencher_valor_anual_proporcional(df, ano_referencia):
-    def limpar_valor(v):
-        if isinstance(v, str):
-            v = v.replace("R$", "").replace(".", "").replace(",", ".").strip()
-            try:
-                return float(v)
-            except:
-                return 0.0
-        return v
-
-    def calcular_proporcional(data_inicio, data_fim, valor_mensal):
-        dias_total = 0
-        current = pd.Timestamp(data_inicio.year, data_inicio.month, 1)
-
-        while current.date() <= data_fim:
-            _, dias_mes = calendar.monthrange(current.year, current.month)
-            inicio_mes = current
-            fim_mes = current.replace(day=dias_mes)
-
-            # Ajusta os limites
-            if pd.Timestamp(data_inicio) > inicio_mes:
-                inicio_mes = pd.Timestamp(data_inicio)
-            if pd.Timestamp(data_fim) < fim_mes:
-                fim_mes = pd.Timestamp(data_fim)
-
-            dias_no_mes = (fim_mes - inicio_mes).days + 1
-
-            # Verifica se o mês deve ser contado como cheio
-            if inicio_mes.day == 1 and fim_mes.day == dias_mes:
-                valor_mes = valor_mensal
-            else:
-                valor_mes = (valor_mensal / dias_mes) * dias_no_mes
 
-            dias_total += valor_mes
-            current += pd.DateOffset(months=1)
-            current = current.replace(day=1)
+# Fórmula sem o último valor calculado (ex.: planilha salva pelo openpyxl na página de orçamento)
+_FORMULA_SEM_VALOR = re.compile(rb"<f[^>]*(?:/>|>[^<]*</f>)(?:<v\s*/>|<v>\s*</v>)?</c>")
 
-        return dias_total
 
-    df['Valor Mensal'] = df['Valor Mensal'].apply(limpar_valor)
-    df['Ocorrência'] = df['Ocorrência'].astype(str).str.strip().str.lower()
-    df['Data de Ocorrência'] = pd.to_datetime(df['Data de Ocorrência'], dayfirst=True, errors='coerce')
-    df['Valor Anual Proporcional'] = None  # zera antes de preencher
+def xlsx_tem_formulas_sem_valor(conteudo):
+    """Verifica se alguma aba tem fórmulas sem valor em cache, que só o Google Sheets saberia calcular."""
+    with zipfile.ZipFile(conteudo) as pacote:
+        for nome in pacote.namelist():
+            if nome.startswith("xl/worksheets/") and nome.endswith(".xml"):
+                if _FORMULA_SEM_VALOR.search(pacote.read(nome)):
+                    return True
+    conteudo.seek(0)
+    return False
 
-    for i, row in df.iterrows():
-        ocorrencia = row['Ocorrência']
-        data_ocorrencia = row['Data de Ocorrência']
-        valor_mensal = row['Valor Mensal']
 
-        if pd.isnull(valor_mensal) or valor_mensal == 0:
-            continue
+def baixar_arquivo_painel(arquivo, metadados=None, id_copia=None):
+    """Baixa um arquivo do painel: .xlsx original quando possível, senão pelo caminho CSV."""
+    inicio = time.perf_counter()
 
-        if ocorrencia == 'inicio' and not pd.isnull(data_ocorrencia):
-            inicio_data = data_ocorrencia.date()
-            fim_data = date(ano_referencia, 12, 31)
+    if LEITURA_DIRETA_XLSX and arquivo["mimeType"] == MIME_XLSX:
+        conteudo = drive.baixar_arquivo(arquivo["id"], metadados)
+        if not xlsx_tem_formulas_sem_valor(conteudo):
+            return {
+                "id": arquivo["id"],
+                "name": arquivo["name"],
+                "conteudo": conteudo,
+                "formato": "xlsx",
+                "id_copia": None,
+                "tempo": time.perf_counter() - inicio
+            }
+        print(f"⚠️ {arquivo['name']} tem fórmulas sem valor calculado; usando a conversão pelo Google Sheets.")
 
-            if inicio_data <= fim_data:
-                valor_total = calcular_proporcional(inicio_data, fim_data, valor_mensal)
-                df.at[i, 'Valor Anual Proporcional'] = round(valor_total, 2)
-            continue
+    resultado = baixar_arquivo_csv(arquivo, metadados, id_copia)
+    if resultado is not None:
+        resultado["tempo"] = time.perf_counter() - inicio
+    return resultado
 
-        elif ocorrencia == 'rescisão' and not pd.isnull(data_ocorrencia):
-            fim_data = data_ocorrencia.date()
-            inicio_data = date(ano_referencia, 1, 1)
 
-            if inicio_data <= fim_data:
-                valor_total = calcular_proporcional(inicio_data, fim_data, valor_mensal)
-                df.at[i, 'Valor Anual Proporcional'] = round(valor_total, 2)
-            continue
+def baixar_arquivo_csv(arquivo, metadados=None, id_copia=None):
+    """Converte (se for .xlsx) e exporta um arquivo como CSV. Roda fora da thread do Streamlit.
 
-        elif ocorrencia in ('nan', '', 'outro', 'não informado', 'ajuste', 'reajuste') or pd.isnull(ocorrencia):
-            df.at[i, 'Valor Anual Proporcional'] = round(valor_mensal * 12, 2)
-            continue
+    id_copia é a cópia convertida já criada no lote (criar_copias_convertidas); sem ela, a cópia é feita aqui.
+    """
+    file_id = arquivo["id"]
+    file_name = arquivo["name"]
+    mime_type = arquivo["mimeType"]
+
+    # CSV já exportado desta mesma versão do arquivo: não precisa converter de novo
+    chave_cache = None
+    if drive.cache is not None:
+        chave_cache = impressao_digital(metadados or drive.obter_metadados(file_id), "csv")
+        # Com a cópia já criada o CSV não estava no cache: só falta exportar
+        conteudo = drive.cache.ler(chave_cache) if id_copia is None else None
+        if conteudo is not None:
+            return {
+                "id": file_id,
+                "name": file_name,
+                "conteudo": io.BytesIO(conteudo),
+                "formato": "csv",
+                "id_copia": None
+            }
 
-    return df
+    # Se for um arquivo .xlsx, precisamos convertê-lo primeiro
+    if mime_type == MIME_XLSX:
+        novo_id = id_copia or drive.copiar_convertendo(file_id, file_name)
+        if not novo_id:
+            raise Exception(f"Erro ao converter {file_name}")
+        file_id = novo_id  # Usa o novo ID do arquivo convertido
+        mime_type = MIME_GOOGLE_SHEETS
 
+    # Agora podemos exportar como CSV
+    if mime_type != MIME_GOOGLE_SHEETS:
+        return None  # Ignora outros tipos de arquivo
 
+    try:
+        conteudo = drive.exportar_csv(file_id)
+    except requests.exceptions.RequestException:
+        # Não deixa a cópia convertida esquecida no Drive
+        if file_id != arquivo["id"]:
+            drive.excluir_arquivo(file_id)
+        raise
+
+    if chave_cache is not None:
+        drive.cache.gravar(chave_cache, conteudo)
+
+    return {
+        "id": file_id,
+        "name": file_name,
+        "conteudo": io.BytesIO(conteudo),
+        "formato": "csv",
+        "id_copia": file_id if file_id != arquivo["id"] else None
+    }
 
-def baixar_arquivos_google_drive(arquivos):
-    access_token = get_access_token()
-    arquivos_download = []
-    
-    
-    for arquivo in arquivos:
-        file_id = arquivo["id"]
-        file_name = arquivo["name"]
-        mime_type = arquivo["mimeType"]
-
-        # Se for um arquivo .xlsx, precisamos convertê-lo primeiro
-        if mime_type == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet":
-            novo_id = converter_para_google_sheets(file_id, file_name)
-            if novo_id:
-                file_id = novo_id  # Usa o novo ID do arquivo convertido
-                mime_type = "application/vnd.google-apps.spreadsheet"
-            else:
-                continue  # Se a conversão falhar, pula esse arquivo
 
-        # Agora podemos exportar como CSV
-        if mime_type == "application/vnd.google-apps.spreadsheet":
-            export_url = f"https://www.googleapis.com/drive/v3/files/{file_id}/export?mimeType=text/csv"
-        else:
-            continue  # Ignora outros tipos de arquivo
+def criar_copias_convertidas(arquivos, metadados):
+    """Cria numa única requisição em lote as cópias convertidas do caminho CSV. Retorna {id original: id da cópia}.
+
+    Entram os .xlsx que não serão lidos direto e cujo CSV não está no cache; o que ficar de fora ou falhar
+    no lote é convertido um a um em baixar_arquivo_csv.
+    """
+    if LEITURA_DIRETA_XLSX:
+        return {}  # Só se convertem os .xlsx com fórmulas sem valor, descobertos no download
+
+    pendentes = []
+    for arquivo in arquivos:
+        if arquivo["mimeType"] != MIME_XLSX:
+            continue
+        if drive.cache is not None:
+            # Sem os metadados do lote não dá para consultar o cache aqui
+            if metadados.get(arquivo["id"]) is None or drive.cache.contem(impressao_digital(metadados[arquivo["id"]], "csv")):
+                continue
+        pendentes.append(arquivo)
+    if not pendentes:
+        return {}
 
-        headers = {"Authorization": f"Bearer {access_token}"}
+    try:
+        copias = drive.copiar_convertendo_lote(pendentes)
+    except requests.exceptions.RequestException as e:
+        print(f"Erro ao converter em lote; convertendo um a um: {e}")
+        return {}
+    return {file_id: id_copia for file_id, id_copia in copias.items() if id_copia}
+
+
+def baixar_arquivos_google_drive(arquivos, max_downloads=MAX_DOWNLOADS_SIMULTANEOS):
+    """Baixa todos os arquivos em paralelo, mantendo a ordem da lista de entrada."""
+    # Impressões digitais de todos os arquivos numa única requisição em lote
+    metadados = {}
+    if drive.cache is not None and arquivos:
         try:
-            response = requests.get(export_url, headers=headers)
-            response.raise_for_status()  # Levanta uma exceção para status de erro
+            metadados = drive.obter_metadados_lote([arquivo["id"] for arquivo in arquivos])
         except requests.exceptions.RequestException as e:
-            print(f"Erro ao baixar {file_name}: {e}")
+            print(f"Erro ao consultar metadados em lote; consultando um a um: {e}")
+
+    # Cópias convertidas do caminho CSV também num único lote, em vez de um files.copy por arquivo
+    copias = criar_copias_convertidas(arquivos, metadados)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_downloads, len(arquivos)))) as executor:
+        futuros = [executor.submit(baixar_arquivo_painel, arquivo, metadados.get(arquivo["id"]), copias.get(arquivo["id"]))
+                   for arquivo in arquivos]
+
+    # A falha de um arquivo não interrompe os demais
+    arquivos_download = []
+    for arquivo, futuro in zip(arquivos, futuros):
+        try:
+            resultado = futuro.result()
+        except Exception as e:
+            # Roda na thread do atualizador: o erro vai para o estado dele, que a tela mostra
+            avisar_atualizador(f"Erro ao baixar {arquivo['name']}: {e}")
             continue
+        if resultado is not None:
+            arquivos_download.append(resultado)
 
-        if response.status_code == 200:
-            arquivos_download.append({
-                "id": file_id,
-                "name": file_name,
-                "conteudo": io.StringIO(response.text)
-            })
+    return arquivos_download
+
+def excluir_copias_convertidas(arquivos_download):
+    """Exclui, numa única requisição em lote, as cópias criadas pelo caminho CSV."""
+    # Só as cópias convertidas; o original nunca é excluído
+    copias = [arquivo["id_copia"] for arquivo in arquivos_download if arquivo["id_copia"]]
+    if not copias:
+        return
+    try:
+        excluidos = drive.excluir_arquivos(copias)
+    except requests.exceptions.RequestException as e:
+        # Os dados já foram lidos: a atualização segue e as cópias ficam para excluir à mão
+        avisar_atualizador(f"Erro ao excluir as cópias convertidas {', '.join(copias)}: {e}")
+        return
+    for file_id, excluido in excluidos.items():
+        if not excluido:
+            avisar_atualizador(f"Erro ao excluir a cópia convertida {file_id}")
+
+
+def ler_arquivo_baixado(arquivo, skiprows):
+    """Lê o arquivo baixado (xlsx original ou CSV exportado) em um DataFrame."""
+    if arquivo["formato"] == "xlsx":
+        # O leitor do pandas abre o openpyxl em modo somente leitura (streaming)
+        return pd.read_excel(arquivo["conteudo"], skiprows=skiprows, engine="openpyxl")
+    return ler_csv_exportado(arquivo["conteudo"], sep=',', skiprows=skiprows, dayfirst=True)
+
+
+def _como_texto(valor):
+    if pd.isna(valor) or isinstance(valor, str):
+        return valor
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def padronizar_colunas_texto(df, nomes_colunas):
+    """Deixa as colunas de texto do .xlsx como o CSV exportado (só strings), exceto as de valores."""
+    for posicao, nome in enumerate(nomes_colunas):
+        if nome in COLUNAS_VALORES or posicao >= len(df.columns):
+            continue
+        coluna = df.iloc[:, posicao]
+        if coluna.dtype == object:
+            df.isetitem(posicao, coluna.map(_como_texto))
+    return df
+
+
+def estimar_tempo_csv():
+    """Tempo médio (s) de copiar+exportar+excluir um arquivo, pelas latências já medidas no processo."""
+    latencias = drive.estatisticas_latencia()
+    etapas = ["files.copy", "files.export", "files.delete"]
+    if not all(etapa in latencias for etapa in etapas):
+        return None
+    return sum(latencias[etapa]["media_ms"] for etapa in etapas) / 1000
+
+
+def relatar_tempo_economizado(arquivos_download):
+    tempo_csv = estimar_tempo_csv()
+    for arquivo in arquivos_download:
+        if arquivo["formato"] != "xlsx":
+            print(f"⏱️ {arquivo['name']}: {arquivo['tempo']:.2f}s pelo caminho CSV")
+        elif tempo_csv is None:
+            print(f"⏱️ {arquivo['name']}: {arquivo['tempo']:.2f}s com leitura direta")
         else:
-            print(f"Erro ao baixar {file_name}: {response.text}")
+            print(f"⏱️ {arquivo['name']}: {arquivo['tempo']:.2f}s com leitura direta "
+                  f"(economia estimada de {tempo_csv - arquivo['tempo']:.2f}s sobre o caminho CSV)")
 
-    return arquivos_download
 
-def processar_dados_principais_csv():
-    arquivos = [
+# Planilhas de objetos que alimentam o painel
+ARQUIVOS_PAINEL = [
     {"id": "1E2xiSA0VwiiqS04iHhvmiIP-5RyGJvDf", "name": "Vigilância.xlsx", "mimeType": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
     {"id": "1bpsBDegUletMd07SjE0EpbX1zgjl_6zj", "name": "Locação de Imóvel.xlsx", "mimeType": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
     {"id": "1iGlxRvoF5gjn6r0CUsyRVakmph6cXpD3", "name": "Limpeza e Conservação.xlsx", "mimeType": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
     {"id": "1RPQADGPfy4b6hGtNMg-p6o93y3H6bJVO", "name": "Diversos.xlsx", "mimeType": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
     {"id": "1-yM9S_yPYWmt3ozLkow6QIaJD31O8Huo", "name": "Ar condicionado.xlsx", "mimeType": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
     # Outros arquivos
-    ]
+]
 
-    arquivos_download = baixar_arquivos_google_drive(arquivos)
+# Ano do orçamento acompanhado no painel
+ANO_REFERENCIA = 2025
 
-    df_combinado = pd.DataFrame()
-    df_combinado_1 = pd.DataFrame()
+# Planilha com a evolução mês a mês das notas de empenho
+ARQUIVO_EVOLUCAO = {"id": "1ff7-LmysSbjwGTUC0OiK4jQJP8NkHaY1", "name": "relatorio evolucao mes a mes.xlsx", "mimeType": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
 
-    # Processar cada arquivo baixado
-    for arquivo in arquivos_download:
-        file_id = arquivo["id"]
-        file_name = arquivo["name"]
-        arquivo_csv = arquivo["conteudo"]
-        df = pd.read_csv(arquivo_csv, encoding='ISO-8859-1', sep=',', skiprows=4, dayfirst=True)  # Ignora as 4 primeiras linhas, se necessário
-        
-        # Corrigir e limpar os dados
-        df.columns = df.columns.str.strip().str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8')
-        df = df.applymap(lambda x: x.encode('latin1').decode('utf-8') if isinstance(x, str) else x)
-        
-        # Limitar as colunas
-        colunas_necessarias = df.columns[:31]  # Colunas até a 30ª (índice 29)
-        df = df[colunas_necessarias]
-        df_comple = df.copy()
-        coluna_contrato = df.columns[2]  # Coluna de contrato
-        df = df[df[coluna_contrato].notna()]
-        # Renomeando colunas
-        df.columns = ["Regiao", "Processo", "Contrato", "Objeto", "Nota Empenho", "Valor Empenhado", "Valor Pago", "Valor Global", 
-                      "Valor Anual", "Valor Mensal", "Status", "Ultima Repactuacao", "Ocorrência", "Data de Ocorrência", 
-                      "Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez", "Total Anual", 
-                      "Indice", "Evolucao", "Reajuste", "Reforço/Remanejamento"]
+ETAPAS_INGESTAO = ["download", "leitura", "limpeza", "proporcional", "concatenação", "compactação", "gravação", "cubo"]
 
-        # Convertendo valores financeiros
-        colunas_valores = ["Valor Empenhado", "Valor Pago", "Valor Global", "Valor Anual", "Valor Mensal", "Jan", "Fev", "Mar", 
-                           "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez", "Total Anual", "Reforço/Remanejamento"]
-        for col in colunas_valores:
-            df[col] = df[col].apply(converter_monetario)
-        
-        # Adicionando a coluna de fonte (nome do arquivo)
-        df = preencher_valor_anual_proporcional(df, ano_referencia=2025)
-        df["Fonte"] = file_name
-        
-        # Concatenar dados
-        df_combinado = pd.concat([df_combinado, df], ignore_index=True)
-
-        # Processamento complementar
-        coluna_contrato = df_comple.columns[2]  # Coluna de contrato
-        df_comple["É Complementar"] = df_comple[coluna_contrato].isna()
-        df_comple[coluna_contrato] = df_comple[coluna_contrato].ffill()
-        # Renomeando colunas para facilitar
-        df_comple.columns = ["Regiao", "Processo", "Contrato", "Objeto", "Nota Empenho", "Valor Empenhado", "Valor Pago", "Valor Global", "Valor Anual", "Valor Mensal", "Status", "Ultima Repactuacao","Ocorrência","Data de Ocorrência", "Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez", "Total Anual", "Indice", "Evolucao", "Reajuste", "Reforço/Remanejamento","É Complementar"]
-        
-        # Convertendo valores financeiros
-        colunas_valores = ["Valor Empenhado", "Valor Pago", "Valor Global", "Valor Anual", "Valor Mensal", "Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez", "Total Anual", "Reforço/Remanejamento"]
-        for col in colunas_valores:
-            # Aplicar a função nas colunas de interesse
-            df_comple[col] = df_comple[col].apply(converter_monetario)
-
-        df_comple["Fonte"] = file_name  # Adiciona uma coluna com o nome do arquivo
-        df_combinado_1 = pd.concat([df_combinado_1, df_comple], ignore_index=True)
-        
 
-        # Salvar os resultados
-        df_combinado.to_parquet("dados_combinados.parquet", index=False)
-        df_combinado_1.to_parquet("dados_complementares.parquet", index=False)
+def relatar_tempos_etapas(tempos):
+    print("⏱️ Etapas da atualização do painel: " + " · ".join(
+        f"{etapa} {tempos[etapa]:.2f}s" for etapa in ETAPAS_INGESTAO if etapa in tempos
+    ))
 
-    for arquivo in arquivos_download:
-        file_id = arquivo["id"]
-        excluir_arquivo(file_id)
 
-    return df_combinado, df_combinado_1
+def processar_planilha_painel(arquivo, tempos):
+    """Lê uma planilha de objeto uma única vez e devolve (linhas principais, linhas com complementares)."""
+    inicio = time.perf_counter()
+    df = ler_arquivo_baixado(arquivo, skiprows=4)  # Ignora as 4 primeiras linhas, se necessário
+    tempos["leitura"] += time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    # Corrigir e limpar os dados
+    # (a codificação do CSV já foi resolvida pelos bytes na leitura)
+    df.columns = df.columns.str.strip().str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8')
+
+    # Limitar as colunas
+    df = df.iloc[:, :31].copy()  # Colunas até a 31ª
+    if arquivo["formato"] == "xlsx":
+        df = padronizar_colunas_texto(df, COLUNAS_PRINCIPAIS)
+    # Renomeando colunas
+    df.columns = COLUNAS_PRINCIPAIS
+
+    # Convertendo valores financeiros uma única vez, antes de separar principal e complementar
+    df = converter_colunas_monetarias(df, COLUNAS_VALORES)
+
+    # Principal: só as linhas com contrato; complementar: todas, com o contrato repetido nas complementares
+    df_principal = df[df["Contrato"].notna()].copy()
+    df["É Complementar"] = df["Contrato"].isna()
+    df["Contrato"] = df["Contrato"].ffill()
+    df["Fonte"] = arquivo["name"]  # Adiciona uma coluna com o nome do arquivo
+    tempos["limpeza"] += time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    df_principal = preencher_valor_anual_proporcional(df_principal, ano_referencia=ANO_REFERENCIA)
+    df_principal["Fonte"] = arquivo["name"]
+    tempos["proporcional"] += time.perf_counter() - inicio
+
+    return df_principal, df
+
+
+def processar_dados_principais_csv(arquivos=ARQUIVOS_PAINEL, destino=None, anterior=None):
+    """Baixa e processa as planilhas; com `anterior` (snapshot publicado), as planilhas do painel que não
+    foram processadas agora entram com as linhas de lá.
+
+    Retorna (principal, complementar, nomes das planilhas processadas).
+    """
+    tempos = dict.fromkeys(ETAPAS_INGESTAO, 0.0)
+
+    inicio = time.perf_counter()
+    arquivos_download = baixar_arquivos_google_drive(arquivos)
+    tempos["download"] = time.perf_counter() - inicio
+    relatar_tempo_economizado(arquivos_download)
+
+    # Cada planilha é lida e limpa uma vez; as partes são juntadas e gravadas uma vez só no fim
+    partes_principais = []
+    partes_complementares = []
+    for arquivo in arquivos_download:
+        df_principal, df_complementar = processar_planilha_painel(arquivo, tempos)
+        partes_principais.append(df_principal)
+        partes_complementares.append(df_complementar)
+
+    # Planilhas fora desta leva ou que falharam no download mantêm as linhas da versão publicada
+    fontes_processadas = {arquivo["name"] for arquivo in arquivos_download}
+    mantidas = {arquivo["name"] for arquivo in ARQUIVOS_PAINEL} - fontes_processadas
+    if anterior is not None and partes_principais and mantidas:
+        principal = anterior.ler_principal()
+        complementar = anterior.ler_complementar()
+        partes_principais.insert(0, principal[principal["Fonte"].isin(mantidas)])
+        partes_complementares.insert(0, complementar[complementar["Fonte"].isin(mantidas)])
+
+    inicio = time.perf_counter()
+    # Categorias diferentes viram texto no concat: a compactação logo abaixo refaz os tipos
+    df_combinado = pd.concat(partes_principais, ignore_index=True) if partes_principais else pd.DataFrame()
+    df_combinado_1 = pd.concat(partes_complementares, ignore_index=True) if partes_complementares else pd.DataFrame()
+    tempos["concatenação"] = time.perf_counter() - inicio
+
+    # Tipos enxutos (categorias, centavos, datas) já na ingestão, antes de gravar e de ir para a tela
+    inicio = time.perf_counter()
+    df_principal = compactar_painel(df_combinado, COLUNAS_CENTAVOS)
+    df_complementar = compactar_painel(df_combinado_1, COLUNAS_CENTAVOS)
+    tempos["compactação"] = time.perf_counter() - inicio
+    relatar_memoria("Principal", df_combinado, df_principal)
+    relatar_memoria("Complementar", df_combinado_1, df_complementar)
+    df_combinado, df_combinado_1 = df_principal, df_complementar
+
+    # Salvar os resultados na versão em construção (sem nenhuma planilha baixada, mantém os arquivos anteriores)
+    if destino and partes_principais:
+        inicio = time.perf_counter()
+        gravar_principal(destino, df_combinado, COLUNAS_CENTAVOS)
+        gravar_complementar(destino, df_combinado_1, COLUNAS_CENTAVOS)
+        tempos["gravação"] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        gravar_cubo(destino, montar_cubo(df_combinado), MEDIDAS_CUBO)
+        tempos["cubo"] = time.perf_counter() - inicio
+
+    excluir_copias_convertidas(arquivos_download)
+    relatar_tempos_etapas(tempos)
+
+    return df_combinado, df_combinado_1, fontes_processadas
 
 #baixaar planilha que tem a evolução do empenho
-def visualizar_empenhos_unicos():
-    arquivos = [
-    {"id": "1ff7-LmysSbjwGTUC0OiK4jQJP8NkHaY1", "name": "relatorio evolucao mes a mes.xlsx", "mimeType": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
-    ]# Lê o primeiro arquivo CSV baixado
+def visualizar_empenhos_unicos(destino):
+    arquivos = [ARQUIVO_EVOLUCAO]  # Lê o primeiro arquivo CSV baixado
    
     arquivos_download = baixar_arquivos_google_drive(arquivos)
+    relatar_tempo_economizado(arquivos_download)
+    if not arquivos_download:
+        raise Exception(f"Não foi possível baixar {ARQUIVO_EVOLUCAO['name']}")
 
-    df_raw = pd.read_csv(arquivos_download[0]["conteudo"], sep=",", skiprows=2)  # CSV convertido
+    if arquivos_download[0]["formato"] == "xlsx":
+        df_raw = pd.read_excel(arquivos_download[0]["conteudo"], skiprows=2, engine="openpyxl")
+    else:
+        df_raw = ler_csv_exportado(arquivos_download[0]["conteudo"], sep=",", skiprows=2)  # CSV convertido
     print(df_raw)
-    # Define meses e tipos
-    meses = ["JAN/2025", "FEV/2025", "MAR/2025", "ABR/2025"]
-    tipos = [
-        "DESPESAS EMPENHADAS (CONTROLE EMPENHO)",
-        "DESPESAS EMPENHADAS A LIQUIDAR (CONTROLE EMP)",
-        "DESPESAS LIQUIDADAS (CONTROLE EMPENHO)"
-    ]
-
-    dados = []
-    for _, row in df_raw.iterrows():
-        nota = row.get("Unnamed: 0")
-        favorecido = row.get("Unnamed: 2")  # Nome pode variar conforme a planilha
-
-        for mes in meses:
-            for i, tipo in enumerate(tipos):
-                col_index = 3 + meses.index(mes) * 3 + i
-                if col_index < len(row):
-                    valor = row.iloc[col_index]
-
-                    if isinstance(valor, str):
-                        valor = valor.replace('.', '').replace(',', '.')
-                    try:
-                        valor = float(valor)
-                    except:
-                        valor = 0.0
-
-                    dados.append({
-                        "Nota de Empenho": nota,
-                        "Favorecido": favorecido,
-                        "Mês": mes,
-                        "Tipo de Métrica": tipo,
-                        "Valor (R$)": valor
-                    })
-
-    df = pd.DataFrame(dados)
-   
+    # Meses lidos do cabeçalho do relatório (quantos houver, de qualquer ano)
+    meses = identificar_meses(df_raw.columns, ano_padrao=ANO_REFERENCIA)
+    df = evolucao_para_formato_longo(df_raw, meses)
+    df_compacto = compactar_painel(df, ["Valor (R$)"], COLUNAS_DIMENSAO_EVOLUCAO, colunas_data=[])
+    relatar_memoria("Evolução", df, df_compacto)
+    df = df_compacto
     
-    df.to_parquet("dados_empenhos_evolucao.parquet", index=False)
+    gravar_evolucao(destino, df, ["Valor (R$)"])
     
-    for arquivo in arquivos_download:
-            file_id = arquivo["id"]
-            excluir_arquivo(file_id)
+    excluir_copias_convertidas(arquivos_download)
         
     return df
 
@@ -413,27 +491,135 @@ def carregar_hora_atualizacao():
         pass
     return None
 
-def carregar_dados_salvos():
+def carregar_dados_salvos(avisar=st.warning):
+    """Versão publicada do snapshot, compartilhada pelo processo; os dados são lidos do disco conforme os filtros.
+
+    Na thread do atualizador não há sessão para o st.warning: quem chama de lá passa avisar_atualizador.
+    """
     try:
-        if os.path.exists("dados_combinados.parquet") and os.path.exists("dados_complementares.parquet") and os.path.exists("dados_empenhos_evolucao.parquet"):
-            df_principal = pd.read_parquet("dados_combinados.parquet")
-            df_complementar = pd.read_parquet("dados_complementares.parquet")
-            df_evolucao_empenho = pd.read_parquet("dados_empenhos_evolucao.parquet")
-            return {
-                "principal": df_principal,
-                "complementar": df_complementar,
-                "evolucao": df_evolucao_empenho
-            }
+        migrar_snapshot_antigo()
+        return obter_snapshot()
     except Exception as e:
-        st.warning(f"Erro ao carregar dados salvos: {e}")
+        avisar(f"Erro ao carregar dados salvos: {e}")
+    return None
+
+
+ARQUIVO_SINCRONIZACAO = "sincronizacao_painel.json"
+
+def carregar_token_sincronizacao():
+    try:
+        if os.path.exists(ARQUIVO_SINCRONIZACAO):
+            with open(ARQUIVO_SINCRONIZACAO, "r") as f:
+                return json.load(f).get("page_token")
+    except:
+        pass
     return None
 
 
-# Verificar se os dados já estão salvos no session_state
-if "dados" not in st.session_state:
-    st.session_state.dados = carregar_dados_salvos()
-if "ultima_atualizacao" not in st.session_state:
-    st.session_state.ultima_atualizacao = carregar_hora_atualizacao()
+def salvar_token_sincronizacao(page_token):
+    with open(ARQUIVO_SINCRONIZACAO, "w") as f:
+        json.dump({"page_token": page_token, "sincronizado_em": time.strftime('%Y-%m-%d %H:%M:%S')}, f)
+
+
+def descartar_token_sincronizacao():
+    """Sem token, a próxima sincronização reprocessa tudo."""
+    try:
+        os.remove(ARQUIVO_SINCRONIZACAO)
+    except FileNotFoundError:
+        pass
+
+
+def atualizar_tudo():
+    # O token é pego antes de baixar, para que mudanças feitas durante o processamento não se percam
+    page_token = drive.obter_token_inicial_mudancas()
+    anterior = carregar_dados_salvos(avisar_atualizador)
+    destino = iniciar_versao()
+    try:
+        _, _, fontes_processadas = processar_dados_principais_csv(destino=destino, anterior=anterior)
+        visualizar_empenhos_unicos(destino)
+    except Exception:
+        descartar_versao(destino)
+        raise
+    snapshot = publicar_versao(destino)
+
+    faltantes = [arquivo["name"] for arquivo in ARQUIVOS_PAINEL if arquivo["name"] not in fontes_processadas]
+    if not faltantes:
+        salvar_token_sincronizacao(page_token)
+    elif anterior is not None:
+        # O token anterior continua valendo para as linhas mantidas: a próxima sincronização
+        # pega de novo tudo o que mudou desde ele, inclusive as planilhas que falharam agora
+        avisar_atualizador(f"Mantidos os dados anteriores de {', '.join(faltantes)}")
+    else:
+        descartar_token_sincronizacao()
+        avisar_atualizador(f"Painel publicado sem {', '.join(faltantes)}; a próxima atualização reprocessa tudo")
+    return snapshot
+
+
+def sincronizar_painel():
+    """Reprocessa só as planilhas alteradas desde a última sincronização (feed de mudanças do Drive).
+
+    Retorna (snapshot, nomes das planilhas reprocessadas). Sem mudanças, custa uma única chamada à API.
+    """
+    page_token = carregar_token_sincronizacao()
+    snapshot = carregar_dados_salvos(avisar_atualizador)
+    if page_token is None or snapshot is None:
+        return atualizar_tudo(), [arquivo["name"] for arquivo in ARQUIVOS_PAINEL + [ARQUIVO_EVOLUCAO]]
+
+    mudancas, novo_token = drive.listar_mudancas(page_token)
+    ids_alterados = {mudanca["fileId"] for mudanca in mudancas}
+    fontes_alteradas = [arquivo for arquivo in ARQUIVOS_PAINEL if arquivo["id"] in ids_alterados]
+    evolucao_alterada = ARQUIVO_EVOLUCAO["id"] in ids_alterados
+    fontes_processadas = set()
+    completo = True
+
+    if fontes_alteradas or evolucao_alterada:
+        # A versão nova nasce com os arquivos da publicada; só os alterados são regravados
+        destino = iniciar_versao()
+        try:
+            if fontes_alteradas:
+                # As planilhas que não mudaram (e as que falharam no download) mantêm as linhas publicadas
+                _, _, fontes_processadas = processar_dados_principais_csv(fontes_alteradas, destino, snapshot)
+                # Fonte que falhou será tentada de novo: o token só avança com todas processadas
+                completo = fontes_processadas == {arquivo["name"] for arquivo in fontes_alteradas}
+
+            if evolucao_alterada:
+                visualizar_empenhos_unicos(destino)
+        except Exception:
+            descartar_versao(destino)
+            raise
+        snapshot = publicar_versao(destino)
+
+    if completo:
+        salvar_token_sincronizacao(novo_token)
+
+    # Só as planilhas que de fato entraram na versão nova (as que falharam ficam para a próxima)
+    reprocessadas = [arquivo["name"] for arquivo in fontes_alteradas if arquivo["name"] in fontes_processadas]
+    if evolucao_alterada:
+        reprocessadas.append(ARQUIVO_EVOLUCAO["name"])
+    return snapshot, reprocessadas
+
+
+def atualizar_em_segundo_plano(completo):
+    """Tarefa do atualizador: reprocessa e publica um snapshot novo. Na execução agendada (completo=None)
+    segue a configuração de sincronização incremental."""
+    if completo is None:
+        completo = not SINCRONIZACAO_INCREMENTAL
+    if completo:
+        atualizar_tudo()
+        reprocessadas = None
+    else:
+        _, reprocessadas = sincronizar_painel()
+    salvar_hora_atualizacao()
+    return reprocessadas
+
+
+# A sessão guarda só a referência ao snapshot publicado (o mesmo objeto para todas); a cada rerun
+# pega a versão mais recente, e a anterior é liberada quando nenhuma sessão a usa mais
+st.session_state.snapshot = carregar_dados_salvos()
+# A atualização roda numa thread do processo; sem snapshot ainda, a primeira começa já
+atualizador = obter_atualizador(atualizar_em_segundo_plano, ATUALIZACAO_AUTOMATICA_MINUTOS,
+                                imediata=st.session_state.snapshot is None)
+st.session_state.ultima_atualizacao = carregar_hora_atualizacao()
     
 
 # Função para processar e salvar os dados no session_state
@@ -524,50 +710,80 @@ st.markdown('<div class="title">📊 Painel de Gestão Orçamentária</div>', un
 
 # Botão para atualizar os dados (colocado na sidebar)
 with st.sidebar:
+    reprocessar_tudo = st.checkbox("Reprocessar todas as planilhas", value=not SINCRONIZACAO_INCREMENTAL)
     if st.button("Atualizar Dados"):
-        with st.spinner("Atualizando dados..."):
-            df_principal, df_complementar = processar_dados_principais_csv()
-            df_evolucao_empenho = visualizar_empenhos_unicos()
-            
-            # Armazena os dois DataFrames separadamente no session_state
-            st.session_state.dados = {
-                "principal": df_principal,
-                "complementar": df_complementar,
-                "evolucao": df_evolucao_empenho
-            }
-            st.session_state.ultima_atualizacao = time.strftime('%Y-%m-%d %H:%M:%S')
-            salvar_hora_atualizacao()
-            st.success("✅ Dados atualizados!")  # Atualiza os dados quando o botão for pressionado
-
-# Verificar se os dados estão carregados no session_state
-if st.session_state.dados is not None:
-    df_local = st.session_state.dados["principal"]
-    df_complementares = st.session_state.dados["complementar"]
-    df_evolucao_empenho = st.session_state.dados["evolucao"]
+        # Só pede: a atualização roda em segundo plano e a tela segue respondendo
+        if not atualizador.solicitar(completo=reprocessar_tudo):
+            st.info("Já há uma atualização em andamento.")
+
+    @st.fragment(run_every=SEGUNDOS_ACOMPANHAMENTO)
+    def acompanhar_atualizacao():
+        estado = atualizador.estado()
+        if estado["atualizando"]:
+            inicio = formatar_data_br(datetime.fromtimestamp(estado["inicio"]))
+            st.info(f"🔄 Atualizando dados em segundo plano… (desde {inicio})")
+        elif estado["ultimo_erro"]:
+            st.warning(f"⚠️ A última atualização falhou: {estado['ultimo_erro']}")
+        elif estado["ultimo_fim"]:
+            if estado["reprocessadas"] == []:
+                st.caption("Nenhuma planilha mudou na última atualização.")
+            elif estado["reprocessadas"]:
+                st.caption("Reprocessadas: " + ", ".join(estado["reprocessadas"]))
+        if not estado["atualizando"]:
+            for aviso in estado["avisos"]:
+                st.warning(f"⚠️ {aviso}")
+        if estado["proxima"] and not estado["atualizando"]:
+            st.caption(f"Próxima atualização automática: {formatar_data_br(datetime.fromtimestamp(estado['proxima']))}")
+
+        # Versão nova publicada: roda a página inteira de novo para passar a usá-la
+        publicada = obter_snapshot()
+        if publicada is not None and publicada is not st.session_state.snapshot:
+            st.rerun()
+
+    acompanhar_atualizacao()
+
+# Verificar se há um snapshot publicado
+snapshot = st.session_state.snapshot
+if snapshot is not None:
+    df_evolucao_empenho = snapshot.evolucao()
+    indice_notas = snapshot.indice_notas()
     
     # Exibir a hora da última atualização com formatação brasileira
     if st.session_state.ultima_atualizacao:
         ultima_atualizacao_formatada = formatar_data_br(st.session_state.ultima_atualizacao)
         st.markdown(f'<div class="stInfo">Última atualização: {ultima_atualizacao_formatada}</div>', unsafe_allow_html=True)
     
-    df_local["Regiao"] = df_local["Regiao"].str.strip().str.upper()
-    # Sidebar para filtros
+    # Sidebar para filtros (as opções vêm das partições do snapshot, sem ler os dados)
     st.sidebar.header("Filtros")
-    regioes = st.sidebar.multiselect("Selecione a Região", df_local["Regiao"].unique())
-    objeto = st.sidebar.multiselect("Selecione o Objeto", df_local["Fonte"].unique())
-    
+    regioes_disponiveis, objetos_disponiveis = snapshot.listar_particoes()
+    regioes = st.sidebar.multiselect("Selecione a Região", regioes_disponiveis)
+    objeto = st.sidebar.multiselect("Selecione o Objeto", objetos_disponiveis)
 
-    # Aplicar filtros
-    if regioes:
-        df_local = df_local[df_local["Regiao"].isin(regioes)]
-    if objeto:
-        df_local = df_local[df_local["Fonte"].isin(objeto)]
+    # Visões e figuras memorizadas por (versão do snapshot, regiões, objetos, contrato, tipo de gráfico)
+    versao = snapshot.nome
+    filtros = (tuple(sorted(regioes)), tuple(sorted(objeto)))
+
+    def em_cache(nome, calcular, *partes):
+        return cache_visoes.obter(versao, (nome,) + filtros + partes, calcular)
+
+    # Agregações em SQL (DuckDB) direto sobre os arquivos da versão; os filtros vão para a leitura
+    consultas = obter_consultas(snapshot)
+    contratos = em_cache("contratos", lambda: consultas.contratos(regioes, objeto))
     # Selecione o Contrato com uma opção inicial "Selecione um contrato"
-    contrato = st.sidebar.selectbox("Selecione um Contrato", options=["Selecione um contrato"] + list(df_local["Contrato"].unique()))
+    contrato = st.sidebar.selectbox("Selecione um Contrato", options=["Selecione um contrato"] + list(contratos))
 
-    # Filtrar os dados apenas se um contrato for selecionado
+    def ler_linhas_contrato():
+        df = snapshot.ler_principal(regioes, objeto, contrato=contrato)
+        df["Regiao"] = df["Regiao"].str.strip().str.upper()
+        # Cálculo da diferença entre o valor anual e o valor empenhado
+        df['Diferença'] = df['Valor Empenhado'] - df['Valor Anual Proporcional']
+        return df
+
+    # Linhas só do contrato selecionado; a visão geral e os gráficos mensais saem das consultas ao cubo
+    # (as tabelas guardadas são compartilhadas: daqui em diante só se filtra ou copia, sem alterar)
     if contrato != "Selecione um contrato":
-        df_local = df_local[df_local["Contrato"] == contrato]
+        df_local = em_cache("linhas", ler_linhas_contrato, contrato)
+        serie_mensal = em_cache("serie_mensal", lambda: consultas.pagamentos_mensais(regioes, objeto, contrato), contrato)
 
    
 
@@ -579,9 +795,6 @@ if st.session_state.dados is not None:
             col2.metric("💰 Valor Empenhado", formatar_real(df_local['Valor Empenhado'].sum()))
             col3.metric("💵 Valor Pago", formatar_real(df_local['Valor Pago'].sum()))
             with col4:
-                # Cálculo da diferença entre o valor anual e o valor empenhado
-                df_local['Diferença'] = df_local['Valor Empenhado'] - df_local['Valor Anual Proporcional']
-
                 # Calcular o total de valores a serem anulados ou reforçados
                 valor_anular = df_local[df_local['Diferença'] > 0]['Diferença'].sum()
                 valor_reforcar = df_local[df_local['Diferença'] < 0]['Diferença'].sum()
@@ -597,11 +810,9 @@ if st.session_state.dados is not None:
                             delta_color="normal")  # 'normal' para algo positivo (pode anular)
                     
 
-            df_contrato = df_local[df_local['Contrato'] == contrato]
-            
-    
+            # df_local já vem só com as linhas do contrato (lidas pelo índice de contratos)
             # Calcular a execução e os percentuais para o contrato selecionado
-            df_contrato = calcular_execucao(df_contrato)
+            df_contrato = calcular_execucao(df_local.copy())
             
 
             col1, col2 = st.columns([1, 1])
@@ -610,8 +821,8 @@ if st.session_state.dados is not None:
                 st.subheader(f"📄 Detalhes do Contrato: {contrato}")
                 
                 # Exibir informações do contrato
-                contrato_info = df_local[df_local["Contrato"] == contrato].iloc[0]
-                contrato_info_perc = df_contrato[df_contrato["Contrato"] == contrato].iloc[0]
+                contrato_info = df_local.iloc[0]
+                contrato_info_perc = df_contrato.iloc[0]
 
                 st.markdown(
                     f"""
@@ -629,7 +840,8 @@ if st.session_state.dados is not None:
                     unsafe_allow_html=True
                 )
 
-                dados_complementares = df_complementares[(df_complementares["É Complementar"] == True) & (df_complementares["Contrato"] == contrato)]
+                df_complementares = em_cache("complementar", lambda: snapshot.ler_complementar(contrato), contrato)
+                dados_complementares = df_complementares[df_complementares["É Complementar"] == True]
                 notas_acumulado=[]
                 if not dados_complementares.empty:
                     with st.expander("🔍 Unidades Vinculadas / Dados Complementares"):
@@ -664,157 +876,150 @@ if st.session_state.dados is not None:
             with col2:
                 st.subheader("📊 Comparativo Anual, Empenhado e Pago")
 
-                fig_valores = px.bar(
-                    x=["Valor Anual", "Valor Empenhado", "Valor Pago"],
-                    y=[contrato_info["Valor Anual"], contrato_info["Valor Empenhado"], contrato_info["Valor Pago"]],
-                    labels={"x": "Tipo de Valor", "y": "Valor (R$)"},
-                    color=["Valor Anual", "Valor Empenhado", "Valor Pago"],
-                    color_discrete_map={
-                        "Valor Anual": "#2ca02c",
-                        "Valor Empenhado": "#1f77b4",
-                        "Valor Pago": "#ff7f0e"
-                    },
-                    text=[formatar_real(contrato_info["Valor Anual"]),
-                        formatar_real(contrato_info["Valor Empenhado"]),
-                        formatar_real(contrato_info["Valor Pago"])]
-                )
+                def montar_figura_valores():
+                    fig_valores = px.bar(
+                        x=["Valor Anual", "Valor Empenhado", "Valor Pago"],
+                        y=[contrato_info["Valor Anual"], contrato_info["Valor Empenhado"], contrato_info["Valor Pago"]],
+                        labels={"x": "Tipo de Valor", "y": "Valor (R$)"},
+                        color=["Valor Anual", "Valor Empenhado", "Valor Pago"],
+                        color_discrete_map={
+                            "Valor Anual": "#2ca02c",
+                            "Valor Empenhado": "#1f77b4",
+                            "Valor Pago": "#ff7f0e"
+                        },
+                        text=[formatar_real(contrato_info["Valor Anual"]),
+                            formatar_real(contrato_info["Valor Empenhado"]),
+                            formatar_real(contrato_info["Valor Pago"])]
+                    )
 
-                fig_valores.update_layout(
-                    height=400,
-                    xaxis_title="Tipo de Valor",
-                    yaxis_title="Valor (R$)",
-                    showlegend=False,
-                    bargap=0.25,
-                    plot_bgcolor="#ffffff",
-                    paper_bgcolor="#ffffff"
-                )
+                    fig_valores.update_layout(
+                        height=400,
+                        xaxis_title="Tipo de Valor",
+                        yaxis_title="Valor (R$)",
+                        showlegend=False,
+                        bargap=0.25,
+                        plot_bgcolor="#ffffff",
+                        paper_bgcolor="#ffffff"
+                    )
+                    return fig_valores
+
+                fig_valores = em_cache("figura_valores", montar_figura_valores, contrato)
                 st.plotly_chart(fig_valores, use_container_width=True)
 
             # Gráfico mês a mês
-            meses = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
-            df_melt = df_local.melt(id_vars=["Contrato", "Regiao"], value_vars=meses, var_name="Mês", value_name="Valor Pago Mensal")
-            df_pagamento = df_melt.groupby(["Contrato", "Mês"], as_index=False)["Valor Pago Mensal"].sum()
-            df_pagamento["Mês"] = pd.Categorical(df_pagamento["Mês"], categories=meses, ordered=True)
-            df_pagamento = df_pagamento.sort_values("Mês")
-
             st.subheader("📆 Pagamentos Mensais por Contrato")
-            fig_pagamento = px.bar(
-                df_pagamento,
-                x="Mês",
-                y="Valor Pago Mensal",
-                color="Contrato",
-                labels={"Mês": "Mês", "Valor Pago Mensal": "Valor Pago (R$)"},
-                barmode="group",
-                
-            )
-            # Adicionar valores formatados nas barras
-            for trace in fig_pagamento.data:
-                trace.text = [formatar_real(val) for val in trace.y]
-                trace.textposition = "outside"
-
-            fig_pagamento.update_layout(
-                height=500,
-                xaxis_title="Mês",
-                yaxis_title="Valor Pago (R$)",
-                plot_bgcolor="#ffffff",
-                paper_bgcolor="#ffffff"
-            )
 
-            st.plotly_chart(fig_pagamento, use_container_width=True)
+            def montar_figura_pagamentos():
+                meses = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+                df_pagamento = serie_mensal[["Mês", "Valor Pago Mensal"]].assign(Contrato=contrato)
+                df_pagamento["Mês"] = pd.Categorical(df_pagamento["Mês"], categories=meses, ordered=True)
+
+                fig_pagamento = px.bar(
+                    df_pagamento,
+                    x="Mês",
+                    y="Valor Pago Mensal",
+                    color="Contrato",
+                    labels={"Mês": "Mês", "Valor Pago Mensal": "Valor Pago (R$)"},
+                    barmode="group",
+                
+                )
+                # Adicionar valores formatados nas barras
+                for trace in fig_pagamento.data:
+                    trace.text = [formatar_real(val) for val in trace.y]
+                    trace.textposition = "outside"
 
-            ### GRÁFICO DE EVOLUÇÃO MÊS A MÊS COM O VALOR ANUAL 
-            valor_mensal_total = df_local["Valor Mensal"].sum()
+                fig_pagamento.update_layout(
+                    height=500,
+                    xaxis_title="Mês",
+                    yaxis_title="Valor Pago (R$)",
+                    plot_bgcolor="#ffffff",
+                    paper_bgcolor="#ffffff"
+                )
+                return fig_pagamento
 
-            # Acumulado mês a mês do valor anual
-            valor_anual_acumulado = [valor_mensal_total * (i + 1) for i in range(12)]
+            fig_pagamento = em_cache("figura_pagamentos", montar_figura_pagamentos, contrato)
 
-            # Agrupar total pago por mês (já está feito, só precisamos acumular)
-            valores_pagos_mensais = df_pagamento.groupby("Mês")["Valor Pago Mensal"].sum().reindex(meses, fill_value=0)
-            valores_pagos_acumulados = valores_pagos_mensais.cumsum().tolist()
+            st.plotly_chart(fig_pagamento, use_container_width=True)
 
+            ### GRÁFICO DE EVOLUÇÃO MÊS A MÊS COM O VALOR ANUAL 
             st.subheader("📈 Evolução Mês a Mês - Valor Anual vs. Valor Pago")
 
             # Opção para escolher o tipo de gráfico
             tipo_grafico = st.radio("Tipo de Gráfico", ["📊 Barras", "📈 Linha"], horizontal=True)
 
-            # Calcular a evolução do valor anual proporcional acumulado por mês
-            df_evolucao = df_local.copy()
-            meses = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
-            df_evolucao_melt = df_evolucao.melt(id_vars=["Contrato"], value_vars=meses, var_name="Mês", value_name="Valor Pago Mensal")
-            df_pagamento = df_evolucao_melt.groupby("Mês", as_index=False)["Valor Pago Mensal"].sum()
-            df_pagamento["Mês"] = pd.Categorical(df_pagamento["Mês"], categories=meses, ordered=True)
-            df_pagamento = df_pagamento.sort_values("Mês")
-            df_pagamento["Valor Pago Acumulado"] = df_pagamento["Valor Pago Mensal"].cumsum()
-
-            # Valor anual acumulado mês a mês
-            valor_mensal_total = df_evolucao["Valor Mensal"].sum()
-            df_pagamento["Valor Anual Acumulado"] = [(i + 1) * valor_mensal_total for i in range(len(df_pagamento))]
-
-            # Criar gráfico dinâmico com base na seleção
-            if tipo_grafico == "📊 Barras":
-                fig = go.Figure()
-                # Primeiro o Valor Anual Acumulado (fica à esquerda nas barras agrupadas)
-                fig.add_trace(go.Bar(
-                    x=df_pagamento["Mês"],
-                    y=df_pagamento["Valor Anual Acumulado"],
-                    name="Valor Anual Acumulado",
-                    marker_color="#2ca02c",
-                    text=[formatar_real(v) for v in df_pagamento["Valor Anual Acumulado"]],
-                    textposition="outside"
-                ))
+            def montar_figura_evolucao():
+                # Pago acumulado e valor anual acumulado (valor mensal × meses) já vêm da consulta
+                meses = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+                df_pagamento = serie_mensal.copy()
+                df_pagamento["Mês"] = pd.Categorical(df_pagamento["Mês"], categories=meses, ordered=True)
+
+                # Criar gráfico dinâmico com base na seleção
+                if tipo_grafico == "📊 Barras":
+                    fig = go.Figure()
+                    # Primeiro o Valor Anual Acumulado (fica à esquerda nas barras agrupadas)
+                    fig.add_trace(go.Bar(
+                        x=df_pagamento["Mês"],
+                        y=df_pagamento["Valor Anual Acumulado"],
+                        name="Valor Anual Acumulado",
+                        marker_color="#2ca02c",
+                        text=[formatar_real(v) for v in df_pagamento["Valor Anual Acumulado"]],
+                        textposition="outside"
+                    ))
                 
-                # Depois o Valor Pago (fica à direita)
-                fig.add_trace(go.Bar(
-                    x=df_pagamento["Mês"],
-                    y=df_pagamento["Valor Pago Acumulado"],
-                    name="Valor Pago",
-                    marker_color="#1f77b4",
-                    text=[formatar_real(v) for v in df_pagamento["Valor Pago Acumulado"]],
-                    textposition="outside"
-                ))
+                    # Depois o Valor Pago (fica à direita)
+                    fig.add_trace(go.Bar(
+                        x=df_pagamento["Mês"],
+                        y=df_pagamento["Valor Pago Acumulado"],
+                        name="Valor Pago",
+                        marker_color="#1f77b4",
+                        text=[formatar_real(v) for v in df_pagamento["Valor Pago Acumulado"]],
+                        textposition="outside"
+                    ))
                 
-                fig.update_layout(barmode="group")
-            else:
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(
-                    x=df_pagamento["Mês"],
-                    y=df_pagamento["Valor Pago Acumulado"],
-                    mode='lines+markers',
-                    name="Valor Pago Acumulado",
-                    line=dict(color="#1f77b4", width=3),
-                    fill='tozeroy',  # preenche do valor até o eixo X
-                    fillcolor="rgba(31, 119, 180, 0.2)",
-                    hovertemplate='<b>Valor Pago</b><br>Mês: %{x}<br>R$ %{y:,.2f}<extra></extra>'
-                ))
-
-                fig.add_trace(go.Scatter(
-                    x=df_pagamento["Mês"],
-                    y=df_pagamento["Valor Anual Acumulado"],
-                    mode='lines+markers',
-                    name="Valor Anual Acumulado",
-                    line=dict(color="#2ca02c", width=3, dash='dash'),
-                    fill='tonexty',  # empilha a área acima da anterior
-                    fillcolor="rgba(44, 160, 44, 0.2)",
-                    hovertemplate='<b>Valor Anual</b><br>Mês: %{x}<br>R$ %{y:,.2f}<extra></extra>'
-                ))
-                fig.update_traces(hovertemplate='%{customdata}')
-                for trace in fig.data:
-                    trace.customdata = [[
-                        f"R$ {v:,.2f}".replace(",", "v").replace(".", ",").replace("v", ".")
-                    ] for v in trace.y]
-                fig.update_layout(hovermode="x unified")
-            # Layout padrão
-            fig.update_layout(
-                title="Evolução Mensal de Valores",
-                xaxis_title="Mês",
-                yaxis_title="Valor (R$)",
-                height=500,
-                plot_bgcolor="#ffffff",
-                paper_bgcolor="#ffffff",
+                    fig.update_layout(barmode="group")
+                else:
+                    fig = go.Figure()
+                    fig.add_trace(go.Scatter(
+                        x=df_pagamento["Mês"],
+                        y=df_pagamento["Valor Pago Acumulado"],
+                        mode='lines+markers',
+                        name="Valor Pago Acumulado",
+                        line=dict(color="#1f77b4", width=3),
+                        fill='tozeroy',  # preenche do valor até o eixo X
+                        fillcolor="rgba(31, 119, 180, 0.2)",
+                        hovertemplate='<b>Valor Pago</b><br>Mês: %{x}<br>R$ %{y:,.2f}<extra></extra>'
+                    ))
+
+                    fig.add_trace(go.Scatter(
+                        x=df_pagamento["Mês"],
+                        y=df_pagamento["Valor Anual Acumulado"],
+                        mode='lines+markers',
+                        name="Valor Anual Acumulado",
+                        line=dict(color="#2ca02c", width=3, dash='dash'),
+                        fill='tonexty',  # empilha a área acima da anterior
+                        fillcolor="rgba(44, 160, 44, 0.2)",
+                        hovertemplate='<b>Valor Anual</b><br>Mês: %{x}<br>R$ %{y:,.2f}<extra></extra>'
+                    ))
+                    fig.update_traces(hovertemplate='%{customdata}')
+                    for trace in fig.data:
+                        trace.customdata = [[
+                            f"R$ {v:,.2f}".replace(",", "v").replace(".", ",").replace("v", ".")
+                        ] for v in trace.y]
+                    fig.update_layout(hovermode="x unified")
+                # Layout padrão
+                fig.update_layout(
+                    title="Evolução Mensal de Valores",
+                    xaxis_title="Mês",
+                    yaxis_title="Valor (R$)",
+                    height=500,
+                    plot_bgcolor="#ffffff",
+                    paper_bgcolor="#ffffff",
                 
-                legend=dict(orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5)
-            )
+                    legend=dict(orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5)
+                )
+                return fig
 
+            fig = em_cache("figura_evolucao", montar_figura_evolucao, contrato, tipo_grafico)
             st.plotly_chart(fig, use_container_width=True)
 
 
@@ -825,19 +1030,21 @@ if st.session_state.dados is not None:
 
             # Caso haja mais de uma nota, gere os gráficos para cada uma
             for nota_item in nota_filtrada:
-                # Filtra novamente para cada nota individualmente
+                # Linhas de cada nota pelo índice, sem varrer a evolução inteira
                 
-                df_filtrado = df_evolucao_empenho[
-                    df_evolucao_empenho["Nota de Empenho"].astype(str).str.contains(str(nota_item), na=False)
-                ]
+                def resumir_nota():
+                    df_filtrado = linhas_da_nota(df_evolucao_empenho, indice_notas, nota_item)
+
+                    df_resumo = df_filtrado.groupby(["Mês", "Tipo de Métrica"], observed=True)["Valor (R$)"].sum().reset_index()
+                    df_pivot = df_resumo.pivot(index="Mês", columns="Tipo de Métrica", values="Valor (R$)").fillna(0)
 
-                df_resumo = df_filtrado.groupby(["Mês", "Tipo de Métrica"])["Valor (R$)"].sum().reset_index()
-                df_pivot = df_resumo.pivot(index="Mês", columns="Tipo de Métrica", values="Valor (R$)").fillna(0)
+                    # Garante a ordem correta dos meses
+                    ordem_meses = sorted(df_pivot.index, key=chave_mes)
+                    df_pivot.index = pd.Categorical(df_pivot.index, categories=ordem_meses, ordered=True)
+                    df_pivot = df_pivot.sort_index()
+                    return df_pivot
 
-                # Garante a ordem correta dos meses
-                ordem_meses = ["JAN/2025", "FEV/2025", "MAR/2025", "ABR/2025"]
-                df_pivot.index = pd.Categorical(df_pivot.index, categories=ordem_meses, ordered=True)
-                df_pivot = df_pivot.sort_index()
+                df_pivot = em_cache("evolucao_nota", resumir_nota, nota_item)
 
                 legenda_dict = {
                     "DESPESAS EMPENHADAS (CONTROLE EMPENHO)": 'Empenhado',
@@ -848,86 +1055,90 @@ if st.session_state.dados is not None:
 
                 # Opção para escolher o tipo de gráfico
                 tipo_grafico_empenho = st.radio("Tipo de Gráfico", ["📊 Barras", "📈 Linha"], horizontal=True, key=f"grafico_empenho_{nota_item}")
-                if tipo_grafico_empenho == "📊 Barras":
-                    # Plota o gráfico de barras com a ordem correta
-                    fig = go.Figure()
-                    cores = {
+                def montar_figura_nota():
+                    if tipo_grafico_empenho == "📊 Barras":
+                        # Plota o gráfico de barras com a ordem correta
+                        fig = go.Figure()
+                        cores = {
                             
-                            "DESPESAS LIQUIDADAS (CONTROLE EMPENHO)": "green",  # Cor verde para "Liquidado"
-                        }
-                    # Adiciona cada coluna de df_pivot como um conjunto de barras
-                    for col in df_pivot.columns:
-                        cor = cores.get(col)
-                        fig.add_trace(go.Bar(
-                            x=df_pivot.index,  # Meses como eixo X
-                            y=df_pivot[col],  # Valores da métrica como eixo Y
-                            name=legenda_dict.get(col, col),
-                            text=[f"R$ {v:,.2f}" for v in df_pivot[col]],  # Formatação dos valores
-                            textposition="outside",
-                            marker_color=cor
-                        ))
-
-                        # Adicionar valores formatados nas barras
-                    for trace in fig.data:
-                        trace.text = [formatar_real(val) for val in trace.y]
-                        trace.textposition = "outside"
-
-                    # Atualiza o layout do gráfico de barras
-                    fig.update_layout(
-                        title=f"Evolução mês a mês — Nota de Empenho: {nota_item}",
-                        xaxis_title="Mês",
-                        yaxis_title="Valor (R$)",
-                        barmode="group",  # Agrupar as barras
-                        xaxis=dict(tickmode="array", tickvals=df_pivot.index),
-                        xaxis_tickangle=-45,  # Angulo das labels do eixo X
-                        height=500,
-                        plot_bgcolor="#ffffff",
-                        paper_bgcolor="#ffffff",
-                        legend_title="Tipo de Métrica",
-                    )
-
+                                "DESPESAS LIQUIDADAS (CONTROLE EMPENHO)": "green",  # Cor verde para "Liquidado"
+                            }
+                        # Adiciona cada coluna de df_pivot como um conjunto de barras
+                        for col in df_pivot.columns:
+                            cor = cores.get(col)
+                            fig.add_trace(go.Bar(
+                                x=df_pivot.index,  # Meses como eixo X
+                                y=df_pivot[col],  # Valores da métrica como eixo Y
+                                name=legenda_dict.get(col, col),
+                                text=[f"R$ {v:,.2f}" for v in df_pivot[col]],  # Formatação dos valores
+                                textposition="outside",
+                                marker_color=cor
+                            ))
+
+                            # Adicionar valores formatados nas barras
+                        for trace in fig.data:
+                            trace.text = [formatar_real(val) for val in trace.y]
+                            trace.textposition = "outside"
+
+                        # Atualiza o layout do gráfico de barras
+                        fig.update_layout(
+                            title=f"Evolução mês a mês — Nota de Empenho: {nota_item}",
+                            xaxis_title="Mês",
+                            yaxis_title="Valor (R$)",
+                            barmode="group",  # Agrupar as barras
+                            xaxis=dict(tickmode="array", tickvals=df_pivot.index),
+                            xaxis_tickangle=-45,  # Angulo das labels do eixo X
+                            height=500,
+                            plot_bgcolor="#ffffff",
+                            paper_bgcolor="#ffffff",
+                            legend_title="Tipo de Métrica",
+                        )
+                    else:
+                        # Plota o gráfico de linha com a ordem correta
+                        fig = go.Figure()
+                        cores = {
+                                "DESPESAS LIQUIDADAS (CONTROLE EMPENHO)": "green",  # Cor verde para "Liquidado"
+                            }
+                        # Adiciona cada coluna de df_pivot como uma linha
+                        for col in df_pivot.columns:
+                            cor = cores.get(col)
+                            fig.add_trace(go.Scatter(
+                                x=df_pivot.index,  # Meses como eixo X
+                                y=df_pivot[col],  # Valores da métrica como eixo Y
+                                mode='lines+markers',  # Linha com marcadores
+                                name=legenda_dict.get(col, col),
+                                line=dict(width=3, color=cor),
+                                marker=dict(size=6),
+                                text=[f"R$ {v:,.2f}" for v in df_pivot[col]],  # Formatação dos valores
+                                hovertemplate='<b>' + legenda_dict.get(col, col) + '</b><br>Mês: %{x}<br>R$ %{y:,.2f}<extra></extra>'  # Corrigido aqui
+                            ))
+                        fig.update_traces(hovertemplate='%{customdata}')
+                        for trace in fig.data:
+                            trace.customdata = [[
+                                f"R$ {v:,.2f}".replace(",", "v").replace(".", ",").replace("v", ".")
+                            ] for v in trace.y]
+                        fig.update_layout(hovermode="x unified")
+
+                        # Atualiza o layout do gráfico de linha
+                        fig.update_layout(
+                            title=f"Evolução mês a mês — Nota de Empenho: {nota_item}",
+                            xaxis_title="Mês",
+                            yaxis_title="Valor (R$)",
+                            height=500,
+                            plot_bgcolor="#ffffff",
+                            paper_bgcolor="#ffffff",
+                            legend_title="Tipo de Métrica",
+                            xaxis=dict(tickmode="array", tickvals=df_pivot.index, showgrid=True),  # Ativa o grid no eixo X
+                            yaxis=dict(showgrid=True),  # Ativa o grid no eixo Y
+                            xaxis_tickangle=-45,
+                        )
+                    return fig
+
+                fig = em_cache("figura_nota", montar_figura_nota, nota_item, tipo_grafico_empenho)
+                if tipo_grafico_empenho == "📊 Barras":
                     # Exibe o gráfico de barras no Streamlit
                     st.plotly_chart(fig, use_container_width=True, key=f"grafico_empenho_plotar_{nota_item}")
                 else:
-                    # Plota o gráfico de linha com a ordem correta
-                    fig = go.Figure()
-                    cores = {
-                            "DESPESAS LIQUIDADAS (CONTROLE EMPENHO)": "green",  # Cor verde para "Liquidado"
-                        }
-                    # Adiciona cada coluna de df_pivot como uma linha
-                    for col in df_pivot.columns:
-                        cor = cores.get(col)
-                        fig.add_trace(go.Scatter(
-                            x=df_pivot.index,  # Meses como eixo X
-                            y=df_pivot[col],  # Valores da métrica como eixo Y
-                            mode='lines+markers',  # Linha com marcadores
-                            name=legenda_dict.get(col, col),
-                            line=dict(width=3, color=cor),
-                            marker=dict(size=6),
-                            text=[f"R$ {v:,.2f}" for v in df_pivot[col]],  # Formatação dos valores
-                            hovertemplate='<b>' + legenda_dict.get(col, col) + '</b><br>Mês: %{x}<br>R$ %{y:,.2f}<extra></extra>'  # Corrigido aqui
-                        ))
-                    fig.update_traces(hovertemplate='%{customdata}')
-                    for trace in fig.data:
-                        trace.customdata = [[
-                            f"R$ {v:,.2f}".replace(",", "v").replace(".", ",").replace("v", ".")
-                        ] for v in trace.y]
-                    fig.update_layout(hovermode="x unified")
-
-                    # Atualiza o layout do gráfico de linha
-                    fig.update_layout(
-                        title=f"Evolução mês a mês — Nota de Empenho: {nota_item}",
-                        xaxis_title="Mês",
-                        yaxis_title="Valor (R$)",
-                        height=500,
-                        plot_bgcolor="#ffffff",
-                        paper_bgcolor="#ffffff",
-                        legend_title="Tipo de Métrica",
-                        xaxis=dict(tickmode="array", tickvals=df_pivot.index, showgrid=True),  # Ativa o grid no eixo X
-                        yaxis=dict(showgrid=True),  # Ativa o grid no eixo Y
-                        xaxis_tickangle=-45,
-                    )
-
                     # Exibe o gráfico de linha no Streamlit
                     st.plotly_chart(fig, use_container_width=True)
 
@@ -936,18 +1147,17 @@ if st.session_state.dados is not None:
 
 
     else:
-        # Cálculo da diferença
-        df_local['Diferença'] = df_local['Valor Empenhado'] - df_local['Valor Anual Proporcional']
-        
-        valor_anular = df_local[df_local['Diferença'] > 0]['Diferença'].sum()
-        valor_reforcar = df_local[df_local['Diferença'] < 0]['Diferença'].sum()
+        # Diferença (empenhado - proporcional) já separada em positivas e negativas no cubo
+        totais = em_cache("totais", lambda: consultas.totais(regioes, objeto))
+        valor_anular = totais['Valor a Anular']
+        valor_reforcar = totais['Valor a Reforçar']
 
         # Métricas principais
         col1, col2, col3, col4, col5 = st.columns([1, 2, 2, 2, 2])
-        col1.metric("Total de Contratos", len(df_local))
-        col2.metric("💰 Valor Anual Total", formatar_real(df_local['Valor Anual'].sum()))
-        col3.metric("💰 Valor Empenhado Total", formatar_real(df_local['Valor Empenhado'].sum()))
-        col4.metric("💵 Valor Pago Total", formatar_real(df_local['Valor Pago'].sum()))
+        col1.metric("Total de Contratos", int(totais["Linhas"]))
+        col2.metric("💰 Valor Anual Total", formatar_real(totais['Valor Anual']))
+        col3.metric("💰 Valor Empenhado Total", formatar_real(totais['Valor Empenhado']))
+        col4.metric("💵 Valor Pago Total", formatar_real(totais['Valor Pago']))
 
         with col5:
             if valor_reforcar < 0:
@@ -964,70 +1174,74 @@ if st.session_state.dados is not None:
 
             with col1:
                 st.subheader("📊 Comparação por Região")
-                df_regiao = df_local.groupby("Regiao", as_index=False)[["Valor Anual", "Valor Empenhado", "Valor Pago"]].sum()
-                df_regiao = df_regiao.sort_values(by="Valor Empenhado", ascending=False)
-
-                fig = px.bar(
-                    df_regiao,
-                    x="Regiao",
-                    y=["Valor Anual", "Valor Empenhado", "Valor Pago"],
-                    barmode="group",
-                    title="💰 Comparação de Valores por Região",
-                    color_discrete_map={
-                        "Valor Anual": "#2ca02c",
-                        "Valor Empenhado": "#1f77b4",
-                        "Valor Pago": "#ff7f0e"
-                    }
-                )
+                def montar_figura_regioes():
+                    df_regiao = consultas.totais_por("Regiao", regioes, objeto)
+
+                    fig = px.bar(
+                        df_regiao,
+                        x="Regiao",
+                        y=["Valor Anual", "Valor Empenhado", "Valor Pago"],
+                        barmode="group",
+                        title="💰 Comparação de Valores por Região",
+                        color_discrete_map={
+                            "Valor Anual": "#2ca02c",
+                            "Valor Empenhado": "#1f77b4",
+                            "Valor Pago": "#ff7f0e"
+                        }
+                    )
 
-                fig.update_layout(
-                    xaxis_title="Região",
-                    yaxis_title="Valor (R$)",
-                    bargap=0.15,
-                    height=500
-                )
+                    fig.update_layout(
+                        xaxis_title="Região",
+                        yaxis_title="Valor (R$)",
+                        bargap=0.15,
+                        height=500
+                    )
 
-                for trace in fig.data:
-                    trace.text = [formatar_real(v) for v in trace.y]
+                    for trace in fig.data:
+                        trace.text = [formatar_real(v) for v in trace.y]
+                    return fig
 
+                fig = em_cache("figura_regioes", montar_figura_regioes)
                 st.plotly_chart(fig)
 
             with col2:
                 st.subheader("📊 Comparação por Objeto")
-                df_objeto = df_local.groupby("Fonte", as_index=False)[["Valor Anual", "Valor Empenhado", "Valor Pago"]].sum()
-                df_objeto = df_objeto.sort_values(by="Valor Empenhado", ascending=False)
-
-                fig_obj = px.bar(
-                    df_objeto,
-                    x="Fonte",
-                    y=["Valor Anual", "Valor Empenhado", "Valor Pago"],
-                    barmode="group",
-                    title="💰 Comparação de Valores por Objeto",
-                    color_discrete_map={
-                        "Valor Anual": "#2ca02c",
-                        "Valor Empenhado": "#1f77b4",
-                        "Valor Pago": "#ff7f0e"
-                    }
-                )
+                def montar_figura_objetos():
+                    df_objeto = consultas.totais_por("Fonte", regioes, objeto)
+
+                    fig_obj = px.bar(
+                        df_objeto,
+                        x="Fonte",
+                        y=["Valor Anual", "Valor Empenhado", "Valor Pago"],
+                        barmode="group",
+                        title="💰 Comparação de Valores por Objeto",
+                        color_discrete_map={
+                            "Valor Anual": "#2ca02c",
+                            "Valor Empenhado": "#1f77b4",
+                            "Valor Pago": "#ff7f0e"
+                        }
+                    )
 
-                limite = df_objeto[["Valor Anual", "Valor Empenhado", "Valor Pago"]].mean().mean()
+                    limite = df_objeto[["Valor Anual", "Valor Empenhado", "Valor Pago"]].mean().mean()
 
-                for trace in fig_obj.data:
-                    trace.text = [formatar_real(val) for val in trace.y]
-                    trace.textposition = ["outside" if val < limite else "inside" for val in trace.y]
+                    for trace in fig_obj.data:
+                        trace.text = [formatar_real(val) for val in trace.y]
+                        trace.textposition = ["outside" if val < limite else "inside" for val in trace.y]
 
-                fig_obj.update_layout(
-                    xaxis_title="Objeto",
-                    yaxis_title="Valor (R$)",
-                    bargap=0.15,
-                    height=500
-                )
+                    fig_obj.update_layout(
+                        xaxis_title="Objeto",
+                        yaxis_title="Valor (R$)",
+                        bargap=0.15,
+                        height=500
+                    )
+                    return fig_obj
 
+                fig_obj = em_cache("figura_objetos", montar_figura_objetos)
                 st.plotly_chart(fig_obj, use_container_width=True)
 
-            # Destaque sobre contratos rescindidos
-            rescisoes = df_local[df_local["Ocorrência"].str.lower() == "rescisão"].copy()
-            rescisoes["Valor a Anular"] = rescisoes["Valor Empenhado"] - rescisoes["Valor Anual Proporcional"]
+            # Destaque sobre contratos rescindidos: só as linhas rescindidas saem do disco
+            # (a ocorrência é gravada já em minúsculas)
+            rescisoes = em_cache("rescisoes", lambda: consultas.rescisoes(regioes, objeto))
             valor_total_anular = rescisoes["Valor a Anular"].sum()
 
             st.markdown(f"""
@@ -1039,10 +1253,6 @@ if st.session_state.dados is not None:
 
         # ========== TAB 2 ==========
         with tab2:
-            df_fmt = df_local.copy()
-            df_fmt = aplicar_formatacao_moeda(df_fmt, ["Valor Empenhado", "Valor Pago", "Valor Anual Proporcional"])
-            rescisoes["Valor a Anular"] = rescisoes["Valor Empenhado"] - rescisoes["Valor Anual Proporcional"]
-
             anular = rescisoes[rescisoes["Valor a Anular"] > 0]
             reforcar = rescisoes[rescisoes["Valor a Anular"] < 0]
 
@@ -0,0 +1,564 @@
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+import weakref
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as fs
+import pyarrow.parquet as pq
+
+from pages.calculos_painel import montar_cubo, indexar_notas, MEDIDAS_CUBO
+
+
+# Cada atualização grava uma versão nova em snapshot_painel/<versão>/; ATUAL.json aponta a publicada
+DIRETORIO_SNAPSHOTS = "snapshot_painel"
+CAMINHO_ATUAL = os.path.join(DIRETORIO_SNAPSHOTS, "ATUAL.json")
+SUFIXO_TEMPORARIO = ".tmp"  # Versão ainda sendo gravada (nunca é lida pelas sessões)
+# Arrendamentos: um arquivo vazio <versão>@<host>@<pid>@<motivo> para cada processo que usa, copia ou grava
+# uma versão. Nenhum processo apaga uma versão arrendada por outro que ainda esteja vivo.
+DIRETORIO_ARRENDAMENTOS = os.path.join(DIRETORIO_SNAPSHOTS, ".arrendamentos")
+
+# Arquivos de cada versão (e, soltos na pasta do app, os de antes das versões)
+DIRETORIO_PRINCIPAL = "dados_combinados"  # Dataset particionado por Fonte e Região
+CAMINHO_PRINCIPAL_ANTIGO = "dados_combinados.parquet"  # Formato anterior (arquivo único)
+CAMINHO_COMPLEMENTAR = "dados_complementares.parquet"
+CAMINHO_EVOLUCAO = "dados_empenhos_evolucao.parquet"
+CAMINHO_EVOLUCAO_ARROW = "dados_empenhos_evolucao.arrow"  # A mesma evolução já expandida, em Arrow IPC sem compressão
+CAMINHO_CUBO = "cubo_painel.parquet"  # Totais agregados (calculos_painel.montar_cubo), gravados na atualização
+
+LINHAS_POR_GRUPO = 1_000  # Linhas por row group (cada um com suas estatísticas de mínimo/máximo)
+COLUNA_ORDEM = "ordem_original"  # Posição da linha, para devolver na ordem e com o índice de antes
+
+# Chaves de partição (diretórios particao_fonte=.../particao_regiao=...); a região vai normalizada como no filtro da tela
+ESQUEMA_PARTICOES = pa.schema([("particao_fonte", pa.string()), ("particao_regiao", pa.string())])
+PARTICOES = ESQUEMA_PARTICOES.names
+
+# Nos metadados do arquivo: colunas gravadas como centavos inteiros e como data, para voltarem como antes
+METADADOS_CENTAVOS = b"painel.colunas_centavos"
+METADADOS_DATAS = b"painel.colunas_data"
+
+# Leituras por mapeamento em memória: os bytes dos arquivos ficam no cache do sistema, compartilhados entre processos
+SISTEMA_ARQUIVOS = fs.LocalFileSystem(use_mmap=True)
+
+
+def normalizar_regiao(regiao):
+    return regiao.str.strip().str.upper()
+
+
+def _substituir(temporario, destino):
+    """Troca o destino pelo caminho temporário já gravado, removendo a versão anterior."""
+    if os.path.isdir(destino):
+        antigo = f"{destino}.{uuid.uuid4().hex}.antigo"
+        os.replace(destino, antigo)
+        os.replace(temporario, destino)
+        shutil.rmtree(antigo, ignore_errors=True)
+    else:
+        os.replace(temporario, destino)
+
+
+def _tabela_compacta(df, colunas_centavos):
+    """Tabela Arrow com os valores em centavos (int64) e as datas como date32."""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    centavos = [coluna for coluna in colunas_centavos if coluna in tabela.column_names]
+    datas = [campo.name for campo in tabela.schema if pa.types.is_timestamp(campo.type)]
+    for coluna in centavos:
+        valores = np.rint(df[coluna].to_numpy(dtype=np.float64) * 100)
+        posicao = tabela.column_names.index(coluna)
+        tabela = tabela.set_column(posicao, coluna, pa.array(valores, type=pa.int64(), from_pandas=True))
+    for coluna in datas:
+        posicao = tabela.column_names.index(coluna)
+        tabela = tabela.set_column(posicao, coluna, pc.cast(tabela[coluna], pa.date32()))
+    return tabela.replace_schema_metadata({
+        **(tabela.schema.metadata or {}),
+        METADADOS_CENTAVOS: json.dumps(centavos).encode(),
+        METADADOS_DATAS: json.dumps(datas).encode(),
+    })
+
+
+def _tabela_ordenada(df, colunas_centavos):
+    """Tabela Arrow ordenada por contrato (row groups com faixas de contrato estreitas), guardando a ordem original."""
+    df = df.assign(**{COLUNA_ORDEM: np.arange(len(df))})
+    df = df.sort_values("Contrato", kind="mergesort")
+    return _tabela_compacta(df, colunas_centavos)
+
+
+def _metadados(tabela, chave):
+    metadados = tabela.schema.metadata or {}
+    return json.loads(metadados[chave]) if chave in metadados else []
+
+
+def _tabela_expandida(tabela):
+    """Volta os centavos para reais (float) e as datas para timestamp; snapshots antigos passam direto."""
+    for coluna in _metadados(tabela, METADADOS_CENTAVOS):
+        if coluna in tabela.column_names:
+            posicao = tabela.column_names.index(coluna)
+            reais = pc.divide(pc.cast(tabela[coluna], pa.float64()), 100.0)
+            tabela = tabela.set_column(posicao, coluna, reais)
+    for coluna in _metadados(tabela, METADADOS_DATAS):
+        if coluna in tabela.column_names:
+            posicao = tabela.column_names.index(coluna)
+            tabela = tabela.set_column(posicao, coluna, pc.cast(tabela[coluna], pa.timestamp("ns")))
+    metadados = {chave: valor for chave, valor in (tabela.schema.metadata or {}).items()
+                 if chave not in (METADADOS_CENTAVOS, METADADOS_DATAS)}
+    return tabela.replace_schema_metadata(metadados)
+
+
+def _expandir(tabela):
+    return _tabela_expandida(tabela).to_pandas(date_as_object=False)
+
+
+def _para_pandas(tabela):
+    df = _expandir(tabela)
+    df = df.sort_values(COLUNA_ORDEM).set_index(COLUNA_ORDEM)
+    df.index.name = None
+    return df
+
+
+def gravar_principal(destino, df, colunas_centavos=()):
+    """Grava as linhas principais da versão em construção como dataset particionado por Fonte e Região."""
+    df = df.assign(particao_fonte=df["Fonte"], particao_regiao=normalizar_regiao(df["Regiao"]))
+    caminho = os.path.join(destino, DIRETORIO_PRINCIPAL)
+    temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+    ds.write_dataset(
+        _tabela_ordenada(df, colunas_centavos),
+        temporario,
+        format="parquet",
+        partitioning=ds.partitioning(ESQUEMA_PARTICOES, flavor="hive"),
+        max_rows_per_group=LINHAS_POR_GRUPO,
+    )
+    _substituir(temporario, caminho)
+
+
+# Os arquivos herdados da versão anterior são links: gravar por cima os alteraria lá também,
+# por isso sempre se grava num temporário e se troca o nome
+def _gravar_tabela(tabela, caminho, **opcoes):
+    temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+    pq.write_table(tabela, temporario, **opcoes)
+    _substituir(temporario, caminho)
+
+
+def gravar_complementar(destino, df, colunas_centavos=()):
+    _gravar_tabela(_tabela_ordenada(df, colunas_centavos), os.path.join(destino, CAMINHO_COMPLEMENTAR),
+                   row_group_size=LINHAS_POR_GRUPO)
+
+
+def _gravar_arrow(tabela, caminho):
+    temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+    with pa.ipc.new_file(temporario, tabela.schema) as arquivo:
+        arquivo.write_table(tabela)
+    _substituir(temporario, caminho)
+
+
+def gravar_evolucao(destino, df, colunas_centavos=()):
+    """Grava a evolução compacta (Parquet) e a cópia pronta para ser mapeada em memória (Arrow IPC)."""
+    tabela = _tabela_compacta(df, colunas_centavos)
+    _gravar_tabela(tabela, os.path.join(destino, CAMINHO_EVOLUCAO))
+    _gravar_arrow(_tabela_expandida(tabela), os.path.join(destino, CAMINHO_EVOLUCAO_ARROW))
+
+
+def gravar_cubo(destino, df, colunas_centavos=()):
+    _gravar_tabela(_tabela_ordenada(df, colunas_centavos), os.path.join(destino, CAMINHO_CUBO),
+                   row_group_size=LINHAS_POR_GRUPO)
+
+
+def _contratos_por_grupo(arquivo):
+    """Contratos distintos de cada row group, lendo só a coluna Contrato."""
+    for grupo in range(arquivo.num_row_groups):
+        contratos = arquivo.read_row_group(grupo, columns=["Contrato"]).column("Contrato")
+        if pa.types.is_dictionary(contratos.type):
+            contratos = contratos.cast(contratos.type.value_type)
+        yield grupo, pc.unique(contratos).to_pylist()
+
+
+def _ler_grupos(grupos, contrato, colunas=None):
+    """Lê só os row groups indicados e fica com as linhas do contrato."""
+    tabela = pa.concat_tables(
+        [pq.ParquetFile(caminho, memory_map=True).read_row_group(grupo, columns=colunas) for caminho, grupo in grupos],
+        promote_options="default",
+    )
+    contratos = tabela.column("Contrato")
+    if pa.types.is_dictionary(contratos.type):
+        contratos = contratos.cast(contratos.type.value_type)
+    return _para_pandas(tabela.filter(pc.equal(contratos, contrato)))
+
+
+class SnapshotPainel:
+    """Uma versão publicada do snapshot, imutável e compartilhada por todas as sessões do processo.
+
+    As sessões guardam só a referência; a evolução e os índices são montados uma vez por versão.
+    Quando nenhuma sessão, deste ou de outro processo, usa mais uma versão antiga, o diretório dela é apagado.
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.nome = os.path.basename(diretorio)  # Também é a versão usada nas chaves do cache de visões
+        self._carregados = {}
+        self._lock = threading.RLock()  # O índice das notas carrega a evolução dentro do mesmo lock
+        self.bytes_mapeados = 0
+
+    def _caminho(self, arquivo):
+        return os.path.join(self.diretorio, arquivo)
+
+    def _carregar(self, chave, montar):
+        with self._lock:
+            if chave not in self._carregados:
+                self._carregados[chave] = montar()
+            return self._carregados[chave]
+
+    def _dataset_principal(self):
+        return ds.dataset(self._caminho(DIRETORIO_PRINCIPAL), format="parquet", filesystem=SISTEMA_ARQUIVOS,
+                          partitioning=ds.partitioning(ESQUEMA_PARTICOES, flavor="hive"))
+
+    def listar_particoes(self):
+        """Regiões e fontes existentes na versão, lidas só dos nomes dos diretórios (sem abrir os dados)."""
+        return self._carregar("particoes", self._listar_particoes)
+
+    def _listar_particoes(self):
+        regioes = set()
+        fontes = set()
+        for fragmento in self._dataset_principal().get_fragments():
+            chaves = ds.get_partition_keys(fragmento.partition_expression)
+            if chaves.get("particao_regiao") is not None:
+                regioes.add(chaves["particao_regiao"])
+            if chaves.get("particao_fonte") is not None:
+                fontes.add(chaves["particao_fonte"])
+        return sorted(regioes), sorted(fontes)
+
+    def indice_contratos(self):
+        """Índice Contrato → (arquivo, row group, fonte, região) do principal e Contrato → (arquivo, row group)
+        do complementar."""
+        return self._carregar("indice_contratos", self._indexar_contratos)
+
+    def _indexar_contratos(self):
+        principal = {}
+        for fragmento in self._dataset_principal().get_fragments():
+            chaves = ds.get_partition_keys(fragmento.partition_expression)
+            for grupo, contratos in _contratos_por_grupo(pq.ParquetFile(fragmento.path, memory_map=True)):
+                for contrato in contratos:
+                    principal.setdefault(contrato, []).append(
+                        (fragmento.path, grupo, chaves.get("particao_fonte"), chaves.get("particao_regiao")))
+        complementar = {}
+        caminho = self._caminho(CAMINHO_COMPLEMENTAR)
+        for grupo, contratos in _contratos_por_grupo(pq.ParquetFile(caminho, memory_map=True)):
+            for contrato in contratos:
+                complementar.setdefault(contrato, []).append((caminho, grupo))
+        return {"principal": principal, "complementar": complementar}
+
+    def evolucao(self):
+        """Evolução dos empenhos mapeada em memória, sem cópia: as colunas apontam para as páginas do arquivo
+        (compartilhadas com os outros processos) e são somente leitura."""
+        return self._carregar("evolucao", self._mapear_evolucao)
+
+    def _mapear_evolucao(self):
+        caminho = self._caminho(CAMINHO_EVOLUCAO_ARROW)
+        if not os.path.exists(caminho):
+            # Versão gravada antes da cópia em Arrow: monta a cópia uma vez a partir do Parquet
+            _gravar_arrow(_tabela_expandida(pq.read_table(self._caminho(CAMINHO_EVOLUCAO))), caminho)
+        tabela = pa.ipc.open_file(pa.memory_map(caminho)).read_all()
+        self.bytes_mapeados = os.path.getsize(caminho)
+        return tabela.to_pandas(split_blocks=True, date_as_object=False)
+
+    def indice_notas(self):
+        return self._carregar("indice_notas", lambda: indexar_notas(self.evolucao()))
+
+    def preparar(self):
+        """Monta a evolução e os índices antes de a versão ser publicada, para nenhuma sessão esperar por eles."""
+        self.listar_particoes()
+        self.indice_contratos()
+        self.indice_notas()
+        return self
+
+    def ler_principal(self, regioes=None, fontes=None, contrato=None, colunas=None, ocorrencia=None):
+        """Lê só as partições (e os row groups) que atendem à seleção de regiões, fontes, contrato e ocorrência."""
+        filtro = None
+        condicoes = []
+        if regioes:
+            condicoes.append(ds.field("particao_regiao").isin(list(regioes)))
+        if fontes:
+            condicoes.append(ds.field("particao_fonte").isin(list(fontes)))
+        if contrato is not None:
+            condicoes.append(ds.field("Contrato") == contrato)
+        if ocorrencia is not None:
+            condicoes.append(ds.field("Ocorrência") == ocorrencia)
+        for condicao in condicoes:
+            filtro = condicao if filtro is None else filtro & condicao
+
+        dataset = self._dataset_principal()
+        if colunas is None:
+            colunas = [nome for nome in dataset.schema.names if nome not in PARTICOES]
+        elif COLUNA_ORDEM not in colunas:
+            colunas = list(colunas) + [COLUNA_ORDEM]
+
+        # Contrato sozinho: vai direto aos row groups que o índice aponta
+        if contrato is not None and ocorrencia is None and "Contrato" in colunas:
+            grupos = [
+                (caminho, grupo)
+                for caminho, grupo, fonte, regiao in self.indice_contratos()["principal"].get(contrato, [])
+                if (not regioes or regiao in regioes) and (not fontes or fonte in fontes)
+            ]
+            if grupos:
+                return _ler_grupos(grupos, contrato, colunas)
+        return _para_pandas(dataset.to_table(columns=colunas, filter=filtro))
+
+    def ler_complementar(self, contrato=None):
+        """Linhas complementares; com contrato, lê só os row groups em que ele aparece (pelo índice)."""
+        if contrato is not None:
+            grupos = self.indice_contratos()["complementar"].get(contrato)
+            if grupos:
+                return _ler_grupos(grupos, contrato)
+        filtros = [("Contrato", "==", contrato)] if contrato is not None else None
+        return _para_pandas(pq.read_table(self._caminho(CAMINHO_COMPLEMENTAR), filters=filtros,
+                                         memory_map=True))
+
+
+# Versão publicada (referência forte) e as antigas ainda em uso por alguma sessão (referências fracas)
+_snapshots = {"atual": None}
+_versoes_em_uso = weakref.WeakValueDictionary()
+_lock_snapshots = threading.Lock()
+
+
+def _versao_publicada():
+    try:
+        with open(CAMINHO_ATUAL, "r") as f:
+            return json.load(f).get("versao")
+    except (OSError, ValueError):
+        return None
+
+
+def _arrendamento(nome, motivo):
+    return os.path.join(DIRETORIO_ARRENDAMENTOS, f"{nome}@{socket.gethostname()}@{os.getpid()}@{motivo}")
+
+
+def _arrendar(nome, motivo):
+    """Avisa aos outros processos que este usa ("uso"), copia ("copia") ou grava ("gravacao") a versão."""
+    os.makedirs(DIRETORIO_ARRENDAMENTOS, exist_ok=True)
+    open(_arrendamento(nome, motivo), "w").close()
+
+
+def _devolver(nome, motivo):
+    try:
+        os.remove(_arrendamento(nome, motivo))
+    except OSError:
+        pass
+
+
+def _processo_vivo(pid):
+    if os.name == "nt":
+        return True  # os.kill(pid, 0) encerraria o processo no Windows: na dúvida, o arrendamento vale
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Existe, mas é de outro usuário
+    return True
+
+
+def _arrendada(nome):
+    """Algum processo vivo (este inclusive) arrendou a versão? Arrendamentos de processos mortos são apagados."""
+    try:
+        arquivos = os.listdir(DIRETORIO_ARRENDAMENTOS)
+    except OSError:
+        return False
+    host = socket.gethostname()
+    for arquivo in arquivos:
+        partes = arquivo.split("@")
+        if len(partes) != 4 or partes[0] != nome:
+            continue
+        # Processo de outra máquina (pasta compartilhada) não tem como ser conferido: o arrendamento vale
+        if partes[1] != host or not partes[2].isdigit() or _processo_vivo(int(partes[2])):
+            return True
+        try:
+            os.remove(os.path.join(DIRETORIO_ARRENDAMENTOS, arquivo))
+        except OSError:
+            pass
+    return False
+
+
+def _apagar_se_livre(nome):
+    if nome != _versao_publicada() and not _arrendada(nome):
+        shutil.rmtree(os.path.join(DIRETORIO_SNAPSHOTS, nome), ignore_errors=True)
+
+
+def _liberar_versao(nome):
+    """Chamada quando a última sessão do processo larga uma versão: devolve o arrendamento e apaga o diretório
+    se ela não é mais a publicada e nenhum outro processo a usa."""
+    _devolver(nome, "uso")
+    _apagar_se_livre(nome)
+
+
+def _limpar_versoes():
+    """Apaga as versões que nenhum processo usa, inclusive as temporárias de atualizações que morreram no meio."""
+    if not os.path.isdir(DIRETORIO_SNAPSHOTS):
+        return
+    for nome in os.listdir(DIRETORIO_SNAPSHOTS):
+        if nome.startswith(".") or not os.path.isdir(os.path.join(DIRETORIO_SNAPSHOTS, nome)):
+            continue  # Arrendamentos e arquivos soltos
+        if nome not in _versoes_em_uso:
+            _apagar_se_livre(nome)
+
+
+def _vincular(origem, destino):
+    """Link do arquivo da versão anterior (sem copiar os dados); cópia se o sistema não suportar links."""
+    try:
+        os.link(origem, destino)
+    except OSError:
+        shutil.copy2(origem, destino)
+
+
+def iniciar_versao():
+    """Cria o diretório temporário de uma versão nova, já com os arquivos da publicada.
+
+    A atualização substitui só o que mudou; as sessões continuam lendo a versão publicada até publicar_versao().
+    """
+    nome = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8] + SUFIXO_TEMPORARIO
+    _arrendar(nome, "gravacao")  # Antes de criar: outro processo limpando não a confunde com uma abandonada
+    destino = os.path.join(DIRETORIO_SNAPSHOTS, nome)
+    os.makedirs(destino)
+    publicada = _versao_publicada()
+    if publicada is not None:
+        # A publicada pode deixar de ser (outro processo publicou) e ser apagada no meio da cópia
+        _arrendar(publicada, "copia")
+        try:
+            origem = os.path.join(DIRETORIO_SNAPSHOTS, publicada)
+            for raiz, _, arquivos in os.walk(origem):
+                pasta = os.path.join(destino, os.path.relpath(raiz, origem))
+                os.makedirs(pasta, exist_ok=True)
+                for arquivo in arquivos:
+                    _vincular(os.path.join(raiz, arquivo), os.path.join(pasta, arquivo))
+        finally:
+            _devolver(publicada, "copia")
+    return destino
+
+
+def descartar_versao(destino):
+    shutil.rmtree(destino, ignore_errors=True)
+    _devolver(os.path.basename(destino), "gravacao")
+
+
+def publicar_versao(destino):
+    """Publica a versão gravada em destino: renomeia o diretório e troca o ponteiro ATUAL.json de uma vez.
+
+    Quem já está com a versão anterior termina de usá-la; os próximos reruns pegam a nova.
+    """
+    final = destino[:-len(SUFIXO_TEMPORARIO)]
+    nome = os.path.basename(final)
+    _arrendar(nome, "uso")  # Ainda não publicada nem registrada: sem isso, outro processo a apagaria
+    os.replace(destino, final)
+    _devolver(os.path.basename(destino), "gravacao")
+    try:
+        snapshot = SnapshotPainel(final).preparar()
+    except Exception:
+        _devolver(nome, "uso")
+        shutil.rmtree(final, ignore_errors=True)
+        raise
+
+    temporario = f"{CAMINHO_ATUAL}.{uuid.uuid4().hex}.tmp"
+    with open(temporario, "w") as f:
+        json.dump({"versao": snapshot.nome, "publicada_em": time.strftime('%Y-%m-%d %H:%M:%S')}, f)
+    with _lock_snapshots:
+        os.replace(temporario, CAMINHO_ATUAL)
+        _registrar(snapshot)
+        _limpar_versoes()
+    return snapshot
+
+
+def _registrar(snapshot):
+    anterior = _snapshots["atual"]
+    _snapshots["atual"] = snapshot
+    _versoes_em_uso[snapshot.nome] = snapshot
+    _arrendar(snapshot.nome, "uso")
+    weakref.finalize(snapshot, _liberar_versao, snapshot.nome)
+    return anterior
+
+
+def obter_snapshot():
+    """Versão publicada do snapshot (a mesma instância para todas as sessões), ou None se ainda não houver."""
+    with _lock_snapshots:
+        while True:
+            publicada = _versao_publicada()
+            if publicada is None:
+                return None
+            atual = _snapshots["atual"]
+            if atual is not None and atual.nome == publicada:
+                return atual
+            # Primeira carga do processo, ou versão publicada por outro processo
+            snapshot = _versoes_em_uso.get(publicada)
+            if snapshot is not None:
+                _snapshots["atual"] = snapshot
+                break
+            if atual is None:
+                _limpar_versoes()
+            snapshot = SnapshotPainel(os.path.join(DIRETORIO_SNAPSHOTS, publicada))
+            _registrar(snapshot)
+            # Arrendada só agora: se nesse meio-tempo outro processo publicou outra e apagou esta, vai para a nova
+            if os.path.isdir(snapshot.diretorio) or _versao_publicada() == publicada:
+                break
+    return snapshot.preparar()
+
+
+def _memoria_residente():
+    """Memória residente do processo em MB (Linux): total, páginas de arquivos mapeados e memória própria."""
+    campos = {"VmRSS": "total", "RssFile": "arquivos", "RssAnon": "anonima"}
+    memoria = {}
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                chave, _, valor = linha.partition(":")
+                if chave in campos:
+                    memoria[campos[chave]] = round(int(valor.split()[0]) / 1024, 1)
+    except OSError:
+        return None
+    return memoria
+
+
+def estatisticas_snapshot():
+    with _lock_snapshots:
+        atual = _snapshots["atual"]
+        versoes = len(_versoes_em_uso)
+    return {
+        "versao": atual.nome if atual is not None else None,
+        "versoes_em_uso": versoes,
+        "mb_mapeados": round(atual.bytes_mapeados / 2 ** 20, 1) if atual is not None else 0,
+        "memoria": _memoria_residente(),
+    }
+
+
+def migrar_snapshot_antigo():
+    """Leva os arquivos soltos na pasta do app (formatos anteriores às versões) para a primeira versão publicada."""
+    if _versao_publicada() is not None:
+        return
+    tem_principal = os.path.isdir(DIRETORIO_PRINCIPAL) or os.path.exists(CAMINHO_PRINCIPAL_ANTIGO)
+    if not (tem_principal and os.path.exists(CAMINHO_COMPLEMENTAR) and os.path.exists(CAMINHO_EVOLUCAO)):
+        return
+
+    destino = iniciar_versao()
+    try:
+        if os.path.isdir(DIRETORIO_PRINCIPAL):
+            shutil.copytree(DIRETORIO_PRINCIPAL, os.path.join(destino, DIRETORIO_PRINCIPAL))
+        else:
+            gravar_principal(destino, pd.read_parquet(CAMINHO_PRINCIPAL_ANTIGO))  # Principal em arquivo único
+        for arquivo in (CAMINHO_COMPLEMENTAR, CAMINHO_EVOLUCAO, CAMINHO_CUBO):
+            if os.path.exists(arquivo):
+                shutil.copy2(arquivo, os.path.join(destino, arquivo))
+        if not os.path.exists(os.path.join(destino, CAMINHO_CUBO)):
+            # Snapshot gravado antes do cubo existir
+            gravar_cubo(destino, montar_cubo(SnapshotPainel(destino).ler_principal()), MEDIDAS_CUBO)
+    except Exception:
+        descartar_versao(destino)
+        raise
+    publicar_versao(destino)
+
+    for caminho in (DIRETORIO_PRINCIPAL, CAMINHO_PRINCIPAL_ANTIGO, CAMINHO_COMPLEMENTAR, CAMINHO_EVOLUCAO, CAMINHO_CUBO):
+        if os.path.isdir(caminho):
+            shutil.rmtree(caminho, ignore_errors=True)
+        elif os.path.exists(caminho):
+            os.remove(caminho)
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+
+
+# Com URL_API_GOOGLE definida (servidor_drive_fake.py), o token também é pedido a esse servidor
+if os.environ.get("URL_API_GOOGLE"):
+    URL_TOKEN = os.environ["URL_API_GOOGLE"].rstrip("/") + "/token"
+else:
+    URL_TOKEN = "https://oauth2.googleapis.com/token"
+MARGEM_RENOVACAO = 300  # Renova o token 5 minutos antes de expirar
+EXPIRACAO_PADRAO = 3600  # Usado quando o Google não informa o expires_in
+TEMPO_LIMITE_TOKEN = (10, 30)  # Segundos para conectar e para receber a resposta do endpoint de token
+
+
+class GerenciadorToken:
+    """Mantém o access_token em memória do processo, compartilhado entre sessões e reruns."""
+
+    def __init__(self, client_id, client_secret, refresh_token, margem=MARGEM_RENOVACAO,
+                 tempo_limite=TEMPO_LIMITE_TOKEN):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self.margem = margem
+        self.tempo_limite = tempo_limite
+        self._lock = threading.Lock()
+        self._access_token = None
+        self._expira_em = 0.0
+        self._renovacoes = deque()  # Horário de cada renovação feita
+        self.total_renovacoes = 0
+        self.total_pedidos = 0
+
+    def _token_valido(self):
+        return self._access_token is not None and time.time() < self._expira_em - self.margem
+
+    def obter_token(self):
+        """Retorna um token válido, renovando apenas quando necessário."""
+        # Apenas uma thread renova; as demais esperam e reaproveitam o token novo
+        with self._lock:
+            self.total_pedidos += 1
+            if not self._token_valido():
+                self._renovar()
+            return self._access_token
+
+    def invalidar(self):
+        """Força a renovação na próxima chamada (ex.: após um 401 da API)."""
+        with self._lock:
+            self._expira_em = 0.0
+
+    def _renovar(self):
+        data = {
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'refresh_token': self.refresh_token,
+            'grant_type': 'refresh_token'
+        }
+        # Sem resposta no prazo, o requests.Timeout sobe para quem pediu o token; nada fica guardado
+        response = requests.post(URL_TOKEN, data=data, timeout=self.tempo_limite)
+
+        agora = time.time()
+        self._renovacoes.append(agora)
+        self.total_renovacoes += 1
+
+        if response.status_code == 200:
+            token_info = response.json()
+            self._access_token = token_info.get('access_token')
+            self._expira_em = agora + int(token_info.get('expires_in', EXPIRACAO_PADRAO))
+        else:
+            # Não guarda falhas: a próxima chamada tenta de novo
+            print(f"❌ Erro ao renovar o token: {response.status_code}")
+            self._access_token = None
+            self._expira_em = 0.0
+
+    def renovacoes_ultima_hora(self):
+        """Quantidade de renovações feitas nos últimos 60 minutos."""
+        limite = time.time() - 3600
+        with self._lock:
+            while self._renovacoes and self._renovacoes[0] < limite:
+                self._renovacoes.popleft()
+            return len(self._renovacoes)
+
+    def estatisticas(self):
+        return {
+            "renovacoes_ultima_hora": self.renovacoes_ultima_hora(),
+            "total_renovacoes": self.total_renovacoes,
+            "total_pedidos": self.total_pedidos,
+            "expira_em_segundos": max(0, int(self._expira_em - time.time())),
+        }
+
+
+# Um gerenciador por credencial, vivo enquanto o processo do Streamlit estiver de pé
+_gerenciadores = {}
+_lock_gerenciadores = threading.Lock()
+
+
+def obter_gerenciador_token(client_id, client_secret, refresh_token):
+    chave = (client_id, client_secret, refresh_token)
+    with _lock_gerenciadores:
+        if chave not in _gerenciadores:
+            _gerenciadores[chave] = GerenciadorToken(client_id, client_secret, refresh_token)
+        return _gerenciadores[chave]
+
+
+def estatisticas_tokens():
+    """Estatísticas de todos os gerenciadores ativos no processo."""
+    with _lock_gerenciadores:
+        gerenciadores = list(_gerenciadores.values())
+    return [g.estatisticas() for g in gerenciadores]
@@ -0,0 +1,539 @@
+"""Servidor local que imita a API do Google Drive e o endpoint de token OAuth.
+
+Serve para medir as páginas sem credenciais reais. Exemplo:
+
+    python servidor_drive_fake.py --manifesto arquivos.json --latencia 0.08 --taxa-erro 0.02
+    URL_API_GOOGLE=http://localhost:8765 streamlit run app.py
+
+O manifesto é uma lista JSON de arquivos:
+    [{"id": "1E2x...", "name": "Vigilância.xlsx", "caminho": "dados/vigilancia.xlsx", "parents": ["1MP1..."]}]
+
+Com --medir-painel N, o servidor sobe em segundo plano e a página do Painel é executada N vezes
+(streamlit.testing) clicando em "Atualizar Dados", com o tempo de cada atualização e as chamadas feitas.
+
+Do mesmo jeito, --medir-fiscais N cola os HTMLs de --html-fiscais (REGIAO=arquivo.html, repetível) na página
+de Fiscais e clica em "Atualizar Planilhas"; --medir-orcamento N envia a planilha de --notas-empenho na página
+de Orçamento, seleciona as planilhas da pasta (ou as de --planilhas-orcamento) e clica em "Iniciar".
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import date, datetime, time as horario, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MIME_GOOGLE_SHEETS = "application/vnd.google-apps.spreadsheet"
+TAMANHO_PAGINA_PADRAO = 100
+
+
+class ArmazemDrive:
+    """Arquivos em memória, com feed de mudanças e sessões de upload retomável."""
+
+    def __init__(self):
+        self.arquivos = {}
+        self.mudancas = []  # (número, file_id, removido)
+        self.sessoes_upload = {}
+        self._lock = threading.Lock()
+
+    def adicionar(self, file_id, nome, conteudo, mime_type=MIME_XLSX, parents=None):
+        with self._lock:
+            self.arquivos[file_id] = {
+                "id": file_id,
+                "name": nome,
+                "mimeType": mime_type,
+                "parents": parents or [],
+                "conteudo": conteudo,
+            }
+            self._tocar(file_id)
+
+    def _tocar(self, file_id, removido=False):
+        if not removido:
+            arquivo = self.arquivos[file_id]
+            arquivo["modifiedTime"] = datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+            arquivo["md5Checksum"] = hashlib.md5(arquivo["conteudo"]).hexdigest()
+        self.mudancas.append((len(self.mudancas) + 1, file_id, removido))
+
+    def metadados(self, file_id):
+        arquivo = self.arquivos[file_id]
+        metadados = {chave: valor for chave, valor in arquivo.items() if chave != "conteudo"}
+        metadados["size"] = str(len(arquivo["conteudo"]))
+        if arquivo["mimeType"] == MIME_GOOGLE_SHEETS:
+            del metadados["md5Checksum"]  # Arquivos nativos do Google não têm md5
+        return metadados
+
+    def substituir(self, file_id, conteudo):
+        with self._lock:
+            self.arquivos[file_id]["conteudo"] = conteudo
+            self._tocar(file_id)
+
+    def copiar(self, file_id, nome, mime_type):
+        with self._lock:
+            origem = self.arquivos[file_id]
+            novo_id = uuid.uuid4().hex
+            self.arquivos[novo_id] = dict(origem, id=novo_id, name=nome or origem["name"], mimeType=mime_type or origem["mimeType"])
+            self._tocar(novo_id)
+            return novo_id
+
+    def excluir(self, file_id):
+        with self._lock:
+            del self.arquivos[file_id]
+            self._tocar(file_id, removido=True)
+
+
+def _numero_br(valor, casas, milhar):
+    texto = f"{abs(valor):,.{casas}f}" if milhar else f"{abs(valor):.{casas}f}"
+    return texto.replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def formatar_celula(valor, formato="General"):
+    """Texto da célula como o Sheets em pt-BR mostra e exporta no CSV: "R$ 1.234,56", "1234,5", "12,50%", "10/03/2025"."""
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "VERDADEIRO" if valor else "FALSO"
+    if isinstance(valor, datetime):
+        return valor.strftime("%d/%m/%Y" if valor.time() == horario() else "%d/%m/%Y %H:%M:%S")
+    if isinstance(valor, date):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, horario):
+        return valor.strftime("%H:%M:%S")
+    if not isinstance(valor, (int, float)):
+        return str(valor)
+
+    formato = (formato or "General").split(";")[0]  # Só a seção dos positivos; o sinal vem na frente
+    if formato == "General":
+        return f"{valor:.15g}".replace(".", ",")
+    decimais = re.search(r"0\.(0+)", formato)
+    casas = len(decimais.group(1)) if decimais else 0
+    sinal = "-" if valor < 0 else ""
+    if "%" in formato:
+        return f"{sinal}{_numero_br(valor * 100, casas, False)}%"
+    texto = _numero_br(valor, casas, "#,##0" in formato or "R$" in formato)
+    return f"{sinal}R$ {texto}" if "R$" in formato else f"{sinal}{texto}"
+
+
+def xlsx_para_csv(conteudo):
+    """Exporta a primeira aba como CSV, como o Google Sheets faz: o texto exibido de cada célula, não o valor bruto."""
+    from openpyxl import load_workbook
+
+    planilha = load_workbook(io.BytesIO(conteudo), read_only=True, data_only=True).worksheets[0]
+    saida = io.StringIO()
+    escritor = csv.writer(saida, lineterminator="\n")
+    for linha in planilha.iter_rows():
+        escritor.writerow([formatar_celula(celula.value, getattr(celula, "number_format", "General")) for celula in linha])
+    return saida.getvalue().encode("utf-8")
+
+
+class Resposta:
+    def __init__(self, status, corpo=b"", tipo="application/json", cabecalhos=None):
+        self.status = status
+        self.corpo = json.dumps(corpo).encode("utf-8") if isinstance(corpo, (dict, list)) else corpo
+        self.tipo = tipo
+        self.cabecalhos = cabecalhos or {}
+
+
+class ManipuladorDrive(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Mantém a conexão aberta (keep-alive), como o Google
+    armazem = None
+    latencia = 0.0
+    taxa_erro = 0.0
+    taxa_limite = 0.0
+    contagem = {}
+    lock_contagem = threading.Lock()
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _contar(self, rota):
+        with self.lock_contagem:
+            self.contagem[rota] = self.contagem.get(rota, 0) + 1
+
+    def _tratar(self):
+        url = urlparse(self.path)
+        params = {chave: valores[0] for chave, valores in parse_qs(url.query).items()}
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        corpo = self.rfile.read(tamanho) if tamanho else b""
+
+        if url.path == "/_estatisticas":
+            resposta = Resposta(200, dict(self.contagem))
+        else:
+            if self.latencia:
+                time.sleep(self.latencia * random.uniform(0.5, 1.5))
+            # O endpoint de token fica de fora da injeção de erros, como no Google (serviço separado)
+            erro = None if url.path == "/token" else self._injetar_erro()
+            resposta = erro or self._despachar(self.command, url.path, params, corpo, self.headers)
+
+        self.send_response(resposta.status)
+        self.send_header("Content-Type", resposta.tipo)
+        self.send_header("Content-Length", str(len(resposta.corpo)))
+        for nome, valor in resposta.cabecalhos.items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(resposta.corpo)
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _tratar
+
+    def _injetar_erro(self):
+        sorteio = random.random()
+        if sorteio < self.taxa_limite:
+            self._contar("erro 429")
+            return Resposta(429, {"error": {"code": 429, "message": "Rate Limit Exceeded"}}, cabecalhos={"Retry-After": "1"})
+        if sorteio < self.taxa_limite + self.taxa_erro:
+            self._contar("erro 503")
+            return Resposta(503, {"error": {"code": 503, "message": "Backend Error"}})
+        return None
+
+    def _despachar(self, metodo, caminho, params, corpo, cabecalhos):
+        if caminho == "/token" and metodo == "POST":
+            self._contar("token")
+            return Resposta(200, {"access_token": f"fake-{uuid.uuid4().hex}", "expires_in": 3600, "token_type": "Bearer"})
+
+        if not (cabecalhos.get("Authorization") or "").startswith("Bearer "):
+            return Resposta(401, {"error": {"code": 401, "message": "Login Required"}})
+
+        if caminho == "/batch/drive/v3" and metodo == "POST":
+            self._contar("batch")
+            return self._lote(corpo, cabecalhos)
+
+        sessao = re.fullmatch(r"/upload/sessao/(\w+)", caminho)
+        if sessao and metodo == "PUT":
+            self._contar("upload retomável (pedaço)")
+            return self._pedaco_upload(sessao.group(1), corpo, cabecalhos)
+
+        armazem = self.armazem
+        rota = re.fullmatch(r"/(upload/)?drive/v3/(files|changes)(?:/([^/]+))?(?:/(copy|export))?", caminho)
+        if not rota:
+            return Resposta(404, {"error": {"code": 404, "message": "Not Found"}})
+        upload, recurso, file_id, acao = rota.groups()
+
+        if recurso == "changes":
+            return self._mudancas(file_id, params)
+
+        if file_id is None and metodo == "GET":
+            self._contar("files.list")
+            return self._listar(params)
+
+        if file_id not in armazem.arquivos:
+            return Resposta(404, {"error": {"code": 404, "message": f"File not found: {file_id}"}})
+
+        if upload and metodo == "PATCH":
+            if params.get("uploadType") == "resumable":
+                self._contar("upload retomável (início)")
+                id_sessao = uuid.uuid4().hex
+                total = int(cabecalhos.get("X-Upload-Content-Length") or 0)
+                armazem.sessoes_upload[id_sessao] = {"file_id": file_id, "total": total, "dados": bytearray()}
+                host = cabecalhos.get("Host")
+                return Resposta(200, b"", cabecalhos={"Location": f"http://{host}/upload/sessao/{id_sessao}"})
+            self._contar("files.update")
+            armazem.substituir(file_id, corpo)
+            return Resposta(200, armazem.metadados(file_id))
+
+        if acao == "copy" and metodo == "POST":
+            self._contar("files.copy")
+            dados = json.loads(corpo or b"{}")
+            novo_id = armazem.copiar(file_id, dados.get("name"), dados.get("mimeType"))
+            return Resposta(200, {"id": novo_id})
+
+        if acao == "export" and metodo == "GET":
+            self._contar("files.export")
+            if armazem.arquivos[file_id]["mimeType"] != MIME_GOOGLE_SHEETS:
+                return Resposta(403, {"error": {"code": 403, "message": "Export only supports Docs Editors files."}})
+            return Resposta(200, xlsx_para_csv(armazem.arquivos[file_id]["conteudo"]), tipo="text/csv")
+
+        if metodo == "DELETE":
+            self._contar("files.delete")
+            armazem.excluir(file_id)
+            return Resposta(204)
+
+        if metodo == "GET" and params.get("alt") == "media":
+            self._contar("files.get (media)")
+            return Resposta(200, armazem.arquivos[file_id]["conteudo"], tipo="application/octet-stream")
+
+        if metodo == "GET":
+            self._contar("files.get")
+            return Resposta(200, armazem.metadados(file_id))
+
+        return Resposta(405, {"error": {"code": 405, "message": "Method Not Allowed"}})
+
+    def _listar(self, params):
+        pasta = re.search(r"'([^']+)' in parents", params.get("q", ""))
+        arquivos = [
+            self.armazem.metadados(file_id) for file_id, arquivo in list(self.armazem.arquivos.items())
+            if pasta is None or pasta.group(1) in arquivo["parents"]
+        ]
+        inicio = int(params.get("pageToken") or 0)
+        tamanho = int(params.get("pageSize") or TAMANHO_PAGINA_PADRAO)
+        resposta = {"files": arquivos[inicio:inicio + tamanho]}
+        if inicio + tamanho < len(arquivos):
+            resposta["nextPageToken"] = str(inicio + tamanho)
+        return Resposta(200, resposta)
+
+    def _mudancas(self, sub_recurso, params):
+        mudancas = self.armazem.mudancas
+        if sub_recurso == "startPageToken":
+            self._contar("changes.getStartPageToken")
+            return Resposta(200, {"startPageToken": str(len(mudancas) + 1)})
+
+        self._contar("changes.list")
+        inicio = int(params.get("pageToken") or 1)
+        tamanho = int(params.get("pageSize") or TAMANHO_PAGINA_PADRAO)
+        pagina = mudancas[inicio - 1:inicio - 1 + tamanho]
+        resposta = {"changes": [
+            {"fileId": file_id, "removed": removido,
+             "file": self.armazem.metadados(file_id) if file_id in self.armazem.arquivos else None}
+            for _, file_id, removido in pagina
+        ]}
+        if inicio - 1 + tamanho < len(mudancas):
+            resposta["nextPageToken"] = str(inicio + tamanho)
+        else:
+            resposta["newStartPageToken"] = str(len(mudancas) + 1)
+        return Resposta(200, resposta)
+
+    def _pedaco_upload(self, id_sessao, corpo, cabecalhos):
+        sessao = self.armazem.sessoes_upload.get(id_sessao)
+        if sessao is None:
+            return Resposta(404, {"error": {"code": 404, "message": "Upload session not found"}})
+
+        faixa = re.fullmatch(r"bytes (\d+)-(\d+)/(\d+)", cabecalhos.get("Content-Range", ""))
+        if faixa and int(faixa.group(1)) == len(sessao["dados"]):
+            sessao["dados"].extend(corpo)
+
+        if len(sessao["dados"]) >= sessao["total"]:
+            self.armazem.substituir(sessao["file_id"], bytes(sessao["dados"]))
+            del self.armazem.sessoes_upload[id_sessao]
+            return Resposta(200, self.armazem.metadados(sessao["file_id"]))
+
+        cabecalhos_resposta = {"Range": f"bytes=0-{len(sessao['dados']) - 1}"} if sessao["dados"] else {}
+        return Resposta(308, b"", cabecalhos=cabecalhos_resposta)
+
+    def _lote(self, corpo, cabecalhos):
+        fronteira = cabecalhos["Content-Type"].split("boundary=")[1].strip().strip('"')
+        partes_resposta = []
+        for bloco in corpo.decode("utf-8").split(f"--{fronteira}"):
+            bloco = bloco.replace("\r\n", "\n").strip()
+            if not bloco or bloco == "--":
+                continue
+            cabecalho_parte, _, requisicao = bloco.partition("\n\n")
+            content_id = re.search(r"Content-ID:\s*<([^>]+)>", cabecalho_parte, re.IGNORECASE).group(1)
+            cabecalho_http, _, corpo_item = requisicao.partition("\n\n")
+            metodo, alvo, _ = cabecalho_http.split("\n")[0].split(" ")
+            url = urlparse(alvo)
+            params = {chave: valores[0] for chave, valores in parse_qs(url.query).items()}
+
+            resposta = self._injetar_erro() or self._despachar(
+                metodo, url.path, params, corpo_item.encode("utf-8"), {"Authorization": cabecalhos.get("Authorization")}
+            )
+            partes_resposta.append(
+                f"--{fronteira}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {resposta.status} OK\r\nContent-Type: {resposta.tipo}\r\n\r\n"
+                f"{resposta.corpo.decode('utf-8', errors='replace')}\r\n"
+            )
+        texto = "".join(partes_resposta) + f"--{fronteira}--\r\n"
+        return Resposta(200, texto.encode("utf-8"), tipo=f"multipart/mixed; boundary={fronteira}")
+
+
+def iniciar_servidor(armazem, porta=8765, latencia=0.0, taxa_erro=0.0, taxa_limite=0.0):
+    ManipuladorDrive.armazem = armazem
+    ManipuladorDrive.latencia = latencia
+    ManipuladorDrive.taxa_erro = taxa_erro
+    ManipuladorDrive.taxa_limite = taxa_limite
+    return ThreadingHTTPServer(("127.0.0.1", porta), ManipuladorDrive)
+
+
+def carregar_manifesto(armazem, caminho_manifesto):
+    with open(caminho_manifesto, "r", encoding="utf-8") as f:
+        for item in json.load(f):
+            with open(item["caminho"], "rb") as arquivo:
+                conteudo = arquivo.read()
+            armazem.adicionar(item["id"], item["name"], conteudo, item.get("mimeType", MIME_XLSX), item.get("parents"))
+
+
+def aguardar_atualizador(anterior=None, nova=False, limite=600):
+    """Espera o atualizador do Painel (thread do processo) ficar parado, sem execução pendente na agenda.
+
+    Com nova=True, espera também terminar uma execução depois da que terminou em `anterior` (ultimo_fim).
+    """
+    from pages.atualizador_painel import estatisticas_atualizador
+
+    fim = time.time() + limite
+    while time.time() < fim:
+        estado = estatisticas_atualizador()
+        parado = estado is not None and not estado["atualizando"] and (
+            estado["proxima"] is None or estado["proxima"] > time.time())
+        if parado and (not nova or (estado["ultimo_fim"] is not None and estado["ultimo_fim"] != anterior)):
+            return estado
+        time.sleep(0.05)
+    raise TimeoutError("O atualizador do Painel não terminou a tempo")
+
+
+def medir_painel(porta, repeticoes):
+    """Roda a página do Painel com streamlit.testing e mede cada clique em "Atualizar Dados".
+
+    O clique só pede a atualização ao atualizador em segundo plano; o tempo vai até ela terminar.
+    """
+    os.environ["URL_API_GOOGLE"] = f"http://127.0.0.1:{porta}"
+    from streamlit.testing.v1 import AppTest
+
+    for rodada in range(1, repeticoes + 1):
+        pagina = AppTest.from_file("pages/relatorio.py", default_timeout=600)
+        pagina.run()
+        # Sem snapshot, a primeira atualização começa sozinha: o clique seria recusado
+        anterior = aguardar_atualizador()["ultimo_fim"]
+        inicio = time.perf_counter()
+        pagina.sidebar.button[0].click().run()
+        estado = aguardar_atualizador(anterior, nova=True)
+        problemas = ([estado["ultimo_erro"]] if estado["ultimo_erro"] else []) + estado["avisos"]
+        print(f"🔁 Atualização {rodada}: {time.perf_counter() - inicio:.2f}s"
+              + (f" ({'; '.join(problemas)})" if problemas else ""))
+
+    imprimir_chamadas()
+
+
+def imprimir_chamadas():
+    print("📊 Chamadas recebidas pelo servidor:")
+    for rota, total in sorted(ManipuladorDrive.contagem.items()):
+        print(f"   {rota}: {total}")
+
+
+def _conferir_execucao(pagina, nome):
+    if pagina.exception:
+        raise RuntimeError(f"A página de {nome} falhou: {pagina.exception[0].value}")
+
+
+def _cronometrar_clique(pagina, rotulo, rodada, nome):
+    """Clica no botão `rotulo` (a página roda a atualização inteira no rerun) e imprime o tempo e o resultado."""
+    botao = next((b for b in pagina.button if b.label == rotulo), None)
+    if botao is None:
+        avisos = [e.value for e in list(pagina.error) + list(pagina.warning)]
+        raise RuntimeError(f"Botão {rotulo!r} não apareceu na página de {nome}: {avisos}")
+    enviadas = ManipuladorDrive.contagem.get("files.update", 0)
+    inicio = time.perf_counter()
+    botao.click().run()
+    duracao = time.perf_counter() - inicio
+    enviadas = ManipuladorDrive.contagem.get("files.update", 0) - enviadas
+    problemas = [e.value for e in list(pagina.exception) + list(pagina.error) + list(pagina.warning)]
+    print(f"🔁 {nome} {rodada}: {duracao:.2f}s, {enviadas} planilha(s) enviada(s)"
+          + (f" ({'; '.join(str(p) for p in problemas)})" if problemas else ""))
+
+
+def medir_fiscais(porta, repeticoes, htmls):
+    """Roda a página de Fiscais com streamlit.testing, cola os HTMLs de cada região e mede cada clique em
+    "Atualizar Planilhas" (baixa, altera e reenvia a planilha de cada região). htmls: {regiao: [html, ...]}."""
+    os.environ["URL_API_GOOGLE"] = f"http://127.0.0.1:{porta}"
+    from streamlit.testing.v1 import AppTest
+
+    for rodada in range(1, repeticoes + 1):
+        pagina = AppTest.from_file("pages/fiscais.py", default_timeout=600)
+        pagina.run()
+        _conferir_execucao(pagina, "Fiscais")
+        for regiao, conteudos in htmls.items():
+            next(c for c in pagina.checkbox if c.label == regiao).check().run()
+            pagina.number_input(key=f"num_html_{regiao}").set_value(len(conteudos)).run()
+            for j, conteudo in enumerate(conteudos):
+                pagina.text_area(key=f"html_{regiao}_{j}").input(conteudo)
+        pagina.run()
+        _cronometrar_clique(pagina, "📤 Atualizar Planilhas", rodada, "Fiscais")
+
+    imprimir_chamadas()
+
+
+def _pagina_orcamento(caminho_notas):
+    """Script do AppTest: a página de Orçamento com a planilha de Notas de Empenho já enviada
+    (o streamlit.testing não preenche st.file_uploader)."""
+    import io
+    import os
+    import runpy
+
+    import streamlit as st
+
+    with open(caminho_notas, "rb") as arquivo:
+        notas = io.BytesIO(arquivo.read())
+    notas.name = os.path.basename(caminho_notas)
+    file_uploader = st.file_uploader
+    st.file_uploader = lambda *args, **kwargs: notas
+    try:
+        runpy.run_path("pages/orcam.py")
+    finally:
+        st.file_uploader = file_uploader
+
+
+def medir_orcamento(porta, repeticoes, caminho_notas, planilhas=None):
+    """Roda a página de Orçamento com streamlit.testing e mede cada clique em "Iniciar" (baixa, aplica as
+    notas de empenho e reenvia cada planilha selecionada; sem `planilhas`, todas as da pasta)."""
+    os.environ["URL_API_GOOGLE"] = f"http://127.0.0.1:{porta}"
+    from streamlit.testing.v1 import AppTest
+
+    for rodada in range(1, repeticoes + 1):
+        pagina = AppTest.from_function(_pagina_orcamento, args=(os.path.abspath(caminho_notas),),
+                                       default_timeout=600)
+        pagina.run()
+        _conferir_execucao(pagina, "Orçamento")
+        if not pagina.multiselect:
+            raise RuntimeError(f"Nenhuma planilha listada na página de Orçamento: {[e.value for e in pagina.error]}")
+        selecao = pagina.multiselect[0]
+        selecao.set_value(planilhas or selecao.options).run()
+        _cronometrar_clique(pagina, "Iniciar", rodada, "Orçamento")
+
+    imprimir_chamadas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita o Google Drive e o OAuth.")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--manifesto", help="JSON com os arquivos a servir (id, name, caminho, parents)")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Latência média (s) acrescentada a cada requisição")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 503")
+    parser.add_argument("--taxa-limite", type=float, default=0.0, help="Fração de respostas 429 com Retry-After")
+    parser.add_argument("--medir-painel", type=int, default=0, metavar="N", help="Executa o Painel N vezes e mede")
+    parser.add_argument("--medir-fiscais", type=int, default=0, metavar="N",
+                        help="Atualiza as planilhas de fiscais N vezes e mede")
+    parser.add_argument("--html-fiscais", action="append", default=[], metavar="REGIAO=ARQUIVO",
+                        help="HTML do SEI colado na região (repetível; até 10 por região)")
+    parser.add_argument("--medir-orcamento", type=int, default=0, metavar="N",
+                        help="Atualiza as planilhas de orçamento N vezes e mede")
+    parser.add_argument("--notas-empenho", help="Planilha de Notas de Empenho enviada na página de Orçamento")
+    parser.add_argument("--planilhas-orcamento", nargs="*", help="Planilhas selecionadas (padrão: todas da pasta)")
+    args = parser.parse_args()
+    if args.medir_fiscais and not args.html_fiscais:
+        parser.error("--medir-fiscais precisa de ao menos um --html-fiscais REGIAO=ARQUIVO")
+    if args.medir_orcamento and not args.notas_empenho:
+        parser.error("--medir-orcamento precisa de --notas-empenho")
+
+    htmls = {}
+    for item in args.html_fiscais:
+        regiao, _, caminho = item.partition("=")
+        with open(caminho, "r", encoding="utf-8") as arquivo:
+            htmls.setdefault(regiao, []).append(arquivo.read())
+
+    armazem = ArmazemDrive()
+    if args.manifesto:
+        carregar_manifesto(armazem, args.manifesto)
+
+    servidor = iniciar_servidor(armazem, args.porta, args.latencia, args.taxa_erro, args.taxa_limite)
+    print(f"🚀 Drive falso em http://127.0.0.1:{args.porta} com {len(armazem.arquivos)} arquivos")
+
+    if args.medir_painel or args.medir_fiscais or args.medir_orcamento:
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        if args.medir_painel:
+            medir_painel(args.porta, args.medir_painel)
+        if args.medir_fiscais:
+            medir_fiscais(args.porta, args.medir_fiscais, htmls)
+        if args.medir_orcamento:
+            medir_orcamento(args.porta, args.medir_orcamento, args.notas_empenho, args.planilhas_orcamento)
+        servidor.shutdown()
+    else:
+        servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    main()